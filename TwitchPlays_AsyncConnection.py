@@ -0,0 +1,1044 @@
+"""
+asyncio chat transports: every Twitch and YouTube connection on one event loop.
+
+- Twitch(signal=None, matcher=None), YouTube(api_key=None, signal=None, matcher=None)
+    Drop-in replacements for the TwitchPlays_Connection classes: same connect
+    calls, same twitch_receive_messages() facade, same reconnect_stats().
+    The runners use them with `--transport asyncio`.
+
+- transport_loop() -> AsyncTransportLoop
+    The shared event loop, started on first use on the "twitchplays-asyncio"
+    thread. Every transport in the process runs on it, so another channel or
+    source costs a few tasks rather than a reader thread and a token thread.
+
+Each EventSub socket gets one reader task. The keepalive timer is a task that
+sleeps until the deadline the reader last pushed out, so a silent socket is
+noticed at its deadline instead of on the next 1 s recv timeout. Handovers
+open the next socket as a task while the old socket's reader keeps
+delivering. YouTube chat is a poll task that sleeps until the next poll time
+the pacer (poll_pacer.py) picked from the server's hint and the chat rate.
+
+HTTP and websockets go through aiohttp when it is installed. Without it the
+EventSub socket uses the `websockets` package and HTTP calls run on
+`requests` in the loop's executor. The YouTube page scrape and API lookup
+done on connect stay blocking calls; reconnects that repeat them run in the
+executor.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import atexit
+import concurrent.futures
+import functools
+import json
+import queue
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import requests
+
+import TwitchPlays_Connection
+from TwitchPlays_Connection import (
+    API_CONNECT_TIMEOUT_SECONDS,
+    API_TIMEOUT_SECONDS,
+    EVENTSUB_HANDOVER_DRAIN_SECONDS,
+    EVENTSUB_KEEPALIVE_GRACE_SECONDS,
+    TOKEN_REFRESH_RETRY_SECONDS,
+    TOKEN_VALIDATE_INTERVAL_SECONDS,
+    TWITCH_HTTP_POOL_MAXSIZE,
+    TWITCH_HTTP_TIMEOUT,
+    YOUTUBE_USER_AGENT,
+    ChatMessage,
+    IngestSignal,
+    TwitchRevocationError,
+    TwitchSessionState,
+    TwitchStaleIdError,
+    YouTubeScrapeError,
+)
+from command_matcher import CommandMatcher
+
+try:
+    import aiohttp
+except BaseException:
+    aiohttp = None
+
+try:
+    import websockets
+except BaseException:
+    websockets = None
+
+# `--transport` choices in the runners and the load generator
+CHAT_TRANSPORTS = ("threads", "asyncio")
+# blocking fallbacks: requests without aiohttp, YouTube scrape reconnects
+ASYNC_EXECUTOR_WORKERS = 4
+ASYNC_CLOSE_TIMEOUT_SECONDS = 5
+YOUTUBE_HTTP_TIMEOUT = (API_CONNECT_TIMEOUT_SECONDS, API_TIMEOUT_SECONDS)
+
+
+class EventSubClosedError(RuntimeError):
+    """The socket closed or a read failed; a pending handover may replace it."""
+
+
+class HttpResponse:
+    """The parts of requests.Response the transports read, from either client."""
+
+    def __init__(self, status_code: int, reason: str, text: str) -> None:
+        self.status_code = status_code
+        self.reason = reason
+        self.text = text
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+def query_items(params: Optional[Dict[str, Any]]) -> Optional[List[Tuple[str, str]]]:
+    """Flatten params (list values repeat the key) for aiohttp."""
+    if params is None:
+        return None
+    items = []
+    for key, value in params.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        items.extend((key, str(v)) for v in values)
+    return items
+
+
+class AsyncHttp:
+    """aiohttp client session, or a requests session run in the executor.
+
+    Created anywhere, used only from coroutines on the transport loop.
+    `pool_size` caps connections per host; 0 means no cap.
+    """
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        cookies: Optional[Dict[str, str]] = None,
+        pool_size: int = TWITCH_HTTP_POOL_MAXSIZE,
+    ) -> None:
+        self.headers = dict(headers or {})
+        self.cookies = dict(cookies or {})
+        self.pool_size = pool_size
+        self.client: Any = None
+
+    def session(self) -> Any:
+        if self.client is None:
+            if aiohttp is not None:
+                self.client = aiohttp.ClientSession(
+                    headers=self.headers,
+                    cookies=self.cookies,
+                    connector=aiohttp.TCPConnector(limit=0, limit_per_host=self.pool_size),
+                )
+            else:
+                client = requests.Session()
+                client.headers.update(self.headers)
+                requests.utils.add_dict_to_cookiejar(client.cookies, self.cookies)
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_maxsize=max(1, self.pool_size), max_retries=0
+                )
+                client.mount("https://", adapter)
+                client.mount("http://", adapter)
+                self.client = client
+        return self.client
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        data: Any = None,
+        json_body: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Tuple[float, float] = TWITCH_HTTP_TIMEOUT,
+    ) -> HttpResponse:
+        client = self.session()
+        if aiohttp is None:
+            response = await asyncio.get_running_loop().run_in_executor(
+                None,
+                functools.partial(
+                    client.request,
+                    method,
+                    url,
+                    params=params,
+                    data=data,
+                    json=json_body,
+                    headers=headers,
+                    timeout=timeout,
+                ),
+            )
+            return HttpResponse(response.status_code, response.reason, response.text)
+
+        connect_timeout, read_timeout = timeout
+        async with client.request(
+            method,
+            url,
+            params=query_items(params),
+            data=data,
+            json=json_body,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_connect=connect_timeout, sock_read=read_timeout
+            ),
+        ) as response:
+            return HttpResponse(response.status, response.reason or "", await response.text())
+
+    async def websocket(self, url: str) -> "AsyncWebSocket":
+        if aiohttp is not None:
+            return AsyncWebSocket(await self.session().ws_connect(url, max_msg_size=0))
+        if websockets is None:
+            raise RuntimeError("Neither aiohttp nor websockets is installed.")
+        return AsyncWebSocket(
+            await websockets.connect(url, ping_interval=None, max_size=None, open_timeout=None)
+        )
+
+    async def close(self) -> None:
+        client, self.client = self.client, None
+        if client is None:
+            return
+        if aiohttp is not None:
+            await client.close()
+        else:
+            client.close()
+
+
+class AsyncWebSocket:
+    """recv() returns the next frame, or None once the socket is closed."""
+
+    def __init__(self, ws: Any) -> None:
+        self.ws = ws
+
+    async def recv(self) -> Any:
+        if aiohttp is not None:
+            message = await self.ws.receive()
+            if message.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                return message.data
+            return None
+        try:
+            return await self.ws.recv()
+        except websockets.ConnectionClosed:
+            return None
+
+    async def close(self) -> None:
+        await self.ws.close()
+
+
+class AsyncTransportLoop:
+    """One event loop on a daemon thread; other threads hand it coroutines."""
+
+    def __init__(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=ASYNC_EXECUTOR_WORKERS,
+                thread_name_prefix="twitchplays-asyncio-io",
+            )
+        )
+        # Twitch OAuth and Helix calls share one pool, as twitch_http() does;
+        # websockets hold their connection, so they get an uncapped one
+        self.twitch_http = AsyncHttp()
+        self.websocket_http = AsyncHttp(pool_size=0)
+        self.thread = threading.Thread(
+            target=self.loop.run_forever, name="twitchplays-asyncio", daemon=True
+        )
+        self.thread.start()
+
+    def in_loop(self) -> bool:
+        return threading.current_thread() is self.thread
+
+    def running(self) -> bool:
+        return self.thread.is_alive() and self.loop.is_running()
+
+    def submit(self, coro: Awaitable[Any]) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the loop and wait for its result."""
+        if self.in_loop():
+            raise RuntimeError("Blocking call made from the asyncio transport thread.")
+        return self.submit(coro).result(timeout)
+
+    def start_task(self, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        """Start a long-running task on the loop and return it."""
+        return self.call(ensure_task(coro))
+
+    def cancel_task(self, task: "asyncio.Task[Any]") -> None:
+        """Cancel a task and, from another thread, wait for it to unwind."""
+        if self.in_loop():
+            task.cancel()
+        elif self.running():
+            try:
+                self.call(cancel_and_wait(task), ASYNC_CLOSE_TIMEOUT_SECONDS)
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        if not self.running():
+            return
+        try:
+            self.call(self.close_clients(), ASYNC_CLOSE_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=ASYNC_CLOSE_TIMEOUT_SECONDS)
+
+    async def close_clients(self) -> None:
+        await self.twitch_http.close()
+        await self.websocket_http.close()
+
+
+async def ensure_task(coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+    return asyncio.ensure_future(coro)
+
+
+async def cancel_and_wait(task: "asyncio.Task[Any]") -> None:
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+shared_transport_loop: Optional[AsyncTransportLoop] = None
+transport_loop_lock = threading.Lock()
+
+
+def transport_loop() -> AsyncTransportLoop:
+    global shared_transport_loop
+    with transport_loop_lock:
+        if shared_transport_loop is None:
+            shared_transport_loop = AsyncTransportLoop()
+            # close the shared HTTP clients while the loop thread still runs
+            atexit.register(shared_transport_loop.close)
+        return shared_transport_loop
+
+
+class AsyncTokenManager(TwitchPlays_Connection.TwitchTokenManager):
+    """TwitchTokenManager as a task on the transport loop; create it there."""
+
+    def __init__(self, client: "Twitch", auth: Dict[str, str]) -> None:
+        self.client = client
+        self.auth = auth
+        self.user_id: Optional[str] = None
+        self.refresh_at: Optional[float] = None
+        self.validate_at = time.time() + TOKEN_VALIDATE_INTERVAL_SECONDS
+        self.lock = asyncio.Lock()
+        self.wake = asyncio.Event()
+        self.task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        self.task = asyncio.ensure_future(self.run())
+
+    def close(self) -> None:
+        task, self.task = self.task, None
+        if task is not None:
+            task.cancel()
+
+    async def refresh(self, stale_token: Optional[str] = None) -> Dict[str, str]:
+        async with self.lock:
+            if stale_token is not None and self.auth["access_token"] != stale_token:
+                return self.auth
+            auth, token_info = await self.client.refresh_access_token(self.auth)
+            self.auth = auth
+            self.update(token_info)
+            return auth
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self.wake.wait(), max(0.0, self.next_wakeup() - time.time())
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            now = time.time()
+            if now < self.next_wakeup():
+                continue
+            refreshing = self.refresh_at is not None and now >= self.refresh_at
+            try:
+                if refreshing:
+                    await self.refresh()
+                else:
+                    await self.client.validate_user_token(self)
+            except Exception as exc:
+                print(
+                    f"Twitch token {'refresh' if refreshing else 'validation'} failed. "
+                    f"Retrying in {TOKEN_REFRESH_RETRY_SECONDS} seconds. {exc}"
+                )
+                retry_at = time.time() + TOKEN_REFRESH_RETRY_SECONDS
+                if refreshing:
+                    self.refresh_at = retry_at
+                else:
+                    self.validate_at = retry_at
+
+
+@dataclass
+class AsyncTwitchSession(TwitchSessionState):
+    keepalive_timeout: int = 10
+    # monotonic; only the current socket's reader moves it
+    keepalive_deadline: float = 0.0
+    handover: Optional["asyncio.Task[Any]"] = None
+    # set by the current socket's reader when it dies with no replacement
+    failed: Optional["asyncio.Future[None]"] = None
+    tasks: Set["asyncio.Task[Any]"] = field(default_factory=set)
+
+
+class Twitch(TwitchPlays_Connection.Twitch):
+    """EventSub chat on the shared transport loop.
+
+    Everything that touches the network is a coroutine here; the parsing,
+    dedupe and queueing helpers are the threaded class's own.
+    """
+
+    def __init__(
+        self,
+        signal: Optional[IngestSignal] = None,
+        matcher: Optional[CommandMatcher] = None,
+        transport: Optional[AsyncTransportLoop] = None,
+    ) -> None:
+        super().__init__(signal, matcher)
+        self.transport = transport or transport_loop()
+
+    def twitch_connect(self, channel: Union[str, Iterable[str]]) -> None:
+        if aiohttp is None and websockets is None:
+            raise RuntimeError(
+                "The asyncio chat transport requires aiohttp (or websockets). Install it with `pip install aiohttp`."
+            )
+
+        self.close()
+
+        self.channels = self.normalize_channels(channel)
+        self.channel = ", ".join(self.channels)
+        auth = self.load_auth()
+        print(f"Connecting to Twitch chat for {self.channel}...")
+        self.session = self.transport.call(self.open_session(auth))
+        print(f"Twitch chat connected for {self.channel}.")
+
+    def close(self) -> None:
+        session = self.session
+        self.session = None
+        if session is None:
+            return
+        session.stop_event.set()
+        if self.transport.in_loop():
+            asyncio.ensure_future(self.close_session(session))
+        elif self.transport.running():
+            try:
+                self.transport.call(self.close_session(session), ASYNC_CLOSE_TIMEOUT_SECONDS)
+            except Exception:
+                pass
+
+    async def open_session(self, auth: Dict[str, str]) -> AsyncTwitchSession:
+        session = AsyncTwitchSession(
+            channel=self.channel,
+            tokens=AsyncTokenManager(self, auth),
+            chat_user_id="",
+            channels=list(self.channels),
+            signal=self.signal,
+        )
+        ws, keepalive_timeout = await self.connect_eventsub(session)
+        session.tokens.start()
+        self.spawn(session, self.run_session(session, ws, keepalive_timeout))
+        self.spawn(session, self.watch_keepalives(session))
+        return session
+
+    async def close_session(self, session: AsyncTwitchSession) -> None:
+        session.stop_event.set()
+        session.tokens.close()
+        tasks = list(session.tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        ws, session.ws = session.ws, None
+        await self.close_ws(ws)
+
+    def spawn(self, session: AsyncTwitchSession, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        task = asyncio.ensure_future(coro)
+        session.tasks.add(task)
+        task.add_done_callback(session.tasks.discard)
+        return task
+
+    async def run_session(
+        self, session: AsyncTwitchSession, ws: Any, keepalive_timeout: int
+    ) -> None:
+        """Install each socket and hard-reconnect when the current one dies."""
+        loop = asyncio.get_running_loop()
+        failures = 0
+        while not session.stop_event.is_set():
+            session.failed = loop.create_future()
+            self.install_socket(session, ws, keepalive_timeout)
+            try:
+                await session.failed
+            except TwitchRevocationError as exc:
+                session.stop_event.set()
+                print(f"Twitch chat transport stopped for {session.channel}. {exc}")
+                break
+            except Exception as exc:
+                print(
+                    f"Twitch chat transport failed for {session.channel}. Reconnecting. {exc}"
+                )
+            if session.handover is not None:
+                session.handover.cancel()
+                session.handover = None
+            ws, session.ws = session.ws, None
+            await self.close_ws(ws)
+            ws = None
+
+            # the socket is gone, so nothing arrives until a new subscription
+            # exists; the first attempt goes out at once
+            gap_started = session.last_frame_at
+            while not session.stop_event.is_set():
+                try:
+                    ws, keepalive_timeout = await self.connect_eventsub(session)
+                    break
+                except TwitchRevocationError as reconnect_exc:
+                    session.stop_event.set()
+                    print(
+                        f"Twitch chat transport stopped for {session.channel}. {reconnect_exc}"
+                    )
+                    break
+                except Exception as reconnect_exc:
+                    failures += 1
+                    delay = self.reconnect_delay(failures)
+                    print(
+                        f"Twitch chat reconnect failed for {session.channel}. Retrying in {delay:.1f} seconds. {reconnect_exc}"
+                    )
+                    await asyncio.sleep(delay)
+            if ws is None or session.stop_event.is_set():
+                await self.close_ws(ws)
+                break
+
+            failures = 0
+            session.reconnects += 1
+            missed = self.record_reconnect_gap(session, gap_started)
+            print(
+                f"Twitch chat reconnected for {session.channel}; about {missed} messages were missed."
+            )
+
+    def install_socket(
+        self, session: AsyncTwitchSession, ws: Any, keepalive_timeout: int
+    ) -> None:
+        session.ws = ws
+        session.keepalive_timeout = keepalive_timeout
+        session.keepalive_deadline = (
+            time.monotonic() + keepalive_timeout + EVENTSUB_KEEPALIVE_GRACE_SECONDS
+        )
+        self.spawn(session, self.read_socket(session, ws))
+
+    def fail(self, session: AsyncTwitchSession, exc: BaseException) -> None:
+        failed = session.failed
+        if failed is not None and not failed.done():
+            failed.set_exception(exc)
+
+    async def read_socket(self, session: AsyncTwitchSession, ws: Any) -> None:
+        """Deliver every frame from one socket until it closes.
+
+        Only the current socket (session.ws) moves the keepalive deadline and
+        acts on control messages; a replaced one is just drained. If the
+        current socket dies with no handover under way, run_session() is told.
+        """
+        try:
+            while True:
+                try:
+                    raw = await ws.recv()
+                except Exception as exc:
+                    raise EventSubClosedError(
+                        f"Twitch EventSub websocket read failed. {exc}"
+                    ) from exc
+                if not raw:
+                    raise EventSubClosedError("Twitch EventSub websocket closed.")
+                received_at = time.monotonic()
+                current = session.ws is ws
+                if current:
+                    session.last_frame_at = received_at
+                    session.keepalive_deadline = (
+                        received_at
+                        + session.keepalive_timeout
+                        + EVENTSUB_KEEPALIVE_GRACE_SECONDS
+                    )
+
+                try:
+                    message_type, message = self.decode_eventsub_frame(raw)
+                except RuntimeError:
+                    if current:
+                        raise
+                    continue
+                if message_type == "session_keepalive":
+                    continue
+                if message_type == "notification":
+                    self.handle_chat(session, message, received_at)
+                    continue
+                if current:
+                    self.handle_control(session, ws, message_type, message)
+        except EventSubClosedError as exc:
+            if session.ws is ws and session.handover is None:
+                self.fail(session, exc)
+        except Exception as exc:
+            if session.ws is ws:
+                self.fail(session, exc)
+        finally:
+            await self.close_ws(ws)
+
+    def handle_control(
+        self,
+        session: AsyncTwitchSession,
+        ws: Any,
+        message_type: str,
+        message: Dict[str, Any],
+    ) -> None:
+        if message_type == "session_reconnect":
+            if session.handover is not None:
+                return
+            reconnect_url = (
+                message.get("payload", {}).get("session", {}).get("reconnect_url")
+            )
+            if not reconnect_url:
+                raise RuntimeError("Twitch asked for a reconnect without a reconnect_url.")
+            print(f"Twitch requested a websocket reconnect for {session.channel}.")
+            self.start_handover(
+                session,
+                ws,
+                self.establish_eventsub_session(
+                    session, reconnect_url, create_subscription=False
+                ),
+            )
+        elif message_type == "revocation":
+            self.revoke_channel(session, message)
+        elif message_type == "session_welcome":
+            welcome_session = message.get("payload", {}).get("session", {})
+            session.keepalive_timeout = int(
+                welcome_session.get("keepalive_timeout_seconds")
+                or session.keepalive_timeout
+            )
+
+    async def watch_keepalives(self, session: AsyncTwitchSession) -> None:
+        """Open a new session once the current socket misses its keepalive.
+
+        Readers only push the deadline out, so this sleeps until it and then
+        again for however far it moved; there is no recv timeout to poll.
+        """
+        while True:
+            delay = session.keepalive_deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            ws = session.ws
+            if ws is not None and session.handover is None:
+                # the socket may still be alive, so keep reading it while a
+                # fresh session subscribes
+                print(
+                    f"Twitch EventSub keepalives stopped for {session.channel}; opening a new session."
+                )
+                self.start_handover(session, ws, self.connect_eventsub(session))
+            session.keepalive_deadline = (
+                time.monotonic()
+                + session.keepalive_timeout
+                + EVENTSUB_KEEPALIVE_GRACE_SECONDS
+            )
+
+    def start_handover(
+        self, session: AsyncTwitchSession, ws: Any, connect: Awaitable[Tuple[Any, int]]
+    ) -> None:
+        task = self.spawn(session, connect)
+        session.handover = task
+        task.add_done_callback(functools.partial(self.finish_handover, session, ws))
+
+    def finish_handover(
+        self, session: AsyncTwitchSession, old_ws: Any, task: "asyncio.Task[Any]"
+    ) -> None:
+        """Swap the new socket in; the old reader drains until it is closed."""
+        if session.handover is task:
+            session.handover = None
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            if session.ws is old_ws:
+                self.fail(session, error)
+            return
+
+        new_ws, keepalive_timeout = task.result()
+        if session.stop_event.is_set() or session.ws is not old_ws:
+            self.spawn(session, self.close_ws(new_ws))
+            return
+        self.install_socket(session, new_ws, keepalive_timeout)
+        session.handovers += 1
+        asyncio.get_running_loop().call_later(
+            EVENTSUB_HANDOVER_DRAIN_SECONDS,
+            lambda: self.spawn(session, self.close_ws(old_ws)),
+        )
+
+    async def close_ws(self, ws: Any) -> None:
+        if ws is None:
+            return
+        try:
+            await ws.close()
+        except Exception:
+            pass
+
+    async def resolve_twitch_ids(
+        self, tokens: AsyncTokenManager, channels: List[str], use_cache: bool = True
+    ) -> Tuple[str, Dict[str, str], bool]:
+        chat_user_id, from_cache = self.cached_chat_user_id(tokens, use_cache)
+        if not chat_user_id:
+            chat_user_id = self.store_chat_user_id(tokens, await self.validate_user_token(tokens))
+
+        client_id = tokens.auth["client_id"]
+        broadcaster_user_ids, missing = self.cached_broadcaster_ids(client_id, channels, use_cache)
+        if broadcaster_user_ids:
+            from_cache = True
+        if missing:
+            users = await self.fetch_users_by_login(tokens, missing)
+            broadcaster_user_ids.update(self.store_broadcaster_ids(client_id, missing, users))
+        return chat_user_id, {c: broadcaster_user_ids[c] for c in channels}, from_cache
+
+    async def connect_eventsub(self, session: AsyncTwitchSession) -> Tuple[Any, int]:
+        (
+            session.chat_user_id,
+            session.broadcaster_user_ids,
+            session.ids_from_cache,
+        ) = await self.resolve_twitch_ids(session.tokens, session.channels)
+        try:
+            return await self.establish_eventsub_session(
+                session, TwitchPlays_Connection.EVENTSUB_WEBSOCKET_URL, create_subscription=True
+            )
+        except TwitchStaleIdError:
+            if not session.ids_from_cache:
+                raise
+        print(f"Cached Twitch IDs for {session.channel} were rejected; looking them up again.")
+        self.forget_twitch_ids(session)
+        (
+            session.chat_user_id,
+            session.broadcaster_user_ids,
+            session.ids_from_cache,
+        ) = await self.resolve_twitch_ids(session.tokens, session.channels, use_cache=False)
+        return await self.establish_eventsub_session(
+            session, TwitchPlays_Connection.EVENTSUB_WEBSOCKET_URL, create_subscription=True
+        )
+
+    async def validate_user_token(self, tokens: AsyncTokenManager) -> Dict[str, Any]:
+        auth = tokens.auth
+        response = await self.request_token_validation(auth)
+        if response.status_code == 401:
+            auth = await tokens.refresh(stale_token=auth["access_token"])
+            response = await self.request_token_validation(auth)
+        data = self.parse_validated_token_response(auth, response)
+
+        if self.token_expires_soon(data):
+            auth = await tokens.refresh(stale_token=auth["access_token"])
+            response = await self.request_token_validation(auth)
+            data = self.parse_validated_token_response(auth, response)
+
+        tokens.update(data)
+        return data
+
+    async def request_token_validation(self, auth: Dict[str, str]) -> HttpResponse:
+        return await self.transport.twitch_http.request(
+            "GET",
+            TwitchPlays_Connection.TWITCH_OAUTH_VALIDATE_URL,
+            headers={"Authorization": f"OAuth {auth['access_token']}"},
+        )
+
+    async def refresh_access_token(
+        self, auth: Dict[str, str]
+    ) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        response = await self.transport.twitch_http.request(
+            "POST",
+            TwitchPlays_Connection.TWITCH_OAUTH_TOKEN_URL,
+            data=self.refresh_token_body(auth),
+        )
+        return self.apply_refreshed_token(auth, response)
+
+    async def fetch_users_by_login(
+        self, tokens: AsyncTokenManager, logins: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        batches = self.login_batches(logins)
+        responses = await asyncio.gather(
+            *(
+                self.request_helix(
+                    tokens,
+                    "GET",
+                    TwitchPlays_Connection.TWITCH_HELIX_USERS_URL,
+                    params={"login": batch},
+                )
+                for batch in batches
+            )
+        )
+        users: Dict[str, Dict[str, Any]] = {}
+        for batch, response in zip(batches, responses):
+            users.update(self.parse_users_lookup(batch, response))
+        return users
+
+    async def request_helix(
+        self,
+        tokens: AsyncTokenManager,
+        method: str,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Optional[Dict[str, Any]] = None,
+        allow_refresh: bool = True,
+    ) -> HttpResponse:
+        auth = tokens.auth
+        response = await self.transport.twitch_http.request(
+            method,
+            url,
+            params=params,
+            json_body=json_body,
+            headers=self.helix_headers(auth),
+        )
+        if response.status_code == 401 and allow_refresh:
+            await tokens.refresh(stale_token=auth["access_token"])
+            return await self.request_helix(
+                tokens,
+                method,
+                url,
+                params=params,
+                json_body=json_body,
+                allow_refresh=False,
+            )
+        return response
+
+    async def establish_eventsub_session(
+        self,
+        session: AsyncTwitchSession,
+        ws_url: str,
+        *,
+        create_subscription: bool,
+    ) -> Tuple[Any, int]:
+        ws = await self.open_websocket(ws_url)
+        try:
+            welcome = await self.wait_for_welcome(ws, session.channel)
+            welcome_session_id, keepalive_timeout = self.welcome_settings(welcome)
+            if create_subscription:
+                await self.create_chat_subscriptions(session, welcome_session_id)
+            return ws, keepalive_timeout
+        except BaseException:
+            await self.close_ws(ws)
+            raise
+
+    async def open_websocket(self, ws_url: str) -> AsyncWebSocket:
+        try:
+            return await asyncio.wait_for(
+                self.transport.websocket_http.websocket(ws_url), API_TIMEOUT_SECONDS
+            )
+        except Exception as exc:
+            raise RuntimeError(
+                f"Could not connect to the Twitch EventSub websocket. {exc!r}"
+            ) from exc
+
+    async def wait_for_welcome(self, ws: AsyncWebSocket, channel: str) -> Dict[str, Any]:
+        try:
+            return await asyncio.wait_for(
+                self.read_welcome(ws, channel), API_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise RuntimeError(
+                "Timed out while waiting for the Twitch EventSub welcome message."
+            ) from None
+
+    async def read_welcome(self, ws: AsyncWebSocket, channel: str) -> Dict[str, Any]:
+        while True:
+            try:
+                raw = await ws.recv()
+            except Exception as exc:
+                raise RuntimeError(
+                    f"Failed while waiting for the Twitch EventSub welcome message. {exc}"
+                ) from exc
+            if not raw:
+                raise RuntimeError(
+                    "Twitch EventSub closed the websocket before sending the welcome message."
+                )
+            message = self.welcome_message(raw, channel)
+            if message is not None:
+                return message
+
+    async def create_chat_subscriptions(
+        self, session: AsyncTwitchSession, session_id: str
+    ) -> None:
+        """Subscribe every channel concurrently on the shared Helix client."""
+        responses = await asyncio.gather(
+            *(
+                self.request_helix(
+                    session.tokens,
+                    "POST",
+                    TwitchPlays_Connection.TWITCH_HELIX_SUBSCRIPTIONS_URL,
+                    json_body=self.chat_subscription_body(session, session_id, broadcaster_user_id),
+                )
+                for broadcaster_user_id in session.broadcaster_user_ids.values()
+            )
+        )
+        for response in responses:
+            self.check_chat_subscription(response)
+
+
+class YouTube(TwitchPlays_Connection.YouTube):
+    """YouTube chat polled by a task on the shared transport loop.
+
+    Connecting is the threaded class's blocking call. After that a poll task
+    fetches with the async client at each next_fetch_time and queues
+    ChatMessages for twitch_receive_messages().
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        signal: Optional[IngestSignal] = None,
+        matcher: Optional[CommandMatcher] = None,
+        transport: Optional[AsyncTransportLoop] = None,
+    ) -> None:
+        super().__init__(api_key, signal, matcher)
+        self.transport = transport or transport_loop()
+        self.client: Optional[AsyncHttp] = None
+        self.poll_task: Optional["asyncio.Task[None]"] = None
+
+    def youtube_connect(
+        self,
+        channel_id: Optional[str],
+        stream_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+    ) -> None:
+        self.stop_polling()
+        super().youtube_connect(channel_id, stream_url, api_key)
+        self.poll_task = self.transport.start_task(self.poll_loop())
+
+    def close(self) -> None:
+        self.stop_polling()
+        super().close()
+
+    def stop_polling(self) -> None:
+        task, self.poll_task = self.poll_task, None
+        if task is not None:
+            self.transport.cancel_task(task)
+
+    def poll_deadline(self) -> Optional[float]:
+        # the poll task notifies the signal itself
+        return None
+
+    def twitch_receive_messages(self) -> List[ChatMessage]:
+        messages: List[ChatMessage] = []
+        while True:
+            try:
+                messages.append(self.message_queue.get_nowait())
+            except queue.Empty:
+                return messages
+
+    async def poll_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                delay = self.next_fetch_time - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                started = self.pacer.start()
+                try:
+                    if not self.use_api and self.session is None:
+                        await self.close_client()
+                        await loop.run_in_executor(None, self.reconnect, 0)
+                    if self.use_api:
+                        items = await self.api_fetch_messages_async()
+                    else:
+                        items = await self.fetch_messages_async()
+                except YouTubeScrapeError as exc:
+                    # retried after the pacer's backoff; the shared loop keeps running
+                    print(f"YouTube chat reconnect failed. {exc}")
+                    self.next_fetch_time = time.time() + self.pacer.failed(started)
+                    continue
+                except Exception:
+                    traceback.print_exc()
+                    self.next_fetch_time = time.time() + self.pacer.failed(started)
+                    await self.close_client()
+                    self.session = None
+                    continue
+                self.schedule_poll(started, len(items))
+
+                messages = self.chat_messages(items)
+                if messages:
+                    for message in messages:
+                        self.message_queue.put(message)
+                    if self.signal is not None:
+                        self.signal.notify()
+        finally:
+            await self.close_client()
+
+    def poll_client(self) -> AsyncHttp:
+        if self.client is None:
+            cookies = {"CONSENT": "YES+"}
+            if self.session is not None:
+                cookies.update(self.session.cookies.get_dict())
+            self.client = AsyncHttp(
+                headers={"User-Agent": YOUTUBE_USER_AGENT}, cookies=cookies
+            )
+        return self.client
+
+    async def close_client(self) -> None:
+        client, self.client = self.client, None
+        if client is not None:
+            await client.close()
+
+    async def api_fetch_messages_async(self) -> List[Dict[str, Any]]:
+        if not (self.api_key and self.live_chat_id):
+            return []
+
+        try:
+            r = await self.poll_client().request(
+                "GET",
+                f"{TwitchPlays_Connection.YOUTUBE_DATA_API_URL}/liveChat/messages",
+                params=self.api_messages_params(),
+                timeout=YOUTUBE_HTTP_TIMEOUT,
+            )
+        except Exception as e:
+            print(f"Failed to fetch API messages: {e}")
+            return []
+
+        if r.status_code == 403 and self.is_quota_error(r):
+            await self.close_client()
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.switch_to_scrape_mode, "quota on liveChatMessages.list"
+            )
+            return []
+
+        if not r.ok:
+            print(f"API fetch failed. {r.status_code} {r.reason}")
+            return []
+
+        return self.parse_api_messages(r.json(), time.monotonic())
+
+    async def fetch_messages_async(self) -> List[Dict[str, Any]]:
+        if self.session is None or not self.config:
+            return []
+
+        payload_bytes = self.live_chat_body()
+        try:
+            res = await self.poll_client().request(
+                "POST",
+                self.live_chat_url(),
+                data=payload_bytes,
+                timeout=YOUTUBE_HTTP_TIMEOUT,
+            )
+        except Exception as e:
+            print(f"Failed to fetch messages: {e}")
+            return []
+
+        if not res.ok:
+            print(f"Failed to fetch messages. {res.status_code} {res.reason}")
+            print("Body:", res.text[:500])
+            print("Payload:", payload_bytes)
+            # reconnect (and re-scrape) before the next poll
+            session, self.session = self.session, None
+            if session is not None:
+                session.close()
+            return []
+
+        try:
+            return self.parse_live_chat(res.text, time.monotonic())
+        except Exception:
+            print("Failed to parse messages.")
+            print("Body (truncated):", res.text[:800])
+            traceback.print_exc()
+            return []
@@ -9,9 +9,12 @@
 # Ignore the information above. Keeping it inside for nostalgia.
 
 import concurrent.futures
+import hashlib
 import importlib
 import json
+import os
 import queue
+import random
 import re
 import sys
 import threading
@@ -20,10 +23,14 @@ import traceback
 from collections import deque
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Deque, Dict, List, Optional, Set, Tuple, Type
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
 
 import requests
 
+import youtube_page
+from command_matcher import CommandMatcher
+from poll_pacer import PollPacer
+
 
 class FallbackWebSocketTimeoutException(Exception):
     pass
@@ -71,27 +78,155 @@ if not callable(websocket_create_connection):
         if not callable(websocket_create_connection):
             websocket_create_connection = None
 
+# Optional faster JSON decoders for EventSub frames
+try:
+    import msgspec
+except BaseException:
+    msgspec = None
+
+try:
+    import orjson
+except BaseException:
+    orjson = None
+
+API_CONNECT_TIMEOUT_SECONDS = 3.05
 API_TIMEOUT_SECONDS = 10
+EVENTSUB_BACKOFF_BASE_SECONDS = 0.5
 EVENTSUB_BACKOFF_MAX_SECONDS = 30
 EVENTSUB_CHAT_MESSAGE_TYPE = "channel.chat.message"
+EVENTSUB_HANDOVER_DRAIN_SECONDS = 2
+EVENTSUB_HANDOVER_POLL_SECONDS = 0.1
 EVENTSUB_KEEPALIVE_GRACE_SECONDS = 5
+# Twitch sends compact JSON, so chat text can never contain this unescaped.
+# Keepalives are ~170 chars and notifications several hundred, so longer
+# frames skip the scan.
+EVENTSUB_KEEPALIVE_MARKER = '"message_type":"session_keepalive"'
+EVENTSUB_KEEPALIVE_MAX_FRAME_LENGTH = 256
+# enabled subscriptions one EventSub WebSocket session may hold
+EVENTSUB_MAX_SUBSCRIPTIONS = 300
 EVENTSUB_WEBSOCKET_URL = "wss://eventsub.wss.twitch.tv/ws"
 MAX_STORED_MESSAGE_IDS = 2048
 TOKEN_REFRESH_MARGIN_SECONDS = 300
+TOKEN_REFRESH_RETRY_SECONDS = 30
+# Twitch asks apps to validate user tokens at least hourly
+TOKEN_VALIDATE_INTERVAL_SECONDS = 3600
 TWITCH_CONFIG_EXAMPLE_FILE_NAME = "twitch_config.example.json"
+# Environment variable that points at a different config file
+TWITCH_CONFIG_ENV_VAR = "TWITCHPLAYS_CONFIG"
 TWITCH_CONFIG_FILE_NAME = "twitch_config.json"
+# Resolved user IDs, kept next to the config file
+TWITCH_ID_CACHE_FILE_NAME = "twitch_id_cache.json"
+TWITCH_ID_CACHE_TTL_SECONDS = 7 * 24 * 3600
+# (connect, read) timeouts for Twitch REST calls
+TWITCH_HTTP_TIMEOUT = (API_CONNECT_TIMEOUT_SECONDS, API_TIMEOUT_SECONDS)
+# one pool per host (id.twitch.tv, api.twitch.tv); a reconnect needs one
+# socket each, the rest covers calls from several channels at once
+TWITCH_HTTP_POOL_CONNECTIONS = 4
+TWITCH_HTTP_POOL_MAXSIZE = 4
 TWITCH_HELIX_SUBSCRIPTIONS_URL = "https://api.twitch.tv/helix/eventsub/subscriptions"
 TWITCH_HELIX_USERS_URL = "https://api.twitch.tv/helix/users"
+# logins per Get Users call
+TWITCH_HELIX_USERS_BATCH = 100
 TWITCH_OAUTH_TOKEN_URL = "https://id.twitch.tv/oauth2/token"
 TWITCH_OAUTH_VALIDATE_URL = "https://id.twitch.tv/oauth2/validate"
 TWITCH_READ_CHAT_SCOPE = "user:read:chat"
+YOUTUBE_DATA_API_URL = "https://www.googleapis.com/youtube/v3"
 YOUTUBE_FETCH_INTERVAL = 1
+YOUTUBE_INNERTUBE_URL = "https://www.youtube.com/youtubei/v1"
+YOUTUBE_PAGE_URL = "https://youtube.com"
+# ytcfg values the get_live_chat calls need
+YOUTUBE_CONFIG_KEYS = ("INNERTUBE_API_KEY", "INNERTUBE_CONTEXT")
+# page loads while connecting; a hung fetch would stall the poll thread
+YOUTUBE_PAGE_TIMEOUT_SECONDS = 10
+YOUTUBE_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+EVENTSUB_JSON_DECODERS = tuple(
+    name
+    for name, module in (("msgspec", msgspec), ("orjson", orjson), ("json", json))
+    if module is not None
+)
+EVENTSUB_JSON_DECODER = EVENTSUB_JSON_DECODERS[0]
+
+if msgspec is not None:
+    # Just the fields handle_chat() reads; the decoder skips everything else.
+
+    class EventSubMessageText(msgspec.Struct):
+        text: str = ""
+
+    class EventSubChatEvent(msgspec.Struct):
+        broadcaster_user_login: str = ""
+        chatter_user_name: str = ""
+        chatter_user_login: str = ""
+        message_id: str = ""
+        message: EventSubMessageText = msgspec.field(default_factory=EventSubMessageText)
+
+    class EventSubSubscription(msgspec.Struct):
+        type: str = ""
+
+    class EventSubPayload(msgspec.Struct):
+        subscription: EventSubSubscription = msgspec.field(default_factory=EventSubSubscription)
+        event: EventSubChatEvent = msgspec.field(default_factory=EventSubChatEvent)
+
+    class EventSubMetadata(msgspec.Struct):
+        message_type: str = ""
+        subscription_type: str = ""
+
+    class EventSubFrame(msgspec.Struct):
+        metadata: EventSubMetadata = msgspec.field(default_factory=EventSubMetadata)
+        payload: EventSubPayload = msgspec.field(default_factory=EventSubPayload)
+
+    eventsub_frame_decoder: Any = msgspec.json.Decoder(EventSubFrame)
+else:
+    eventsub_frame_decoder = None
+
+
+def eventsub_loads(raw: Any) -> Any:
+    decoder = EVENTSUB_JSON_DECODER
+    if decoder == "msgspec":
+        return msgspec.json.decode(raw)
+    if decoder == "orjson":
+        return orjson.loads(raw)
+    if isinstance(raw, bytes):
+        raw = raw.decode("utf-8", errors="replace")
+    return json.loads(raw)
 
 
 def twitchplays_config_path() -> Path:
+    override = os.environ.get(TWITCH_CONFIG_ENV_VAR, "").strip()
+    if override:
+        return Path(override)
     return Path(__file__).with_name(TWITCH_CONFIG_FILE_NAME)
 
 
+twitch_http_session: Optional[requests.Session] = None
+twitch_http_lock = threading.Lock()
+
+
+def twitch_http() -> requests.Session:
+    """Keep-alive session shared by every Twitch OAuth and Helix call.
+
+    Reconnects reuse pooled sockets instead of paying a TCP+TLS handshake per
+    request. Requests are never retried here; callers already handle failures.
+    """
+    global twitch_http_session
+    with twitch_http_lock:
+        if twitch_http_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=TWITCH_HTTP_POOL_CONNECTIONS,
+                pool_maxsize=TWITCH_HTTP_POOL_MAXSIZE,
+                max_retries=0,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            twitch_http_session = session
+        return twitch_http_session
+
+
 def load_twitchplays_config() -> Dict[str, Any]:
     path = twitchplays_config_path()
     if not path.exists():
@@ -114,32 +249,385 @@ def load_twitchplays_config() -> Dict[str, Any]:
     return raw
 
 
+class ChatMessage:
+    """One chat line as it moves from a transport to the vote loop.
+
+    Stamps are time.monotonic() values for latency tracing. `command` is the
+    CommandMatcher id when the transport matched the line, else None.
+    `channel` is the Twitch channel (broadcaster login) the line was sent in,
+    so multi-channel runs can tell channels apart. `source` and `seq` are
+    stamped by IngestHub. get() and item access keep dict-style callers (the
+    template, user scripts) working.
+    """
+
+    __slots__ = (
+        "username",
+        "message",
+        "received_at",
+        "queued_at",
+        "drained_at",
+        "command",
+        "channel",
+        "source",
+        "seq",
+    )
+
+    def __init__(
+        self,
+        username: str,
+        message: str,
+        received_at: Optional[float] = None,
+        queued_at: Optional[float] = None,
+        command: Optional[int] = None,
+        channel: Optional[str] = None,
+    ) -> None:
+        self.username = username
+        self.message = message
+        self.received_at = received_at
+        self.queued_at = queued_at
+        self.drained_at: Optional[float] = None
+        self.command = command
+        self.channel = channel
+        self.source = ""
+        self.seq = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"ChatMessage(username={self.username!r}, message={self.message!r})"
+
+
+def normalize_username(username: str) -> str:
+    # interned so per-user dedupe hashes each chatter's name once
+    return sys.intern(username.strip().lower())
+
+
+def youtube_message_text(runs: List[Dict[str, Any]]) -> str:
+    parts = []
+    for part in runs:
+        if "text" in part:
+            parts.append(part["text"])
+        elif "emoji" in part:
+            parts.append(part["emoji"].get("emojiId", ""))
+    return "".join(parts)
+
+
+class TwitchIdCache:
+    """Persistent login -> user ID cache for Twitch, keyed by client_id.
+
+    The token owner's ID is keyed by a hash of the access token, so a new
+    token is validated once before its owner is trusted from the cache.
+    Entries expire after TWITCH_ID_CACHE_TTL_SECONDS and are dropped when
+    Twitch rejects a subscription built from them.
+    """
+
+    def __init__(self, path: Optional[Path] = None, ttl: float = TWITCH_ID_CACHE_TTL_SECONDS) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self.lock = threading.Lock()
+
+    def cache_path(self) -> Path:
+        return self.path or twitchplays_config_path().with_name(TWITCH_ID_CACHE_FILE_NAME)
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        if self.entries is None:
+            try:
+                raw = json.loads(self.cache_path().read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                raw = {}
+            self.entries = raw if isinstance(raw, dict) else {}
+        return self.entries
+
+    def save(self) -> None:
+        path = self.cache_path()
+        tmp_path = path.with_name(path.name + ".tmp")
+        try:
+            tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+            tmp_path.replace(path)
+        except OSError as exc:
+            print(f"Could not write Twitch ID cache {path}. {exc}")
+
+    def user_key(self, client_id: str, login: str) -> str:
+        return f"{client_id}:user:{login}"
+
+    def token_key(self, client_id: str, access_token: str) -> str:
+        digest = hashlib.sha256(access_token.encode("utf-8")).hexdigest()[:24]
+        return f"{client_id}:token:{digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.load().get(key)
+        if not isinstance(entry, dict):
+            return None
+        if time.time() - float(entry.get("cached_at") or 0) > self.ttl:
+            return None
+        return str(entry.get("id") or "").strip() or None
+
+    def put(self, key: str, user_id: str) -> None:
+        self.put_many({key: user_id})
+
+    def put_many(self, user_ids: Dict[str, str]) -> None:
+        """Store several IDs with one write."""
+        cached_at = int(time.time())
+        with self.lock:
+            entries = self.load()
+            for key, user_id in user_ids.items():
+                entries[key] = {"id": user_id, "cached_at": cached_at}
+            self.save()
+
+    def discard(self, *keys: str) -> None:
+        with self.lock:
+            entries = self.load()
+            if any([entries.pop(key, None) for key in keys]):
+                self.save()
+
+
+class IngestSignal:
+    """Shared wakeup for chat sources.
+
+    Producers call notify() after they queue messages. The vote loop calls
+    wait() with its window deadline and wakes on whichever comes first.
+    """
+
+    def __init__(self) -> None:
+        self.condition = threading.Condition()
+        self.pending = False
+
+    def notify(self) -> None:
+        with self.condition:
+            self.pending = True
+            self.condition.notify_all()
+
+    def wait(self, timeout: Optional[float]) -> bool:
+        with self.condition:
+            if not self.pending and (timeout is None or timeout > 0):
+                self.condition.wait(timeout)
+            was_pending = self.pending
+            self.pending = False
+            return was_pending
+
+
 @dataclass
 class TwitchSessionState:
+    # channels joined with ", ", for messages
     channel: str
-    auth: Dict[str, str]
+    tokens: "TwitchTokenManager"
     chat_user_id: str
-    broadcaster_user_id: str
-    token_refresh_at: Optional[float] = None
-    message_queue: "queue.Queue[Dict[str, str]]" = field(default_factory=queue.Queue)
+    channels: List[str] = field(default_factory=list)
+    # broadcaster login -> user ID; one chat subscription each
+    broadcaster_user_ids: Dict[str, str] = field(default_factory=dict)
+    # the IDs came from TwitchIdCache rather than this run's REST calls
+    ids_from_cache: bool = False
+    message_queue: "queue.Queue[ChatMessage]" = field(default_factory=queue.Queue)
     seen_message_ids: Deque[str] = field(default_factory=deque)
     seen_message_id_lookup: Set[str] = field(default_factory=set)
+    # two sockets are read at once during a handover
+    seen_message_lock: threading.Lock = field(default_factory=threading.Lock)
     stop_event: threading.Event = field(default_factory=threading.Event)
     ws: Any = None
     ws_lock: threading.Lock = field(default_factory=threading.Lock)
+    signal: Optional[IngestSignal] = None
+    # reconnect metrics, see Twitch.reconnect_stats()
+    handovers: int = 0
+    reconnects: int = 0
+    duplicate_messages: int = 0
+    reconnect_gap_seconds: float = 0.0
+    lost_messages_estimate: float = 0.0
+    # chat notifications in the last closed window (about a second) and the
+    # open one, for the chat rate up to the last frame
+    rate_previous_start: float = field(default_factory=time.monotonic)
+    rate_previous_count: int = 0
+    rate_window_start: float = field(default_factory=time.monotonic)
+    rate_window_count: int = 0
+    last_frame_at: float = field(default_factory=time.monotonic)
 
 
 class TwitchRevocationError(RuntimeError):
     pass
 
 
+class TwitchStaleIdError(RuntimeError):
+    """Twitch rejected a subscription condition, so the user IDs may be stale."""
+
+
+class YouTubeScrapeError(RuntimeError):
+    """The YouTube live page or live chat page could not be scraped."""
+
+
+class TwitchTokenManager:
+    """Keeps one Twitch user token valid on its own thread.
+
+    The token is validated hourly and refreshed TOKEN_REFRESH_MARGIN_SECONDS
+    before it expires, so the EventSub reader never waits on OAuth. `auth` is
+    replaced as a whole on refresh, never mutated, so a caller always sees a
+    matching access/refresh token pair.
+    """
+
+    def __init__(self, client: "Twitch", auth: Dict[str, str]) -> None:
+        self.client = client
+        self.auth = auth
+        # token owner, from the last validation (or the ID cache)
+        self.user_id: Optional[str] = None
+        self.refresh_at: Optional[float] = None
+        self.validate_at = time.time() + TOKEN_VALIDATE_INTERVAL_SECONDS
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(
+            target=self.run, name="twitchplays-token", daemon=True
+        )
+        self.thread.start()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.wake.set()
+        thread = self.thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join()
+
+    def update(self, token_info: Dict[str, Any]) -> None:
+        """Reschedule from a validate or refresh response."""
+        user_id = str(token_info.get("user_id") or "").strip()
+        if user_id:
+            self.user_id = user_id
+        self.refresh_at = self.client.next_token_refresh_at(token_info)
+        self.validate_at = time.time() + TOKEN_VALIDATE_INTERVAL_SECONDS
+        self.wake.set()
+
+    def validate_soon(self) -> None:
+        """Validate on the token thread instead of before connecting."""
+        self.validate_at = time.time()
+        self.wake.set()
+
+    def refresh(self, stale_token: Optional[str] = None) -> Dict[str, str]:
+        """Refresh and swap in the new token; returns the current auth.
+
+        With `stale_token`, nothing is refreshed if another caller already
+        replaced that token (two requests hitting 401 at once).
+        """
+        with self.lock:
+            if stale_token is not None and self.auth["access_token"] != stale_token:
+                return self.auth
+            auth, token_info = self.client.refresh_access_token(self.auth)
+            self.auth = auth
+            self.update(token_info)
+            return auth
+
+    def next_wakeup(self) -> float:
+        if self.refresh_at is None:
+            return self.validate_at
+        return min(self.refresh_at, self.validate_at)
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            self.wake.wait(max(0.0, self.next_wakeup() - time.time()))
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            now = time.time()
+            if now < self.next_wakeup():
+                # rescheduled by a refresh elsewhere
+                continue
+            refreshing = self.refresh_at is not None and now >= self.refresh_at
+            try:
+                if refreshing:
+                    self.refresh()
+                else:
+                    self.client.validate_user_token(self)
+            except Exception as exc:
+                print(
+                    f"Twitch token {'refresh' if refreshing else 'validation'} failed. "
+                    f"Retrying in {TOKEN_REFRESH_RETRY_SECONDS} seconds. {exc}"
+                )
+                retry_at = time.time() + TOKEN_REFRESH_RETRY_SECONDS
+                if refreshing:
+                    self.refresh_at = retry_at
+                else:
+                    self.validate_at = retry_at
+
+
+class EventSubHandover:
+    """Opens the next EventSub connection on a helper thread.
+
+    The reader keeps reading the current socket meanwhile and picks up the
+    new one from result() once `done` is set.
+    """
+
+    def __init__(self, connect: Any) -> None:
+        self.ws: Any = None
+        self.keepalive_timeout = 0
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run,
+            args=(connect,),
+            name="twitchplays-eventsub-handover",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def run(self, connect: Any) -> None:
+        try:
+            ws, keepalive_timeout = connect()
+        except BaseException as exc:
+            self.error = exc
+        else:
+            with self.lock:
+                if self.abandoned:
+                    ws.close()
+                else:
+                    self.ws, self.keepalive_timeout = ws, keepalive_timeout
+        self.done.set()
+
+    def result(self, timeout: Optional[float] = None) -> Tuple[Any, int]:
+        if not self.done.wait(timeout):
+            raise RuntimeError("Timed out opening the next Twitch EventSub connection.")
+        if self.error is not None:
+            raise self.error
+        return self.ws, self.keepalive_timeout
+
+    def abandon(self) -> None:
+        """Close the new socket now or as soon as it opens."""
+        with self.lock:
+            self.abandoned = True
+            ws, self.ws = self.ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+
 class Twitch:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        signal: Optional[IngestSignal] = None,
+        matcher: Optional[CommandMatcher] = None,
+    ) -> None:
         self.channel: str = ""
+        self.channels: List[str] = []
         self.session: Optional[TwitchSessionState] = None
         self.reader_thread: Optional[threading.Thread] = None
-
-    def twitch_connect(self, channel: str) -> None:
+        self.signal = signal
+        # with a matcher only commands are queued; the rest is counted here
+        self.matcher = matcher
+        self.rejected_messages = 0
+        self.id_cache = TwitchIdCache()
+
+    def twitch_connect(self, channel: Union[str, Iterable[str]]) -> None:
+        """Read one channel, or several ("a,b" or a list) on one EventSub session."""
         if websocket_create_connection is None:
             raise RuntimeError(
                 "Twitch EventSub requires websocket-client. Install it with `pip install -r requirements.txt`. If that is already installed, repair it with `python3 -m pip install --force-reinstall --no-cache-dir websocket-client`."
@@ -147,32 +635,25 @@ class Twitch:
 
         self.close()
 
-        normalized_channel = self.normalize_channel(channel)
-        if not normalized_channel:
-            raise RuntimeError("Twitch channel name is required.")
-
-        self.channel = normalized_channel
-        auth = self.load_auth()
+        self.channels = self.normalize_channels(channel)
+        self.channel = ", ".join(self.channels)
+        tokens = TwitchTokenManager(self, self.load_auth())
 
         print(f"Connecting to Twitch chat for {self.channel}...")
-        chat_user_id, broadcaster_user_id, token_refresh_at = self.resolve_twitch_ids(
-            auth, self.channel
-        )
         session = TwitchSessionState(
             channel=self.channel,
-            auth=auth,
-            chat_user_id=chat_user_id,
-            broadcaster_user_id=broadcaster_user_id,
-            token_refresh_at=token_refresh_at,
-        )
-        ws, keepalive_timeout = self.establish_eventsub_session(
-            session, EVENTSUB_WEBSOCKET_URL, create_subscription=True
+            tokens=tokens,
+            chat_user_id="",
+            channels=list(self.channels),
+            signal=self.signal,
         )
+        ws, keepalive_timeout = self.connect_eventsub(session)
 
         with session.ws_lock:
             session.ws = ws
 
         self.session = session
+        tokens.start()
 
         self.reader_thread = threading.Thread(
             target=self.reader_loop,
@@ -183,12 +664,12 @@ class Twitch:
         self.reader_thread.start()
         print(f"Twitch chat connected for {self.channel}.")
 
-    def twitch_receive_messages(self) -> List[Dict[str, str]]:
+    def twitch_receive_messages(self) -> List[ChatMessage]:
         session = self.session
         if session is None:
             return []
 
-        messages: List[Dict[str, str]] = []
+        messages: List[ChatMessage] = []
         while True:
             try:
                 messages.append(session.message_queue.get_nowait())
@@ -203,6 +684,7 @@ class Twitch:
 
         if session is not None:
             session.stop_event.set()
+            session.tokens.close()
             with session.ws_lock:
                 ws = session.ws
                 session.ws = None
@@ -218,6 +700,17 @@ class Twitch:
     def normalize_channel(self, channel: str) -> str:
         return str(channel or "").strip().lstrip("#").lower()
 
+    def normalize_channels(self, channel: Union[str, Iterable[str]]) -> List[str]:
+        names = re.split(r"[,\s]+", channel) if isinstance(channel, str) else list(channel or [])
+        channels = list(dict.fromkeys(filter(None, map(self.normalize_channel, names))))
+        if not channels:
+            raise RuntimeError("Twitch channel name is required.")
+        if len(channels) > EVENTSUB_MAX_SUBSCRIPTIONS:
+            raise RuntimeError(
+                f"One Twitch EventSub session can read at most {EVENTSUB_MAX_SUBSCRIPTIONS} channels."
+            )
+        return channels
+
     def load_auth(self) -> Dict[str, str]:
         raw = load_twitchplays_config()
         auth: Dict[str, str] = {}
@@ -245,47 +738,140 @@ class Twitch:
         )
 
     def resolve_twitch_ids(
-        self, auth: Dict[str, str], channel: str
-    ) -> Tuple[str, str, Optional[float]]:
-        token_info = self.validate_user_token(auth)
+        self, tokens: TwitchTokenManager, channels: List[str], use_cache: bool = True
+    ) -> Tuple[str, Dict[str, str], bool]:
+        """(chat user ID, login -> broadcaster user ID, whether any came from the cache).
+
+        Broadcasters missing from the cache are looked up together, up to
+        TWITCH_HELIX_USERS_BATCH per Get Users call.
+        """
+        chat_user_id, from_cache = self.cached_chat_user_id(tokens, use_cache)
+        if not chat_user_id:
+            chat_user_id = self.store_chat_user_id(tokens, self.validate_user_token(tokens))
+
+        client_id = tokens.auth["client_id"]
+        broadcaster_user_ids, missing = self.cached_broadcaster_ids(client_id, channels, use_cache)
+        if broadcaster_user_ids:
+            from_cache = True
+        if missing:
+            users = self.fetch_users_by_login(tokens, missing)
+            broadcaster_user_ids.update(self.store_broadcaster_ids(client_id, missing, users))
+        return chat_user_id, {c: broadcaster_user_ids[c] for c in channels}, from_cache
+
+    def cached_chat_user_id(
+        self, tokens: TwitchTokenManager, use_cache: bool
+    ) -> Tuple[Optional[str], bool]:
+        """(token owner ID if known without validating, whether it came from the cache)."""
+        if not use_cache:
+            return None, False
+        if tokens.user_id:
+            return tokens.user_id, False
+        cache = self.id_cache
+        chat_user_id = cache.get(cache.token_key(tokens.auth["client_id"], tokens.auth["access_token"]))
+        if not chat_user_id:
+            return None, False
+        tokens.user_id = chat_user_id
+        # still check scopes and expiry, just not before subscribing
+        tokens.validate_soon()
+        return chat_user_id, True
+
+    def store_chat_user_id(self, tokens: TwitchTokenManager, token_info: Dict[str, Any]) -> str:
         chat_user_id = str(token_info.get("user_id") or "").strip()
         if not chat_user_id:
             raise RuntimeError("Twitch token validation did not return a user_id.")
-
-        broadcaster = self.fetch_user_by_login(auth, channel)
-        broadcaster_user_id = str(broadcaster.get("id") or "").strip()
-        if not broadcaster_user_id:
-            raise RuntimeError(
-                f"Could not resolve a Twitch user ID for channel `{channel}`."
+        cache = self.id_cache
+        cache.put(cache.token_key(tokens.auth["client_id"], tokens.auth["access_token"]), chat_user_id)
+        return chat_user_id
+
+    def cached_broadcaster_ids(
+        self, client_id: str, channels: List[str], use_cache: bool
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """(cached login -> user ID, logins still to look up)."""
+        cache = self.id_cache
+        cached: Dict[str, str] = {}
+        missing: List[str] = []
+        for channel in channels:
+            user_id = cache.get(cache.user_key(client_id, channel)) if use_cache else None
+            if user_id:
+                cached[channel] = user_id
+            else:
+                missing.append(channel)
+        return cached, missing
+
+    def store_broadcaster_ids(
+        self, client_id: str, logins: List[str], users: Dict[str, Dict[str, Any]]
+    ) -> Dict[str, str]:
+        user_ids: Dict[str, str] = {}
+        for login in logins:
+            user_id = str((users.get(login) or {}).get("id") or "").strip()
+            if not user_id:
+                raise RuntimeError(f"Could not find Twitch user `{login}`.")
+            user_ids[login] = user_id
+        cache = self.id_cache
+        cache.put_many({cache.user_key(client_id, login): user_id for login, user_id in user_ids.items()})
+        return user_ids
+
+    def forget_twitch_ids(self, session: TwitchSessionState) -> None:
+        cache = self.id_cache
+        auth = session.tokens.auth
+        cache.discard(
+            *(cache.user_key(auth["client_id"], channel) for channel in session.channels),
+            cache.token_key(auth["client_id"], auth["access_token"]),
+        )
+        session.tokens.user_id = None
+
+    def connect_eventsub(self, session: TwitchSessionState) -> Tuple[Any, int]:
+        """Resolve IDs (cached when possible), open EventSub and subscribe.
+
+        If Twitch rejects a subscription built from cached IDs, the cache
+        entries are dropped and the IDs are looked up again once.
+        """
+        (
+            session.chat_user_id,
+            session.broadcaster_user_ids,
+            session.ids_from_cache,
+        ) = self.resolve_twitch_ids(session.tokens, session.channels)
+        try:
+            return self.establish_eventsub_session(
+                session, EVENTSUB_WEBSOCKET_URL, create_subscription=True
             )
-        return chat_user_id, broadcaster_user_id, self.next_token_refresh_at(token_info)
-
-    def validate_user_token(self, auth: Dict[str, str]) -> Dict[str, Any]:
-        response = requests.get(
-            TWITCH_OAUTH_VALIDATE_URL,
-            headers={"Authorization": f"OAuth {auth['access_token']}"},
-            timeout=API_TIMEOUT_SECONDS,
+        except TwitchStaleIdError:
+            if not session.ids_from_cache:
+                raise
+        print(f"Cached Twitch IDs for {session.channel} were rejected; looking them up again.")
+        self.forget_twitch_ids(session)
+        (
+            session.chat_user_id,
+            session.broadcaster_user_ids,
+            session.ids_from_cache,
+        ) = self.resolve_twitch_ids(session.tokens, session.channels, use_cache=False)
+        return self.establish_eventsub_session(
+            session, EVENTSUB_WEBSOCKET_URL, create_subscription=True
         )
+
+    def validate_user_token(self, tokens: TwitchTokenManager) -> Dict[str, Any]:
+        auth = tokens.auth
+        response = self.request_token_validation(auth)
         if response.status_code == 401:
-            self.refresh_access_token(auth)
-            response = requests.get(
-                TWITCH_OAUTH_VALIDATE_URL,
-                headers={"Authorization": f"OAuth {auth['access_token']}"},
-                timeout=API_TIMEOUT_SECONDS,
-            )
+            auth = tokens.refresh(stale_token=auth["access_token"])
+            response = self.request_token_validation(auth)
         data = self.parse_validated_token_response(auth, response)
 
         if self.token_expires_soon(data):
-            self.refresh_access_token(auth)
-            response = requests.get(
-                TWITCH_OAUTH_VALIDATE_URL,
-                headers={"Authorization": f"OAuth {auth['access_token']}"},
-                timeout=API_TIMEOUT_SECONDS,
-            )
+            auth = tokens.refresh(stale_token=auth["access_token"])
+            response = self.request_token_validation(auth)
             data = self.parse_validated_token_response(auth, response)
 
+        tokens.update(data)
         return data
 
+    def request_token_validation(self, auth: Dict[str, str]) -> requests.Response:
+        return twitch_http().get(
+            TWITCH_OAUTH_VALIDATE_URL,
+            headers={"Authorization": f"OAuth {auth['access_token']}"},
+            timeout=TWITCH_HTTP_TIMEOUT,
+        )
+
     def parse_validated_token_response(
         self, auth: Dict[str, str], response: requests.Response
     ) -> Dict[str, Any]:
@@ -334,15 +920,18 @@ class Twitch:
 
         return time.time() + max(0, expires_in - TOKEN_REFRESH_MARGIN_SECONDS)
 
-    def refresh_token_if_due(self, session: TwitchSessionState) -> None:
-        if session.token_refresh_at is None or time.time() < session.token_refresh_at:
-            return
-
-        self.refresh_access_token(session.auth)
-        token_info = self.validate_user_token(session.auth)
-        session.token_refresh_at = self.next_token_refresh_at(token_info)
+    def refresh_access_token(
+        self, auth: Dict[str, str]
+    ) -> Tuple[Dict[str, str], Dict[str, Any]]:
+        """Returns a new auth dict (saved to the config) and the token response."""
+        response = twitch_http().post(
+            TWITCH_OAUTH_TOKEN_URL,
+            data=self.refresh_token_body(auth),
+            timeout=TWITCH_HTTP_TIMEOUT,
+        )
+        return self.apply_refreshed_token(auth, response)
 
-    def refresh_access_token(self, auth: Dict[str, str]) -> None:
+    def refresh_token_body(self, auth: Dict[str, str]) -> Dict[str, str]:
         body = {
             "client_id": auth["client_id"],
             "grant_type": "refresh_token",
@@ -351,12 +940,11 @@ class Twitch:
         client_secret = str(auth.get("client_secret") or "").strip()
         if client_secret:
             body["client_secret"] = client_secret
+        return body
 
-        response = requests.post(
-            TWITCH_OAUTH_TOKEN_URL,
-            data=body,
-            timeout=API_TIMEOUT_SECONDS,
-        )
+    def apply_refreshed_token(
+        self, auth: Dict[str, str], response: requests.Response
+    ) -> Tuple[Dict[str, str], Dict[str, Any]]:
         if not response.ok:
             raise RuntimeError(
                 f"Twitch token refresh failed. {self.describe_response_error(response)}"
@@ -372,33 +960,55 @@ class Twitch:
                 "Twitch token refresh response did not include an access_token."
             )
 
-        auth["access_token"] = new_access_token
+        new_auth = dict(auth)
+        new_auth["access_token"] = new_access_token
         new_refresh_token = str(data.get("refresh_token") or "").strip()
         if new_refresh_token:
-            auth["refresh_token"] = new_refresh_token
-        self.save_auth(auth)
+            new_auth["refresh_token"] = new_refresh_token
+        self.save_auth(new_auth)
         print("Refreshed Twitch access token.")
-
-    def fetch_user_by_login(self, auth: Dict[str, str], login: str) -> Dict[str, Any]:
-        response = self.request_helix(
-            auth,
-            "GET",
-            TWITCH_HELIX_USERS_URL,
-            params={"login": login},
-        )
+        return new_auth, data
+
+    def fetch_users_by_login(
+        self, tokens: TwitchTokenManager, logins: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """login -> user for every login Twitch knows, in batched Get Users calls."""
+        users: Dict[str, Dict[str, Any]] = {}
+        for batch in self.login_batches(logins):
+            response = self.request_helix(
+                tokens,
+                "GET",
+                TWITCH_HELIX_USERS_URL,
+                params={"login": batch},
+            )
+            users.update(self.parse_users_lookup(batch, response))
+        return users
+
+    def login_batches(self, logins: List[str]) -> List[List[str]]:
+        return [
+            logins[start : start + TWITCH_HELIX_USERS_BATCH]
+            for start in range(0, len(logins), TWITCH_HELIX_USERS_BATCH)
+        ]
+
+    def parse_users_lookup(
+        self, logins: List[str], response: requests.Response
+    ) -> Dict[str, Dict[str, Any]]:
         if not response.ok:
+            names = ", ".join(f"`{login}`" for login in logins)
             raise RuntimeError(
-                f"Could not look up Twitch user `{login}`. {self.describe_response_error(response)}"
+                f"Could not look up Twitch users {names}. {self.describe_response_error(response)}"
             )
 
         data = response.json().get("data") or []
-        if not data:
-            raise RuntimeError(f"Could not find Twitch user `{login}`.")
-        return data[0]
+        return {
+            str(user.get("login") or "").lower(): user
+            for user in data
+            if isinstance(user, dict)
+        }
 
     def request_helix(
         self,
-        auth: Dict[str, str],
+        tokens: TwitchTokenManager,
         method: str,
         url: str,
         *,
@@ -406,22 +1016,19 @@ class Twitch:
         json_body: Optional[Dict[str, Any]] = None,
         allow_refresh: bool = True,
     ) -> requests.Response:
-        response = requests.request(
+        auth = tokens.auth
+        response = twitch_http().request(
             method,
             url,
             params=params,
             json=json_body,
-            headers={
-                "Authorization": f"Bearer {auth['access_token']}",
-                "Client-Id": auth["client_id"],
-                "Content-Type": "application/json",
-            },
-            timeout=API_TIMEOUT_SECONDS,
+            headers=self.helix_headers(auth),
+            timeout=TWITCH_HTTP_TIMEOUT,
         )
         if response.status_code == 401 and allow_refresh:
-            self.refresh_access_token(auth)
+            tokens.refresh(stale_token=auth["access_token"])
             return self.request_helix(
-                auth,
+                tokens,
                 method,
                 url,
                 params=params,
@@ -430,6 +1037,13 @@ class Twitch:
             )
         return response
 
+    def helix_headers(self, auth: Dict[str, str]) -> Dict[str, str]:
+        return {
+            "Authorization": f"Bearer {auth['access_token']}",
+            "Client-Id": auth["client_id"],
+            "Content-Type": "application/json",
+        }
+
     def establish_eventsub_session(
         self,
         session: TwitchSessionState,
@@ -440,22 +1054,25 @@ class Twitch:
         ws = self.open_websocket(ws_url)
         try:
             welcome = self.wait_for_welcome(ws, session.channel)
-            welcome_session = welcome.get("payload", {}).get("session", {})
-            keepalive_timeout = int(
-                welcome_session.get("keepalive_timeout_seconds") or 10
-            )
-            welcome_session_id = str(welcome_session.get("id") or "").strip()
-            if not welcome_session_id:
-                raise RuntimeError(
-                    "Twitch EventSub welcome message did not include a session ID."
-                )
+            welcome_session_id, keepalive_timeout = self.welcome_settings(welcome)
             if create_subscription:
-                self.create_chat_subscription(session, welcome_session_id)
+                self.create_chat_subscriptions(session, welcome_session_id)
             return ws, keepalive_timeout
         except Exception:
             self.safe_close_ws(ws)
             raise
 
+    def welcome_settings(self, welcome: Dict[str, Any]) -> Tuple[str, int]:
+        """(session ID, keepalive timeout) from a session_welcome message."""
+        welcome_session = welcome.get("payload", {}).get("session", {})
+        keepalive_timeout = int(welcome_session.get("keepalive_timeout_seconds") or 10)
+        welcome_session_id = str(welcome_session.get("id") or "").strip()
+        if not welcome_session_id:
+            raise RuntimeError(
+                "Twitch EventSub welcome message did not include a session ID."
+            )
+        return welcome_session_id, keepalive_timeout
+
     def open_websocket(self, ws_url: str) -> Any:
         try:
             if websocket_create_connection is None:
@@ -489,36 +1106,52 @@ class Twitch:
                     "Twitch EventSub closed the websocket before sending the welcome message."
                 )
 
-            message = self.parse_eventsub_message(raw)
-            message_type = self.message_type(message)
-            if message_type == "session_welcome":
+            message = self.welcome_message(raw, channel)
+            if message is not None:
                 return message
-            if message_type == "revocation":
-                raise TwitchRevocationError(
-                    self.format_revocation_message(message, channel)
-                )
         raise RuntimeError(
             "Timed out while waiting for the Twitch EventSub welcome message."
         )
 
-    def create_chat_subscription(
+    def welcome_message(self, raw: Any, channel: str) -> Optional[Dict[str, Any]]:
+        """The parsed frame if it is the welcome; raises on a revocation."""
+        message = self.parse_eventsub_message(raw)
+        message_type = self.message_type(message)
+        if message_type == "revocation":
+            raise TwitchRevocationError(self.format_revocation_message(message, channel))
+        return message if message_type == "session_welcome" else None
+
+    def create_chat_subscriptions(
         self, session: TwitchSessionState, session_id: str
     ) -> None:
-        body = {
+        """One channel.chat.message subscription per channel, all on this session."""
+        for broadcaster_user_id in session.broadcaster_user_ids.values():
+            response = self.request_helix(
+                session.tokens,
+                "POST",
+                TWITCH_HELIX_SUBSCRIPTIONS_URL,
+                json_body=self.chat_subscription_body(session, session_id, broadcaster_user_id),
+            )
+            self.check_chat_subscription(response)
+
+    def chat_subscription_body(
+        self, session: TwitchSessionState, session_id: str, broadcaster_user_id: str
+    ) -> Dict[str, Any]:
+        return {
             "type": EVENTSUB_CHAT_MESSAGE_TYPE,
             "version": "1",
             "condition": {
-                "broadcaster_user_id": session.broadcaster_user_id,
+                "broadcaster_user_id": broadcaster_user_id,
                 "user_id": session.chat_user_id,
             },
             "transport": {"method": "websocket", "session_id": session_id},
         }
-        response = self.request_helix(
-            session.auth,
-            "POST",
-            TWITCH_HELIX_SUBSCRIPTIONS_URL,
-            json_body=body,
-        )
+
+    def check_chat_subscription(self, response: requests.Response) -> None:
+        if response.status_code in (400, 403, 404):
+            raise TwitchStaleIdError(
+                f"Could not create the Twitch chat subscription. {self.describe_response_error(response)}"
+            )
         if response.status_code not in (200, 202):
             raise RuntimeError(
                 f"Could not create the Twitch chat subscription. {self.describe_response_error(response)}"
@@ -532,78 +1165,16 @@ class Twitch:
     ) -> None:
         ws = initial_ws
         keepalive_timeout = initial_keepalive_timeout
-        keepalive_deadline = self.next_keepalive_deadline(keepalive_timeout)
-        reconnect_backoff = 1
+        failures = 0
 
         while not session.stop_event.is_set():
             try:
-                while not session.stop_event.is_set():
-                    self.refresh_token_if_due(session)
-                    try:
-                        raw = ws.recv()
-                    except WebSocketTimeoutException:
-                        if time.time() > keepalive_deadline:
-                            raise RuntimeError(
-                                "Timed out waiting for Twitch EventSub keepalive traffic."
-                            )
-                        continue
-                    except WebSocketConnectionClosedException as exc:
-                        raise RuntimeError("Twitch EventSub websocket closed.") from exc
-                    except Exception as exc:
-                        raise RuntimeError(
-                            f"Twitch EventSub websocket read failed. {exc}"
-                        ) from exc
-
-                    if raw is None:
-                        raise RuntimeError("Twitch EventSub websocket closed.")
-
-                    message = self.parse_eventsub_message(raw)
-                    message_type = self.message_type(message)
-                    keepalive_deadline = self.next_keepalive_deadline(keepalive_timeout)
-
-                    if message_type == "session_keepalive":
-                        continue
-                    if message_type == "notification":
-                        self.handle_notification(session, message)
-                        continue
-                    if message_type == "session_reconnect":
-                        reconnect_url = (
-                            message.get("payload", {})
-                            .get("session", {})
-                            .get("reconnect_url")
-                        )
-                        if not reconnect_url:
-                            raise RuntimeError(
-                                "Twitch asked for a reconnect without a reconnect_url."
-                            )
-                        new_ws, keepalive_timeout = self.establish_eventsub_session(
-                            session, reconnect_url, create_subscription=False
-                        )
-                        with session.ws_lock:
-                            if session.ws is ws:
-                                session.ws = new_ws
-                        self.safe_close_ws(ws)
-                        ws = new_ws
-                        keepalive_deadline = self.next_keepalive_deadline(
-                            keepalive_timeout
-                        )
-                        print(
-                            f"Twitch requested a websocket reconnect for {session.channel}."
-                        )
-                        continue
-                    if message_type == "revocation":
-                        raise TwitchRevocationError(
-                            self.format_revocation_message(message, session.channel)
-                        )
-                    if message_type == "session_welcome":
-                        welcome_session = message.get("payload", {}).get("session", {})
-                        keepalive_timeout = int(
-                            welcome_session.get("keepalive_timeout_seconds")
-                            or keepalive_timeout
-                        )
-                        keepalive_deadline = self.next_keepalive_deadline(
-                            keepalive_timeout
-                        )
+                # token refresh runs on session.tokens' thread; this loop
+                # only blocks in recv
+                ws, keepalive_timeout = self.read_until_handover(
+                    session, ws, keepalive_timeout
+                )
+                continue
             except TwitchRevocationError as exc:
                 session.stop_event.set()
                 print(f"Twitch chat transport stopped for {session.channel}. {exc}")
@@ -611,29 +1182,22 @@ class Twitch:
             except Exception as exc:
                 if session.stop_event.is_set():
                     break
-
                 print(
-                    f"Twitch chat transport failed for {session.channel}. Reconnecting in {reconnect_backoff} seconds. {exc}"
+                    f"Twitch chat transport failed for {session.channel}. Reconnecting. {exc}"
                 )
                 self.safe_close_ws(ws)
                 with session.ws_lock:
                     if session.ws is ws:
                         session.ws = None
+                ws = None
 
-                if session.stop_event.wait(reconnect_backoff):
-                    break
-
+            # the socket is gone, so nothing arrives until a new subscription
+            # exists; the first attempt goes out at once
+            gap_started = session.last_frame_at
+            while not session.stop_event.is_set():
                 try:
-                    (
-                        session.chat_user_id,
-                        session.broadcaster_user_id,
-                        session.token_refresh_at,
-                    ) = self.resolve_twitch_ids(session.auth, session.channel)
-                    ws, keepalive_timeout = self.establish_eventsub_session(
-                        session,
-                        EVENTSUB_WEBSOCKET_URL,
-                        create_subscription=True,
-                    )
+                    ws, keepalive_timeout = self.connect_eventsub(session)
+                    break
                 except TwitchRevocationError as reconnect_exc:
                     session.stop_event.set()
                     print(
@@ -641,34 +1205,263 @@ class Twitch:
                     )
                     break
                 except Exception as reconnect_exc:
+                    failures += 1
+                    delay = self.reconnect_delay(failures)
                     print(
-                        f"Twitch chat reconnect failed for {session.channel}. {reconnect_exc}"
-                    )
-                    reconnect_backoff = min(
-                        EVENTSUB_BACKOFF_MAX_SECONDS, reconnect_backoff * 2
+                        f"Twitch chat reconnect failed for {session.channel}. Retrying in {delay:.1f} seconds. {reconnect_exc}"
                     )
-                    continue
+                    session.stop_event.wait(delay)
+            if ws is None:
+                break
 
-                with session.ws_lock:
-                    session.ws = ws
-                keepalive_deadline = self.next_keepalive_deadline(keepalive_timeout)
-                reconnect_backoff = 1
-                print(f"Twitch chat reconnected for {session.channel}.")
+            with session.ws_lock:
+                session.ws = ws
+            failures = 0
+            session.reconnects += 1
+            missed = self.record_reconnect_gap(session, gap_started)
+            print(
+                f"Twitch chat reconnected for {session.channel}; about {missed} messages were missed."
+            )
 
         with session.ws_lock:
             if session.ws is ws:
                 session.ws = None
         self.safe_close_ws(ws)
 
+    def read_until_handover(
+        self,
+        session: TwitchSessionState,
+        ws: Any,
+        keepalive_timeout: int,
+    ) -> Tuple[Any, int]:
+        """Read `ws` until a replacement connection is ready, then return it.
+
+        On session_reconnect, or when keepalives stop, the next connection
+        is opened by an EventSubHandover while this socket is still read.
+        Once it is ready the old socket is left to drain_socket() on its own
+        thread until Twitch closes it, so no message in flight on either
+        socket is dropped; duplicates are caught by track_message_id().
+        """
+        keepalive_deadline = self.next_keepalive_deadline(keepalive_timeout)
+        handover: Optional[EventSubHandover] = None
+        try:
+            while not session.stop_event.is_set():
+                if handover is not None and handover.done.is_set():
+                    break
+                try:
+                    raw = ws.recv()
+                except WebSocketTimeoutException:
+                    if handover is None and time.time() > keepalive_deadline:
+                        # the socket may still be alive, so keep listening
+                        # while a fresh session subscribes
+                        print(
+                            f"Twitch EventSub keepalives stopped for {session.channel}; opening a new session."
+                        )
+                        handover = self.start_handover(
+                            session, ws, lambda: self.connect_eventsub(session)
+                        )
+                    continue
+                except WebSocketConnectionClosedException as exc:
+                    if handover is not None:
+                        break
+                    raise RuntimeError("Twitch EventSub websocket closed.") from exc
+                except Exception as exc:
+                    if handover is not None:
+                        break
+                    raise RuntimeError(
+                        f"Twitch EventSub websocket read failed. {exc}"
+                    ) from exc
+
+                # websocket-client returns "" for a close frame
+                if not raw:
+                    if handover is not None:
+                        break
+                    raise RuntimeError("Twitch EventSub websocket closed.")
+                received_at = time.monotonic()
+                session.last_frame_at = received_at
+
+                message_type, message = self.decode_eventsub_frame(raw)
+                keepalive_deadline = self.next_keepalive_deadline(keepalive_timeout)
+
+                if message_type == "session_keepalive":
+                    continue
+                if message_type == "notification":
+                    self.handle_chat(session, message, received_at)
+                    continue
+                if message_type == "session_reconnect":
+                    if handover is not None:
+                        continue
+                    reconnect_url = (
+                        message.get("payload", {})
+                        .get("session", {})
+                        .get("reconnect_url")
+                    )
+                    if not reconnect_url:
+                        raise RuntimeError(
+                            "Twitch asked for a reconnect without a reconnect_url."
+                        )
+                    print(
+                        f"Twitch requested a websocket reconnect for {session.channel}."
+                    )
+                    handover = self.start_handover(
+                        session,
+                        ws,
+                        lambda: self.establish_eventsub_session(
+                            session, reconnect_url, create_subscription=False
+                        ),
+                    )
+                    continue
+                if message_type == "revocation":
+                    self.revoke_channel(session, message)
+                    continue
+                if message_type == "session_welcome":
+                    welcome_session = message.get("payload", {}).get("session", {})
+                    keepalive_timeout = int(
+                        welcome_session.get("keepalive_timeout_seconds")
+                        or keepalive_timeout
+                    )
+                    keepalive_deadline = self.next_keepalive_deadline(
+                        keepalive_timeout
+                    )
+
+            if session.stop_event.is_set():
+                if handover is not None:
+                    handover.abandon()
+                return ws, keepalive_timeout
+            # the old socket may have closed first; wait for its replacement
+            new_ws, new_keepalive_timeout = handover.result(API_TIMEOUT_SECONDS * 2)
+        except BaseException:
+            if handover is not None:
+                handover.abandon()
+            raise
+
+        with session.ws_lock:
+            if session.ws is ws:
+                session.ws = new_ws
+        session.handovers += 1
+        threading.Thread(
+            target=self.drain_socket,
+            args=(session, ws),
+            name="twitchplays-eventsub-drain",
+            daemon=True,
+        ).start()
+        return new_ws, new_keepalive_timeout
+
+    def start_handover(
+        self, session: TwitchSessionState, ws: Any, connect: Any
+    ) -> EventSubHandover:
+        # poll the old socket often enough to notice the new one is ready
+        try:
+            ws.settimeout(EVENTSUB_HANDOVER_POLL_SECONDS)
+        except Exception:
+            pass
+        return EventSubHandover(connect)
+
+    def drain_socket(self, session: TwitchSessionState, ws: Any) -> None:
+        """Deliver what is still in flight on a replaced socket, then close it."""
+        deadline = time.monotonic() + EVENTSUB_HANDOVER_DRAIN_SECONDS
+        try:
+            while time.monotonic() < deadline and not session.stop_event.is_set():
+                try:
+                    raw = ws.recv()
+                except WebSocketTimeoutException:
+                    continue
+                except Exception:
+                    break
+                if not raw:
+                    break
+                received_at = time.monotonic()
+                try:
+                    message_type, message = self.decode_eventsub_frame(raw)
+                except RuntimeError:
+                    continue
+                if message_type == "notification":
+                    self.handle_chat(session, message, received_at)
+        finally:
+            self.safe_close_ws(ws)
+
+    def reconnect_delay(self, failures: int) -> float:
+        # full jitter, so a fleet of runners does not retry in lockstep
+        ceiling = min(
+            EVENTSUB_BACKOFF_MAX_SECONDS,
+            EVENTSUB_BACKOFF_BASE_SECONDS * (2 ** min(failures, 16)),
+        )
+        return random.uniform(EVENTSUB_BACKOFF_BASE_SECONDS, ceiling)
+
+    def record_reconnect_gap(self, session: TwitchSessionState, gap_started: float) -> int:
+        """Add the time with no subscription to the metrics; returns the estimate.
+
+        The gap runs from the last frame read, so a socket that went quiet
+        before the keepalive timeout noticed it counts in full, at the chat
+        rate over the windows leading up to that frame.
+        """
+        gap = max(0.0, time.monotonic() - gap_started)
+        span = max(1.0, gap_started - session.rate_previous_start)
+        missed = (session.rate_previous_count + session.rate_window_count) / span * gap
+        session.reconnect_gap_seconds += gap
+        session.lost_messages_estimate += missed
+        return round(missed)
+
+    def reconnect_stats(self) -> Dict[str, Any]:
+        """Reconnect counters for the current session.
+
+        lost_messages_estimate is the chat rate before each hard reconnect
+        times the time from the last frame read until the new subscription;
+        handovers lose nothing.
+        """
+        session = self.session
+        if session is None:
+            return {}
+        return {
+            "handovers": session.handovers,
+            "reconnects": session.reconnects,
+            "duplicate_messages": session.duplicate_messages,
+            "reconnect_gap_seconds": round(session.reconnect_gap_seconds, 3),
+            "lost_messages_estimate": round(session.lost_messages_estimate),
+        }
+
     def next_keepalive_deadline(self, keepalive_timeout: int) -> float:
         return time.time() + keepalive_timeout + EVENTSUB_KEEPALIVE_GRACE_SECONDS
 
-    def parse_eventsub_message(self, raw: Any) -> Dict[str, Any]:
+    def decode_eventsub_frame(self, raw: Any) -> Tuple[str, Any]:
+        """(message_type, body) for one EventSub frame.
+
+        Keepalives are spotted by substring and never parsed (body None).
+        Notifications come back as chat_fields() tuples, decoded straight into
+        structs when msgspec is the decoder. Anything else is the parsed dict.
+        """
+        marker = EVENTSUB_KEEPALIVE_MARKER
         if isinstance(raw, bytes):
-            raw = raw.decode("utf-8", errors="replace")
+            marker = marker.encode("ascii")
+        if len(raw) <= EVENTSUB_KEEPALIVE_MAX_FRAME_LENGTH and marker in raw:
+            return "session_keepalive", None
+
+        if EVENTSUB_JSON_DECODER == "msgspec":
+            try:
+                frame = eventsub_frame_decoder.decode(raw)
+            except ValueError:
+                # other schema or bad JSON; the dict path sorts it out
+                frame = None
+            if frame is not None and frame.metadata.message_type == "notification":
+                event = frame.payload.event
+                return "notification", (
+                    frame.payload.subscription.type or frame.metadata.subscription_type,
+                    event.chatter_user_name or event.chatter_user_login,
+                    event.message.text,
+                    event.message_id,
+                    event.broadcaster_user_login,
+                )
+
+        message = self.parse_eventsub_message(raw)
+        message_type = self.message_type(message)
+        if message_type == "notification":
+            return message_type, self.chat_fields(message)
+        return message_type, message
+
+    def parse_eventsub_message(self, raw: Any) -> Dict[str, Any]:
         try:
-            data = json.loads(raw)
-        except json.JSONDecodeError as exc:
+            data = eventsub_loads(raw)
+        except ValueError as exc:
             raise RuntimeError("Received malformed JSON from Twitch EventSub.") from exc
         if not isinstance(data, dict):
             raise RuntimeError("Received an invalid payload from Twitch EventSub.")
@@ -678,46 +1471,118 @@ class Twitch:
         metadata = message.get("metadata") or {}
         return str(metadata.get("message_type") or "").strip()
 
-    def handle_notification(
-        self, session: TwitchSessionState, message: Dict[str, Any]
-    ) -> None:
+    def chat_fields(self, message: Dict[str, Any]) -> Tuple[str, str, str, str, str]:
+        """(subscription type, username, text, message id, channel) of a notification."""
         payload = message.get("payload") or {}
         subscription = payload.get("subscription") or {}
         event = payload.get("event") or {}
-        subscription_type = str(
-            subscription.get("type")
-            or (message.get("metadata") or {}).get("subscription_type")
-            or ""
-        ).strip()
-        if subscription_type != EVENTSUB_CHAT_MESSAGE_TYPE:
-            return
+        return (
+            str(
+                subscription.get("type")
+                or (message.get("metadata") or {}).get("subscription_type")
+                or ""
+            ),
+            str(event.get("chatter_user_name") or event.get("chatter_user_login") or ""),
+            str((event.get("message") or {}).get("text") or ""),
+            str(event.get("message_id") or ""),
+            str(event.get("broadcaster_user_login") or ""),
+        )
 
-        message_id = str(event.get("message_id") or "").strip()
-        if message_id and not self.track_message_id(session, message_id):
+    def handle_notification(
+        self,
+        session: TwitchSessionState,
+        message: Dict[str, Any],
+        received_at: Optional[float] = None,
+    ) -> None:
+        self.handle_chat(session, self.chat_fields(message), received_at)
+
+    def handle_chat(
+        self,
+        session: TwitchSessionState,
+        fields: Tuple[str, str, str, str, str],
+        received_at: Optional[float] = None,
+    ) -> None:
+        subscription_type, username, message_text, message_id, channel = fields
+        if subscription_type.strip() != EVENTSUB_CHAT_MESSAGE_TYPE:
             return
 
-        username = str(
-            event.get("chatter_user_name") or event.get("chatter_user_login") or ""
-        ).strip()
-        message_text = str((event.get("message") or {}).get("text") or "").strip()
+        now = received_at if received_at is not None else time.monotonic()
+        if now - session.rate_window_start >= 1.0:
+            session.rate_previous_start = session.rate_window_start
+            session.rate_previous_count = session.rate_window_count
+            session.rate_window_start = now
+            session.rate_window_count = 0
+        session.rate_window_count += 1
+
+        username = username.strip()
+        message_text = message_text.strip()
         if not username or not message_text:
             return
 
-        session.message_queue.put({"username": username, "message": message_text})
+        # match before dedupe so chatter that is dropped anyway does not
+        # push commands out of the seen-id window
+        command = None
+        matcher = self.matcher
+        if matcher is not None:
+            command = matcher.match(message_text)
+            if command is None:
+                self.rejected_messages += 1
+                return
+            message_text = matcher.names[command]
+            username = normalize_username(username)
+
+        message_id = message_id.strip()
+        if message_id and not self.track_message_id(session, message_id):
+            return
+
+        session.message_queue.put(
+            ChatMessage(
+                username, message_text, received_at, time.monotonic(), command, channel or None
+            )
+        )
+        if session.signal is not None:
+            session.signal.notify()
 
     def track_message_id(self, session: TwitchSessionState, message_id: str) -> bool:
-        if message_id in session.seen_message_id_lookup:
-            return False
+        with session.seen_message_lock:
+            if message_id in session.seen_message_id_lookup:
+                session.duplicate_messages += 1
+                return False
 
-        session.seen_message_ids.append(message_id)
-        session.seen_message_id_lookup.add(message_id)
+            session.seen_message_ids.append(message_id)
+            session.seen_message_id_lookup.add(message_id)
 
-        while len(session.seen_message_ids) > MAX_STORED_MESSAGE_IDS:
-            oldest = session.seen_message_ids.popleft()
-            session.seen_message_id_lookup.discard(oldest)
+            while len(session.seen_message_ids) > MAX_STORED_MESSAGE_IDS:
+                oldest = session.seen_message_ids.popleft()
+                session.seen_message_id_lookup.discard(oldest)
 
         return True
 
+    def revoke_channel(self, session: TwitchSessionState, message: Dict[str, Any]) -> None:
+        """Stop reading the channel whose subscription was revoked.
+
+        Raises TwitchRevocationError once no channel is left (or the revoked
+        one is unknown), which ends the session.
+        """
+        subscription = (message.get("payload") or {}).get("subscription") or {}
+        broadcaster_user_id = str(
+            (subscription.get("condition") or {}).get("broadcaster_user_id") or ""
+        )
+        revoked = [
+            channel
+            for channel, user_id in session.broadcaster_user_ids.items()
+            if user_id == broadcaster_user_id
+        ]
+        remaining = [channel for channel in session.channels if channel not in revoked]
+        reason = self.format_revocation_message(message, ", ".join(revoked) or session.channel)
+        if not revoked or not remaining:
+            raise TwitchRevocationError(reason)
+        print(f"{reason} Still reading {', '.join(remaining)}.")
+        for channel in revoked:
+            session.broadcaster_user_ids.pop(channel, None)
+        session.channels = remaining
+        session.channel = ", ".join(remaining)
+
     def format_revocation_message(self, message: Dict[str, Any], channel: str) -> str:
         payload = message.get("payload") or {}
         subscription = payload.get("subscription") or {}
@@ -767,24 +1632,33 @@ class YouTube:
     When no API key is provided: use the existing scraper immediately.
     """
 
-    def __init__(self, api_key: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        signal: Optional[IngestSignal] = None,
+        matcher: Optional[CommandMatcher] = None,
+    ) -> None:
         self.session: Optional[requests.Session] = None
+        self.signal = signal
+        # with a matcher only commands are returned; the rest is counted here
+        self.matcher = matcher
+        self.rejected_messages = 0
         self.config: Dict[str, Any] = {}
         self.payload: Dict[str, Any] = {}
 
+        # poll_loop runs on this thread and queues ChatMessages for the caller
         self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        self.fetch_job: Optional[concurrent.futures.Future] = None
+        self.poll_job: Optional[concurrent.futures.Future] = None
+        self.stop_event = threading.Event()
+        self.message_queue: "queue.Queue[ChatMessage]" = queue.Queue()
         self.next_fetch_time = 0.0
+        # server-advised poll interval in seconds (timeoutMs / pollingIntervalMillis)
+        self.poll_hint: Optional[float] = None
+        self.pacer = PollPacer(YOUTUBE_FETCH_INTERVAL)
 
         self.channel_id: Optional[str] = None
         self.stream_url: Optional[str] = None
 
-        # scrape regexes
-        self.re_initial_data = re.compile(
-            r"(?:window\s*\[\s*[\"']ytInitialData[\"']\s*\]|ytInitialData)\s*=\s*({.+?})\s*;"
-        )
-        self.re_config = re.compile(r"(?:ytcfg\s*.set)\(({.+?})\)\s*;")
-
         # API mode state
         self.api_key: Optional[str] = api_key
         self.use_api: bool = bool(api_key)
@@ -829,10 +1703,7 @@ class YouTube:
     def http(self) -> requests.Session:
         if not self.session:
             self.session = requests.Session()
-            self.session.headers["User-Agent"] = (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
-            )
+            self.session.headers["User-Agent"] = YOUTUBE_USER_AGENT
             requests.utils.add_dict_to_cookiejar(
                 self.session.cookies, {"CONSENT": "YES+"}
             )
@@ -859,7 +1730,7 @@ class YouTube:
                     "key": self.api_key,
                 }
                 r = sess.get(
-                    "https://www.googleapis.com/youtube/v3/search",
+                    f"{YOUTUBE_DATA_API_URL}/search",
                     params=params,
                     timeout=10,
                 )
@@ -883,7 +1754,7 @@ class YouTube:
                 "key": self.api_key,
             }
             r = sess.get(
-                "https://www.googleapis.com/youtube/v3/videos",
+                f"{YOUTUBE_DATA_API_URL}/videos",
                 params=params,
                 timeout=10,
             )
@@ -938,7 +1809,6 @@ class YouTube:
         # tear down API state
         self.live_chat_id = None
         self.next_page_token = None
-        self.fetch_job = None
         self.next_fetch_time = 0.0
         # re-init as scraper
         try:
@@ -953,20 +1823,10 @@ class YouTube:
         if not (self.api_key and self.live_chat_id):
             return []
 
-        # Respect server-provided pacing: we'll set next_fetch_time in the caller.
-        params = {
-            "part": "snippet,authorDetails",
-            "liveChatId": self.live_chat_id,
-            "maxResults": 2000,
-            "key": self.api_key,
-        }
-        if self.next_page_token:
-            params["pageToken"] = self.next_page_token
-
         try:
             r = self.http().get(
-                "https://www.googleapis.com/youtube/v3/liveChat/messages",
-                params=params,
+                f"{YOUTUBE_DATA_API_URL}/liveChat/messages",
+                params=self.api_messages_params(),
                 timeout=10,
             )
         except Exception as e:
@@ -981,11 +1841,24 @@ class YouTube:
             print(f"API fetch failed. {r.status_code} {r.reason}")
             return []
 
-        data = r.json()
+        return self.parse_api_messages(r.json(), time.monotonic())
+
+    def api_messages_params(self) -> Dict[str, Any]:
+        params = {
+            "part": "snippet,authorDetails",
+            "liveChatId": self.live_chat_id,
+            "maxResults": 2000,
+            "key": self.api_key,
+        }
+        if self.next_page_token:
+            params["pageToken"] = self.next_page_token
+        return params
+
+    def parse_api_messages(self, data: Dict[str, Any], received_at: float) -> List[Dict[str, Any]]:
+        """Items from a liveChatMessages.list page; also takes the API's poll interval."""
         self.next_page_token = data.get("nextPageToken")
-        # schedule next poll based on API hint
         poll_ms = int(data.get("pollingIntervalMillis", 1000))
-        self.next_fetch_time = time.time() + (poll_ms / 1000.0)
+        self.poll_hint = poll_ms / 1000.0
 
         msgs: List[Dict[str, Any]] = []
         for item in data.get("items", []):
@@ -996,6 +1869,7 @@ class YouTube:
                 {
                     "author": a.get("displayName", "") or a.get("channelId", ""),
                     "content": [{"text": s.get("displayMessage", "")}],
+                    "received_at": received_at,
                 }
             )
         return msgs
@@ -1004,18 +1878,6 @@ class YouTube:
     # Scraper path (unchanged logic, factored into methods)
     # ---------------------------
     def reconnect(self, delay: float) -> None:
-        # Cancel pending fetch job if any
-        if self.fetch_job and self.fetch_job.running():
-            try:
-                self.fetch_job.cancel()
-            except Exception:
-                pass
-            else:
-                try:
-                    self.fetch_job.result(timeout=0.1)
-                except Exception:
-                    pass
-
         print(f"Retrying in {delay} seconds...")
         if self.session:
             try:
@@ -1026,7 +1888,6 @@ class YouTube:
         self.session = None
         self.config = {}
         self.payload = {}
-        self.fetch_job = None
         self.next_fetch_time = 0
         time.sleep(max(0.0, delay))
 
@@ -1042,98 +1903,96 @@ class YouTube:
         print("Connecting to YouTube (HTML scrape)...")
 
         # Create http client session
-        self.session = requests.Session()
-        self.session.headers["User-Agent"] = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
-        )
-        requests.utils.add_dict_to_cookiejar(self.session.cookies, {"CONSENT": "YES+"})
+        session = requests.Session()
+        session.headers["User-Agent"] = YOUTUBE_USER_AGENT
+        requests.utils.add_dict_to_cookiejar(session.cookies, {"CONSENT": "YES+"})
+        self.session = session
+        try:
+            self.scrape_live_chat(session)
+        except BaseException:
+            # leave no half-connected session behind; the next poll reconnects
+            self.session = None
+            session.close()
+            raise
+        print("Connected (scrape).")
 
+    def scrape_live_chat(self, session: requests.Session) -> None:
+        """Load the live page and the live_chat page; raises YouTubeScrapeError."""
         # Connect using stream_url if provided, otherwise use the channel_id
         if self.stream_url is not None:
             live_url = self.stream_url
         else:
-            live_url = f"https://youtube.com/channel/{self.channel_id}/live"
+            live_url = f"{YOUTUBE_PAGE_URL}/channel/{self.channel_id}/live"
 
-        res = self.session.get(live_url)
+        # Pages are streamed and scanned as they arrive; the download stops
+        # once the JSON the scraper needs has been found.
+        res = session.get(live_url, stream=True, timeout=YOUTUBE_PAGE_TIMEOUT_SECONDS)
         if res.status_code == 404:
-            live_url = f"https://youtube.com/c/{self.channel_id}/live"
-            res = self.session.get(live_url)
+            res.close()
+            live_url = f"{YOUTUBE_PAGE_URL}/c/{self.channel_id}/live"
+            res = session.get(live_url, stream=True, timeout=YOUTUBE_PAGE_TIMEOUT_SECONDS)
         if not res.ok:
+            res.close()
             if self.stream_url is not None:
-                print(
+                raise YouTubeScrapeError(
                     f"Couldn't load the stream URL ({res.status_code} {res.reason}). Is the stream URL correct? {self.stream_url}"
                 )
-            else:
-                print(
-                    f"Couldn't load livestream page ({res.status_code} {res.reason}). Is the channel ID correct? {self.channel_id}"
-                )
-            time.sleep(5)
-            sys.exit(1)
-        livestream_page = res.text
-
-        matches = list(self.re_initial_data.finditer(livestream_page))
-        if len(matches) == 0:
-            print("Couldn't find initial data in livestream page")
-            time.sleep(5)
-            sys.exit(1)
-        initial_data = json.loads(matches[0].group(1))
-
-        try:
-            iframe_continuation = initial_data["contents"]["twoColumnWatchNextResults"][
-                "conversationBar"
-            ]["liveChatRenderer"]["header"]["liveChatHeaderRenderer"]["viewSelector"][
-                "sortFilterSubMenuRenderer"
-            ][
-                "subMenuItems"
-            ][
-                1
-            ][
-                "continuation"
-            ][
-                "reloadContinuationData"
-            ][
-                "continuation"
-            ]
-        except Exception:
-            print(
+            raise YouTubeScrapeError(
+                f"Couldn't load livestream page ({res.status_code} {res.reason}). Is the channel ID correct? {self.channel_id}"
+            )
+        livestream_page = youtube_page.PageScanner()
+        youtube_page.scan_response(res, livestream_page)
+
+        if livestream_page.initial_data is None:
+            raise YouTubeScrapeError("Couldn't find initial data in livestream page")
+        iframe_continuation = youtube_page.chat_iframe_continuation(livestream_page.initial_data)
+        if not iframe_continuation:
+            raise YouTubeScrapeError(
                 f"Couldn't find the livestream chat. Is the channel not live? url: {live_url}"
             )
-            time.sleep(5)
-            sys.exit(1)
 
-        res = self.session.get(
-            f"https://youtube.com/live_chat?continuation={iframe_continuation}"
+        res = session.get(
+            f"{YOUTUBE_PAGE_URL}/live_chat?continuation={iframe_continuation}",
+            stream=True,
+            timeout=YOUTUBE_PAGE_TIMEOUT_SECONDS,
         )
         if not res.ok:
-            print(f"Couldn't load live chat page ({res.status_code} {res.reason})")
-            time.sleep(5)
-            sys.exit(1)
-        live_chat_page = res.text
-
-        matches = list(self.re_initial_data.finditer(live_chat_page))
-        if len(matches) == 0:
-            print("Couldn't find initial data in live chat page")
-            time.sleep(5)
-            sys.exit(1)
-        initial_data = json.loads(matches[0].group(1))
-
-        matches = list(self.re_config.finditer(live_chat_page))
-        if len(matches) == 0:
-            print("Couldn't find config data in live chat page")
-            time.sleep(5)
-            sys.exit(1)
-        self.config = json.loads(matches[0].group(1))
-
-        token = self.get_continuation_token(initial_data)
+            res.close()
+            raise YouTubeScrapeError(f"Couldn't load live chat page ({res.status_code} {res.reason})")
+        live_chat_page = youtube_page.PageScanner(config_keys=YOUTUBE_CONFIG_KEYS)
+        youtube_page.scan_response(res, live_chat_page)
+
+        if live_chat_page.initial_data is None:
+            raise YouTubeScrapeError("Couldn't find initial data in live chat page")
+        if not live_chat_page.config_done:
+            raise YouTubeScrapeError("Couldn't find config data in live chat page")
+        config = live_chat_page.config
+
+        continuation = youtube_page.chat_continuation(live_chat_page.initial_data)
+        if continuation is None:
+            raise YouTubeScrapeError("Couldn't find the chat continuation in live chat page")
+        self.config = config
         self.payload = {
-            "context": self.config["INNERTUBE_CONTEXT"],
-            "continuation": token,
+            "context": config["INNERTUBE_CONTEXT"],
+            "continuation": self.continuation_token(continuation),
             "webClientInfo": {"isDocumentHidden": False},
         }
-        print("Connected (scrape).")
+        self.poll_hint = self.continuation_timeout(continuation)
 
     def get_continuation_token(self, data: Dict[str, Any]) -> str:
-        cont = data["continuationContents"]["liveChatContinuation"]["continuations"][0]
+        return self.continuation_token(
+            data["continuationContents"]["liveChatContinuation"]["continuations"][0]
+        )
+
+    def continuation_timeout(self, cont: Dict[str, Any]) -> Optional[float]:
+        """The continuation's timeoutMs in seconds, if it has one."""
+        for kind in ("timedContinuationData", "invalidationContinuationData"):
+            timeout_ms = (cont.get(kind) or {}).get("timeoutMs")
+            if timeout_ms:
+                return int(timeout_ms) / 1000.0
+        return None
+
+    def continuation_token(self, cont: Dict[str, Any]) -> str:
         if "timedContinuationData" in cont:
             return cont["timedContinuationData"]["continuation"]
         else:
@@ -1146,12 +2005,8 @@ class YouTube:
             return []
 
         try:
-            payload_bytes = bytes(json.dumps(self.payload), "utf8")
-            res = session.post(
-                f"https://www.youtube.com/youtubei/v1/live_chat/get_live_chat?key={self.config['INNERTUBE_API_KEY']}&prettyPrint=false",
-                payload_bytes,
-                timeout=10,
-            )
+            payload_bytes = self.live_chat_body()
+            res = session.post(self.live_chat_url(), payload_bytes, timeout=10)
         except Exception as e:
             print(f"Failed to fetch messages: {e}")
             return []
@@ -1168,108 +2023,152 @@ class YouTube:
             return []
 
         try:
-            data = json.loads(res.text)
-            self.payload["continuation"] = self.get_continuation_token(data)
-            cont = data["continuationContents"]["liveChatContinuation"]
-            messages = []
-            if "actions" in cont:
-                for action in cont["actions"]:
-                    item = (
-                        action.get("addChatItemAction", {})
-                        .get("item", {})
-                        .get("liveChatTextMessageRenderer")
-                    )
-                    if item:
-                        messages.append(
-                            {
-                                "author": item["authorName"]["simpleText"],
-                                "content": item["message"]["runs"],
-                            }
-                        )
-            return messages
+            return self.parse_live_chat(res.text, time.monotonic())
         except Exception:
             print("Failed to parse messages.")
             print("Body (truncated):", res.text[:800])
             traceback.print_exc()
             return []
 
-    # unified API for the template
-    def twitch_receive_messages(self) -> List[Dict[str, str]]:
-        if self.use_api:
-            # API mode with background job + poll pacing
-            messages: List[Dict[str, str]] = []
-
-            if not self.fetch_job:
-                # only schedule if we are past the advised poll time
-                if time.time() >= self.next_fetch_time:
-                    self.fetch_job = self.thread_pool.submit(self.api_fetch_messages)
-                else:
-                    # brief nap to avoid busy-spin
-                    time.sleep(1.0 / 120.0)
-            else:
-                try:
-                    res = self.fetch_job.result(timeout=1.0 / 60.0)
-                except concurrent.futures.TimeoutError:
-                    res = []
-                except Exception:
-                    traceback.print_exc()
-                    try:
-                        if self.session:
-                            self.session.close()
-                    except Exception:
-                        pass
-                    self.session = None
-                    return []
-                else:
-                    self.fetch_job = None
-
-                for item in res:
-                    msg = {"username": item["author"], "message": ""}
-                    for part in item["content"]:
-                        if "text" in part:
-                            msg["message"] += part["text"]
-                        elif "emoji" in part:
-                            msg["message"] += part["emoji"].get("emojiId", "")
-                    messages.append(msg)
+    def live_chat_url(self) -> str:
+        return f"{YOUTUBE_INNERTUBE_URL}/live_chat/get_live_chat?key={self.config['INNERTUBE_API_KEY']}&prettyPrint=false"
+
+    def live_chat_body(self) -> bytes:
+        return bytes(json.dumps(self.payload), "utf8")
+
+    def parse_live_chat(self, text: str, received_at: float) -> List[Dict[str, Any]]:
+        """Items from a get_live_chat response; also advances the continuation."""
+        data = json.loads(text)
+        cont = data["continuationContents"]["liveChatContinuation"]
+        continuation = cont["continuations"][0]
+        self.payload["continuation"] = self.continuation_token(continuation)
+        self.poll_hint = self.continuation_timeout(continuation)
+        messages = []
+        if "actions" in cont:
+            for action in cont["actions"]:
+                item = (
+                    action.get("addChatItemAction", {})
+                    .get("item", {})
+                    .get("liveChatTextMessageRenderer")
+                )
+                if item:
+                    messages.append(
+                        {
+                            "author": item["authorName"]["simpleText"],
+                            "content": item["message"]["runs"],
+                            "received_at": received_at,
+                        }
+                    )
+        return messages
 
-            return messages
+    def chat_messages(self, items: List[Dict[str, Any]]) -> List[ChatMessage]:
+        """Turn fetched items into ChatMessages, dropping non-commands when matching."""
+        matcher = self.matcher
+        queued_at = time.monotonic()
+        messages: List[ChatMessage] = []
+        for item in items:
+            text = youtube_message_text(item["content"])
+            username = item["author"]
+            command = None
+            if matcher is not None:
+                command = matcher.match(text)
+                if command is None or not username:
+                    self.rejected_messages += 1
+                    continue
+                text = matcher.names[command]
+                username = normalize_username(username)
+            messages.append(
+                ChatMessage(username, text, item.get("received_at"), queued_at, command)
+            )
+        return messages
 
-        # scraper mode
-        if self.session is None:
-            self.reconnect(0)
+    def poll_loop(self) -> None:
+        """Poll on the fetch thread until close(), queueing ChatMessages.
 
-        messages: List[Dict[str, str]] = []
+        Matching runs here, off the vote loop. The pacer picks the next poll
+        time from the server hint and how busy chat is.
+        """
+        while not self.stop_event.is_set():
+            wait = self.next_fetch_time - time.time()
+            if wait > 0 and self.stop_event.wait(wait):
+                return
 
-        if not self.fetch_job:
-            time.sleep(1.0 / 120.0)
-            if time.time() > self.next_fetch_time:
-                self.fetch_job = self.thread_pool.submit(self.fetch_messages)
-        else:
+            started = self.pacer.start()
             try:
-                res = self.fetch_job.result(timeout=1.0 / 60.0)
-            except concurrent.futures.TimeoutError:
-                res = []
+                if not self.use_api and self.session is None:
+                    self.reconnect(0)
+                items = self.api_fetch_messages() if self.use_api else self.fetch_messages()
+            except YouTubeScrapeError as exc:
+                # retried after the pacer's backoff
+                print(f"YouTube chat reconnect failed. {exc}")
+                self.next_fetch_time = time.time() + self.pacer.failed(started)
+                continue
             except Exception:
                 traceback.print_exc()
-                session = self.session
+                self.next_fetch_time = time.time() + self.pacer.failed(started)
+                session, self.session = self.session, None
                 if session is not None:
                     try:
                         session.close()
                     except Exception:
                         pass
-                self.session = None
-                return []
-            else:
-                self.fetch_job = None
-                self.next_fetch_time = time.time() + YOUTUBE_FETCH_INTERVAL
-
-            for item in res:
-                msg = {"username": item["author"], "message": ""}
-                for part in item["content"]:
-                    if "text" in part:
-                        msg["message"] += part["text"]
-                    elif "emoji" in part:
-                        msg["message"] += part["emoji"].get("emojiId", "")
-                messages.append(msg)
+                continue
+            self.schedule_poll(started, len(items))
+
+            messages = self.chat_messages(items)
+            if messages:
+                for message in messages:
+                    self.message_queue.put(message)
+                if self.signal is not None:
+                    self.signal.notify()
+
+    def schedule_poll(self, started: float, items: int) -> None:
+        # API polls keep to pollingIntervalMillis; polling sooner only burns quota
+        delay = self.pacer.finish(started, items, self.poll_hint, adapt=not self.use_api)
+        self.next_fetch_time = time.time() + delay
+
+    def poll_stats(self) -> Dict[str, Any]:
+        """Per-poll counters and request/interval percentiles from the pacer."""
+        return self.pacer.stats()
+
+    def start_polling(self) -> None:
+        self.poll_job = self.thread_pool.submit(self.poll_loop)
+        self.poll_job.add_done_callback(self.report_poll_exit)
+
+    def report_poll_exit(self, job: concurrent.futures.Future) -> None:
+        exc = None if job.cancelled() else job.exception()
+        if exc is not None:
+            print(f"YouTube chat polling stopped. {exc!r}")
+
+    def poll_deadline(self) -> Optional[float]:
+        """None while the poll thread runs and notifies the signal, otherwise now.
+
+        Messages are queued by poll_loop, so a caller without a signal only
+        needs to check the queue; a poll thread that died is restarted by the
+        next twitch_receive_messages().
+        """
+        if self.signal is not None and self.poll_job is not None and not self.poll_job.done():
+            return None
+        return time.time()
 
-        return messages
+    def close(self) -> None:
+        self.stop_event.set()
+        session, self.session = self.session, None
+        if session is not None:
+            try:
+                session.close()
+            except Exception:
+                pass
+        self.thread_pool.shutdown(wait=False)
+
+    # unified API for the template
+    def twitch_receive_messages(self) -> List[ChatMessage]:
+        job = self.poll_job
+        if job is None or (job.done() and not self.stop_event.is_set()):
+            self.start_polling()
+        messages: List[ChatMessage] = []
+        while True:
+            try:
+                messages.append(self.message_queue.get_nowait())
+            except queue.Empty:
+                return messages
@@ -19,11 +19,12 @@ import os
 import shutil
 import sys
 import time
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
 import json
 import threading
 from collections import deque
+import queue
 
 try:
     import keyboard
@@ -40,9 +41,25 @@ try:
 except BaseException:
     pydirectinput = None
 
+import TwitchPlays_AsyncConnection
 import TwitchPlays_Connection
+from TwitchPlays_AsyncConnection import CHAT_TRANSPORTS
 from TwitchPlays_KeyCodes import *
 from focus_gate import set_focus_target, is_target_focused
+from vote_tally import VoteTally
+from command_matcher import CommandMatcher, profile_match_tolerance
+from vote_ring import VoteRing
+from ingest_hub import IngestHub
+from latency_trace import LatencyTracer, WindowTrace
+from external_api import DEFAULT_API_HOST, DEFAULT_API_PORT, ExternalApiServer, ExternalVoteSink
+from macro_program import (
+    MacroBackend,
+    MacroCancelled,
+    MacroProgram,
+    ProfileError,
+    compile_macros,
+    execute_program,
+)
 
 ##################### STREAM / PLATFORM CONFIG #####################
 
@@ -57,6 +74,7 @@ STREAM_SOURCES = ["twitch", "youtube"]
 YOUTUBE_CHANNEL_ID = str(STREAM_CONFIG.get("youtube_channel_id") or "").strip() or None
 YOUTUBE_API_KEY = str(STREAM_CONFIG.get("youtube_api_key") or "").strip() or None
 YOUTUBE_STREAM_URL = str(STREAM_CONFIG.get("youtube_stream_url") or "").strip() or None
+EXTERNAL_API_TOKEN = str(STREAM_CONFIG.get("external_api_token") or "").strip() or None
 
 ##################### MESSAGE QUEUE VARIABLES #####################
 
@@ -73,9 +91,18 @@ MIN_EXECUTION_GAP_MS = 300
 # Circuit breaker: on >=3 errors within 10s, auto soft-disable
 ERROR_TRIP_THRESHOLD = 3
 ERROR_WINDOW_SEC = 10.0
-
-# Minimal idle sleep to avoid 100% CPU when chat is quiet
-IDLE_SLEEP_SEC = float("0.005")
+# Winners waiting for the executor thread; voting keeps running meanwhile
+EXECUTOR_QUEUE_SIZE = 1
+# What to do with a new winner when the executor is still busy:
+#   drop     - discard the new winner
+#   coalesce - replace the oldest queued winner with the new one
+#   preempt  - cancel the running macro and run the new winner next
+BACKLOG_POLICIES = ("drop", "coalesce", "preempt")
+DEFAULT_BACKLOG_POLICY = "coalesce"
+# External votes waiting for the vote loop; the API rejects what does not fit
+EXTERNAL_RING_CAPACITY = 1 << 17
+# With --trace-file, rewrite the latency dump every this many windows
+TRACE_DUMP_EVERY_WINDOWS = 10
 
 # Count down before starting, so you have time to load up the game
 STARTUP_COUNTDOWN = int("5")
@@ -94,17 +121,6 @@ if pydirectinput is not None and hasattr(pydirectinput, "FAILSAFE"):
 HELD_KEYS: set[int] = set()
 
 
-def press_and_release(keycode: int, seconds: float = 0.1) -> None:
-    """Press and release a key for N seconds, tracking holds for cleanup."""
-    try:
-        HELD_KEYS.add(keycode)
-        HoldKey(keycode)
-        time.sleep(max(0.01, float(seconds)))
-    finally:
-        ReleaseKey(keycode)
-        HELD_KEYS.discard(keycode)
-
-
 def press_hold(keycode: int) -> None:
     """Hold a key (tracked). Intended for short pulses in this runner."""
     HELD_KEYS.add(keycode)
@@ -116,22 +132,53 @@ def release(keycode: int) -> None:
     HELD_KEYS.discard(keycode)
 
 
+def hold_keys(keycodes: Tuple[int, ...]) -> None:
+    HELD_KEYS.update(keycodes)
+    HoldKeys(keycodes)
+
+
+def release_keys(keycodes: Tuple[int, ...]) -> None:
+    ReleaseKeys(keycodes)
+    HELD_KEYS.difference_update(keycodes)
+
+
+def send_transitions(transitions: Tuple[Tuple[str, Any], ...]) -> None:
+    """Inject simultaneous key/mouse transitions together, tracking held keys."""
+    HELD_KEYS.update(value for kind, value in transitions if kind == "key_down")
+    SendTransitions(transitions)
+    HELD_KEYS.difference_update(released_keys(transitions))
+
+
+MOUSE_BACKEND: Optional[Tuple[str, Any]] = None
+
+
 def load_mouse_backend():
+    global MOUSE_BACKEND
+    if MOUSE_BACKEND is not None:
+        return MOUSE_BACKEND
     if sys.platform == "win32" and pydirectinput is not None:
-        return ("pydirectinput", pydirectinput)
-    if pyautogui is not None:
-        return ("pyautogui", pyautogui)
-    raise RuntimeError(
-        "Mouse input requires pyautogui on Linux/macOS or pyautogui/pydirectinput on Windows."
-    )
+        MOUSE_BACKEND = ("pydirectinput", pydirectinput)
+    elif pyautogui is not None:
+        MOUSE_BACKEND = ("pyautogui", pyautogui)
+    else:
+        raise RuntimeError(
+            "Mouse input requires pyautogui on Linux/macOS or pyautogui/pydirectinput on Windows."
+        )
+    return MOUSE_BACKEND
 
 
 def mouse_down(btn: str = "left"):
+    if native_input() is not None:
+        SendTransitions((("mouse_down", btn),))
+        return
     backend = load_mouse_backend()[1]
     backend.mouseDown(button=btn)
 
 
 def mouse_up(btn: str = "left"):
+    if native_input() is not None:
+        SendTransitions((("mouse_up", btn),))
+        return
     backend = load_mouse_backend()[1]
     backend.mouseUp(button=btn)
 
@@ -147,6 +194,9 @@ def mouse_move_to(x: int, y: int):
 
 
 def mouse_move(dx: int = 0, dy: int = 0):
+    if native_input() is not None:
+        SendTransitions((("mouse_move", (dx, dy)),))
+        return
     backend_name, backend = load_mouse_backend()
     if backend_name == "pydirectinput":
         backend.moveRel(dx, dy, relative=True)
@@ -177,6 +227,24 @@ def point_for_normalized_mouse_coordinate(x_value: float, y_value: float) -> Tup
     )
 
 
+def mouse_click_at(x_value: float, y_value: float, btn: str = "left") -> None:
+    x, y = point_for_normalized_mouse_coordinate(x_value, y_value)
+    mouse_move_to(x, y)
+    mouse_click(btn)
+
+
+MACRO_BACKEND = MacroBackend(
+    key_down=hold_keys,
+    key_up=release_keys,
+    mouse_down=mouse_down,
+    mouse_up=mouse_up,
+    mouse_click=mouse_click,
+    mouse_click_at=mouse_click_at,
+    mouse_move=mouse_move,
+    send_transitions=send_transitions,
+)
+
+
 def release_all() -> None:
     """Release all tracked key holds and mouse buttons."""
     try:
@@ -212,60 +280,80 @@ class ProfileGame:
             for k, v in (profile.get("aliases") or {}).items()
             if (k or "").strip() and (v or "").strip()
         }
-        self.canonical_to_macros: Dict[str, list] = profile.get("macros") or {}
+        # canonical id -> compiled program; bad steps fail here, not mid-stream
+        self.programs: Dict[str, MacroProgram] = compile_macros(
+            profile.get("macros"), MACRO_BACKEND
+        )
+        # how loosely chat may spell a command; see command_matcher.py
+        self.match_tolerance = profile_match_tolerance(profile)
 
-        def make_handler(canonical: str):
+        def make_handler(program: MacroProgram):
             def handler(user: str) -> None:
-                execute_macro(self.canonical_to_macros.get(canonical) or [])
+                execute_program(program)
 
             return handler
 
+        # alias -> program, for the executor stage which needs cancellation
+        self.command_programs: Dict[str, MacroProgram] = {}
         for alias, canonical in aliases.items():
-            self.commands[alias] = make_handler(canonical)
+            program = self.programs.get(canonical, ())
+            self.command_programs[alias] = program
+            self.commands[alias] = make_handler(program)
 
 
 class MultiChat:
-    def __init__(self, twitch=None, youtube=None):
+    """Chat sources behind one IngestHub; each source is read on its own thread."""
+
+    def __init__(self, twitch=None, youtube=None, hub=None):
         self.t = twitch
         self.y = youtube
+        self.hub = hub or IngestHub()
+        self.signal = self.hub.signal
+        if twitch:
+            self.hub.add_source("twitch", twitch)
+        if youtube:
+            self.hub.add_source("youtube", youtube)
+        self.hub.start()
 
     def receive_messages(self):
-        msgs = []
-        if self.t:
-            msgs.extend(self.t.twitch_receive_messages())
-        if self.y:
-            msgs.extend(self.y.twitch_receive_messages())
-        # normalize once here and filter message length
+        msgs = self.hub.drain()
+        # transports with a matcher hand over normalized commands; anything
+        # else is normalized here, in place, and length-filtered
         out = []
+        drained_at = time.monotonic()
         for m in msgs:
-            msg = (m.get("message") or "").strip()
-            user = (m.get("username") or "").strip()
-            if not msg or not user:
-                continue
-            if len(msg) > MAX_MESSAGE_LENGTH:
-                continue
-            out.append({"message": msg.lower(), "username": user.lower()})
+            if m.command is None:
+                msg = m.message.strip()
+                if not msg or not m.username.strip():
+                    continue
+                if len(msg) > MAX_MESSAGE_LENGTH:
+                    continue
+                m.message = msg.lower()
+                m.username = TwitchPlays_Connection.normalize_username(m.username)
+            m.drained_at = drained_at
+            out.append(m)
         return out
 
+    def rejected_messages(self) -> int:
+        """Non-command lines the transports dropped before queuing."""
+        return sum(source.rejected_messages for source in (self.t, self.y) if source)
+
+    def wait_for_messages(self, deadline: float) -> None:
+        """Block until the hub (or the external sink) has messages, or `deadline`."""
+        self.signal.wait(max(0.0, deadline - time.time()))
+
     def close(self) -> None:
+        self.hub.close()
         if self.t:
             try:
                 self.t.close()
             except Exception:
                 pass
         if self.y:
-            session = getattr(self.y, "session", None)
-            if session is not None:
-                try:
-                    session.close()
-                except Exception:
-                    pass
-            thread_pool = getattr(self.y, "thread_pool", None)
-            if thread_pool is not None:
-                try:
-                    thread_pool.shutdown(wait=False)
-                except Exception:
-                    pass
+            try:
+                self.y.close()
+            except Exception:
+                pass
 
 
 ##########################################################
@@ -287,6 +375,41 @@ def parse_args() -> argparse.Namespace:
         default=",".join(STREAM_SOURCES),
         help="Separated chat sources: twitch,youtube",
     )
+    p.add_argument(
+        "--transport",
+        default="threads",
+        choices=CHAT_TRANSPORTS,
+        help="Chat readers on their own threads, or every connection on one asyncio loop",
+    )
+    p.add_argument(
+        "--backlog-policy",
+        default=DEFAULT_BACKLOG_POLICY,
+        choices=BACKLOG_POLICIES,
+        help="What to do with a new winner while the previous macro is still running",
+    )
+    p.add_argument(
+        "--input-mode",
+        default="chat",
+        choices=("chat", "external"),
+        help="Take votes from chat, or from the external HTTP/WebSocket API",
+    )
+    p.add_argument(
+        "--api-host", default=DEFAULT_API_HOST, help="External API bind address"
+    )
+    p.add_argument(
+        "--api-port", type=int, default=DEFAULT_API_PORT, help="External API port"
+    )
+    p.add_argument(
+        "--trace-file",
+        default=None,
+        help="Write end-to-end latency percentiles and recent windows to this JSON file",
+    )
+    p.add_argument(
+        "--input-backend",
+        default="auto",
+        choices=INPUT_BACKENDS,
+        help="How keys and mouse input are injected (xtest/uinput are Linux only)",
+    )
     return p.parse_args()
 
 
@@ -348,9 +471,164 @@ def toggle_injection():
         release_all()
 
 
+class WinnerExecutor:
+    """Executor stage: runs winning macros on their own thread.
+
+    The vote loop submits winners into a bounded queue and moves straight on
+    to the next window. Focus gating, the global min-gap and the circuit
+    breaker all live here, next to the inputs they protect.
+    """
+
+    def __init__(
+        self,
+        game: ProfileGame,
+        policy: str = DEFAULT_BACKLOG_POLICY,
+        tracer: Optional[LatencyTracer] = None,
+    ):
+        self.game = game
+        self.policy = policy
+        self.tracer = tracer or LatencyTracer()
+        self.pending: "queue.Queue[Tuple[str, WindowTrace]]" = queue.Queue(
+            maxsize=EXECUTOR_QUEUE_SIZE
+        )
+        self.cancel_event = threading.Event()
+        self.stop_event = threading.Event()
+        # a preempting submit and the dequeue in run() agree on `busy` under it
+        self.busy_lock = threading.Lock()
+        self.busy = False
+        self.thread = threading.Thread(
+            target=self.run, name="twitchplays-executor", daemon=True
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def submit(self, winner: str, window: WindowTrace) -> str:
+        """Queue a winner; returns "queued", "coalesced", "preempted" or "dropped"."""
+        if self.policy == "preempt":
+            outcome = "queued"
+            with self.busy_lock:
+                while True:
+                    try:
+                        self.discard(self.pending.get_nowait())
+                        outcome = "preempted"
+                    except queue.Empty:
+                        break
+                if self.busy:
+                    outcome = "preempted"
+                    self.cancel_event.set()
+                self.pending.put_nowait((winner, window))
+            return outcome
+
+        try:
+            self.pending.put_nowait((winner, window))
+            return "queued"
+        except queue.Full:
+            if self.policy == "drop":
+                return "dropped"
+
+        # coalesce: the newest winner replaces the oldest queued one
+        try:
+            self.discard(self.pending.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            self.pending.put_nowait((winner, window))
+        except queue.Full:
+            return "dropped"
+        return "coalesced"
+
+    def discard(self, item: Tuple[str, WindowTrace]) -> None:
+        window = item[1]
+        window.outcome = "replaced"
+        self.tracer.finish_window(window)
+
+    def run(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                winner, window = self.pending.get(timeout=0.25)
+            except queue.Empty:
+                continue
+            with self.busy_lock:
+                self.cancel_event.clear()
+                # a winner submitted since the get has already replaced this one
+                superseded = self.policy == "preempt" and not self.pending.empty()
+                self.busy = not superseded
+            if superseded:
+                self.discard((winner, window))
+                continue
+            try:
+                self.execute(winner, window)
+            finally:
+                self.busy = False
+                self.tracer.finish_window(window)
+
+    def execute(self, winner: str, window: WindowTrace) -> None:
+        global last_exec_ts, injection_enabled
+
+        if not injection_enabled:
+            window.outcome = "disabled"
+            print("Injection disabled")
+            return
+        focused = is_target_focused()
+        window.focus_checked_at = time.monotonic()
+        if not focused:
+            window.outcome = "unfocused"
+            return
+        # Enforce global min execution gap; a queued winner waits it out
+        gap_left = MIN_EXECUTION_GAP_MS / 1000.0 - (time.time() - last_exec_ts)
+        if gap_left > 0 and self.cancel_event.wait(gap_left):
+            window.outcome = "preempted"
+            return
+
+        program = self.game.command_programs.get(winner)
+        if program is None:
+            window.outcome = "unknown"
+            return
+        try:
+            print(f"Executing '{winner}'")
+            execute_program(program, self.cancel_event, window.mark_first_input)
+            window.outcome = "executed"
+            # record last execution time
+            last_exec_ts = time.time()
+        except MacroCancelled:
+            window.outcome = "preempted"
+            print(f"Preempted '{winner}'")
+        except Exception as e:
+            window.outcome = "failed"
+            print(f"Failed to execute '{winner}': {e}")
+            now_s = time.time()
+            error_times.append(now_s)
+            # prune
+            while error_times and now_s - error_times[0] > ERROR_WINDOW_SEC:
+                error_times.popleft()
+            if len(error_times) >= ERROR_TRIP_THRESHOLD:
+                injection_enabled = False
+                release_all()
+                print(
+                    f"Circuit breaker tripped to prevent fatal issues. Too many errors triggered."
+                )
+        finally:
+            # immediate reset
+            release_all()
+            window.done_at = time.monotonic()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.cancel_event.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join()
+
+
 def main():
+    global input_mode
     args = parse_args()
-    global last_exec_ts, injection_enabled
+    input_mode = args.input_mode
+    try:
+        backend_name = set_input_backend(args.input_backend)
+    except (RuntimeError, ValueError) as exc:
+        raise SystemExit(str(exc)) from exc
+    print(f"Input backend: {backend_name}")
 
     profile_path = profile_path_for_game(args.game)
     if not profile_path.exists():
@@ -378,6 +656,17 @@ def main():
     sources = parse_sources(args.sources)
     t = None
     y = None
+    # transports drop non-command chat on their own threads
+    matcher = CommandMatcher(game.commands, game.match_tolerance)
+    # the ingest hub and the external sink wake the vote loop through this
+    signal = TwitchPlays_Connection.IngestSignal()
+    # each source feeds its own producer thread in the hub
+    hub = IngestHub(signal)
+    transports = (
+        TwitchPlays_AsyncConnection
+        if args.transport == "asyncio"
+        else TwitchPlays_Connection
+    )
 
     try:
         if "twitch" in sources:
@@ -385,19 +674,25 @@ def main():
                 raise SystemExit(
                     "TWITCH_CHANNEL is required when Twitch chat is enabled."
                 )
-            t = TwitchPlays_Connection.Twitch()
+            t = transports.Twitch(
+                signal=hub.source_signal("twitch"), matcher=matcher
+            )
             t.twitch_connect(TWITCH_CHANNEL)
         if "youtube" in sources:
             # Only connect to YouTube if configuration is present
             if YOUTUBE_CHANNEL_ID or YOUTUBE_STREAM_URL:
-                y = TwitchPlays_Connection.YouTube(api_key=YOUTUBE_API_KEY)
+                y = transports.YouTube(
+                    api_key=YOUTUBE_API_KEY,
+                    signal=hub.source_signal("youtube"),
+                    matcher=matcher,
+                )
                 y.youtube_connect(
                     YOUTUBE_CHANNEL_ID, YOUTUBE_STREAM_URL, api_key=YOUTUBE_API_KEY
                 )
             else:
                 y = None
     except BaseException:
-        MultiChat(t, y).close()
+        MultiChat(t, y, hub).close()
         raise
 
     if not t and not y:
@@ -405,7 +700,7 @@ def main():
             "No valid chat sources. Use --sources twitch,youtube or set STREAM_SOURCES."
         )
 
-    client = MultiChat(t, y)
+    client = MultiChat(t, y, hub)
 
     # Hotkeys
     try:
@@ -418,31 +713,64 @@ def main():
         print(f"Hotkeys unavailable: {e}")
 
     # Voting window state
+    # Precompute allowlist (commands); the vote loop tallies matcher ids
+    allow = set(matcher.names)
+    command_names = matcher.names
+
     window_end = time.time() + VOTE_WINDOW_SEC
-    last_vote_by_user: Dict[str, Tuple[str, float]] = {}
-    counts: Dict[str, int] = {}
-    last_ts_by_cmd: Dict[str, float] = {}
+    # username -> command id
+    last_vote_by_user: Dict[str, int] = {}
+    tally = VoteTally()
     unknown = 0
+    # chat the transports dropped as non-commands counts as unknown too
+    rejected_at_window_start = client.rejected_messages()
+    recovered_at_window_start = 0
 
-    # Precompute allowlist (commands)
-    allow = set(game.commands.keys())
+    # Latency tracing (monotonic clock); see latency_trace.py
+    tracer = LatencyTracer()
+    trace_path = Path(args.trace_file) if args.trace_file else None
+    window = WindowTrace(window_end=time.monotonic() + VOTE_WINDOW_SEC)
+    # command id -> when its most recent vote was received
+    last_vote_at: List[float] = [0.0] * len(command_names)
+    windows_closed = 0
 
-    # external messages input (P1)
-    external_messages: List[dict] = []
-    external_lock = threading.Lock()
+    # external messages input (P1): the API thread is the ring's only producer
+    external_ring = VoteRing(EXTERNAL_RING_CAPACITY)
 
-    def drain_external() -> List[dict]:
-        with external_lock:
-            out = list(external_messages)
-            external_messages.clear()
-            return out
+    def drain_external() -> List[TwitchPlays_Connection.ChatMessage]:
+        return external_ring.drain()
 
     # expose for API
-    globals()["tp_external_sink"] = external_messages
-    globals()["tp_external_lock"] = external_lock
+    globals()["tp_external_ring"] = external_ring
+    # producers call notify() after appending so the vote loop wakes immediately
+    globals()["tp_external_signal"] = signal
     globals()["tp_allow_set"] = allow
     globals()["tp_input_mode_ref"] = lambda: input_mode
 
+    api_server = None
+    if input_mode == "external":
+        try:
+            api_server = ExternalApiServer(
+                ExternalVoteSink(
+                    external_ring,
+                    signal,
+                    matcher,
+                    globals()["tp_input_mode_ref"],
+                    MAX_MESSAGE_LENGTH,
+                ),
+                host=args.api_host,
+                port=args.api_port,
+                token=EXTERNAL_API_TOKEN,
+            )
+            api_server.start()
+        except RuntimeError as exc:
+            client.close()
+            raise SystemExit(str(exc)) from exc
+        print(f"External input API listening on http://{args.api_host}:{args.api_port}")
+
+    executor = WinnerExecutor(game, args.backlog_policy, tracer)
+    executor.start()
+
     print("Press soft toggle to enable listening.")
 
     try:
@@ -450,114 +778,78 @@ def main():
 
             # Read messages
             incoming = []
-            # Chat messages only if mode == chat
+            # chat keeps arriving in external mode; drain it so the hub stays
+            # empty, but only count it in chat mode
+            msgs = client.receive_messages() or []
             if input_mode == "chat":
-                msgs = client.receive_messages() or []
                 incoming.extend(msgs)
             # If input is coming from API rather than chat
             if input_mode == "external":
                 incoming.extend(drain_external())
 
             for m in incoming:
-                msg = m.get("message") or ""
-                user = m.get("username") or ""
-                if not msg or not user:
-                    continue
-                if len(counts) + unknown >= MAX_VOTES_PER_WINDOW:
+                if len(tally) + unknown >= MAX_VOTES_PER_WINDOW:
                     continue
-                if msg not in allow:
+                tallied_at = time.monotonic()
+                cmd = m.command
+                if cmd is None:
+                    cmd = matcher.match(m.message)
+                if cmd is None:
                     unknown += 1
-                    continue
-                now = time.time()
-                prev = last_vote_by_user.get(user)
-                if prev:
-                    prev_cmd, _ = prev
-                    if prev_cmd == msg:
-                        # no change
-                        last_vote_by_user[user] = (msg, now)
-                        last_ts_by_cmd[msg] = now
-                        continue
-                    # decrement previous
-                    counts[prev_cmd] = max(0, counts.get(prev_cmd, 0) - 1)
-                # add/update
-                last_vote_by_user[user] = (msg, now)
-                counts[msg] = counts.get(msg, 0) + 1
-                last_ts_by_cmd[msg] = now
+                else:
+                    user = m.username
+                    prev_cmd = last_vote_by_user.get(user)
+                    if prev_cmd == cmd:
+                        # no change, but it is now the most recent vote
+                        tally.touch(cmd)
+                    else:
+                        if prev_cmd is not None:
+                            # move the user's vote off their previous command
+                            tally.remove(prev_cmd)
+                        last_vote_by_user[user] = cmd
+                        tally.add(cmd)
+                    vote_at = m.received_at or tallied_at
+                    last_vote_at[cmd] = vote_at
+                    if window.first_vote_at is None:
+                        window.first_vote_at = vote_at
+                tracer.message(m, tallied_at)
 
             now = time.time()
             if now < window_end:
-                time.sleep(IDLE_SLEEP_SEC)
+                client.wait_for_messages(window_end)
                 continue
 
             # Select winner (max count; tie => latest last vote)
-            winner = None
-            if counts:
-                max_count = max(counts.values())
-                top = [cmd for cmd, c in counts.items() if c == max_count]
-                if len(top) == 1:
-                    winner = top[0]
-                else:
-                    # choose the tied command with most recent last ts
-                    winner = max(top, key=lambda c: last_ts_by_cmd.get(c, 0.0))
-
-            # Execute winner if enabled, focused, and not violating global min-gap
-            executed = False
-            reason = None
-            if winner:
-                if not injection_enabled:
-                    reason = "disabled"
-                    print("Injection disabled")
-                elif not is_target_focused():
-                    reason = "not_focused"
-                else:
-                    # Enforce global min execution gap
-                    now_s = time.time()
-                    if (now_s - last_exec_ts) * 1000.0 < MIN_EXECUTION_GAP_MS:
-                        reason = "global_gap"
-                    else:
-                        try:
-                            handler = game.commands.get(winner)
-                            if handler:
-                                print(f"Executing '{winner}'")
-                                handler("vote")
-                                # immediate reset
-                                release_all()
-                                executed = True
-                                # record last execution time
-                                last_exec_ts = time.time()
-                        except Exception as e:
-                            reason = f"error:{e}"
-                            now_s = time.time()
-                            error_times.append(now_s)
-                            # prune
-                            while (
-                                error_times
-                                and now_s - error_times[0] > ERROR_WINDOW_SEC
-                            ):
-                                error_times.popleft()
-                            if len(error_times) >= ERROR_TRIP_THRESHOLD:
-                                injection_enabled = False
-                                release_all()
-                                print(
-                                    f"Circuit breaker tripped to prevent fatal issues. Too many errors triggered."
-                                )
-
-            # Summary line
-            total_votes = sum(counts.values())
-            payload = {
-                "ts": time.time(),
-                "winner": winner,
-                "executed": executed,
-                "total_votes": total_votes,
-                "unknown": unknown,
-                "reason": reason,
-            }
+            leader = tally.leader()
+            winner = command_names[leader] if leader is not None else None
+            window.closed_at = time.monotonic()
+            window.winner = winner
+            window.total_votes = tally.total
+            rejected = client.rejected_messages()
+            window.unknown = unknown + rejected - rejected_at_window_start
+            rejected_at_window_start = rejected
+            recovered = matcher.recovered_total
+            window.recovered = recovered - recovered_at_window_start
+            recovered_at_window_start = recovered
+            if leader is not None:
+                window.winner_vote_at = last_vote_at[leader]
+
+            # Hand the winner to the executor stage; the next window starts now.
+            # The executor finishes the window trace once the macro is done.
+            reason = executor.submit(winner, window) if winner else None
+            if reason is None or reason == "dropped":
+                window.outcome = reason or "no_votes"
+                tracer.finish_window(window)
+
+            windows_closed += 1
+            if trace_path and windows_closed % TRACE_DUMP_EVERY_WINDOWS == 0:
+                tracer.dump(trace_path)
 
             # Reset window
             window_end = now + VOTE_WINDOW_SEC
+            window = WindowTrace(window_end=time.monotonic() + VOTE_WINDOW_SEC)
             last_vote_by_user.clear()
-            counts.clear()
-            last_ts_by_cmd.clear()
+            tally.clear()
             unknown = 0
     except KeyboardInterrupt:
         print("Stopping Twitch Plays Every Game.")
@@ -565,191 +857,29 @@ def main():
         print("fatal error in main loop")
         raise
     finally:
+        if api_server is not None:
+            api_server.close()
+        executor.close()
         release_all()
         client.close()
-
-
-def keycode_from_name(name: str) -> Optional[int]:
-    n = name.strip().upper()
-    mapping = {
-        "A": A,
-        "B": B,
-        "C": C,
-        "D": D,
-        "E": E,
-        "F": F,
-        "G": G,
-        "H": H,
-        "I": I,
-        "J": J,
-        "K": K,
-        "L": L,
-        "M": M,
-        "N": N,
-        "O": O,
-        "P": P,
-        "Q": Q,
-        "R": R,
-        "S": S,
-        "T": T,
-        "U": U,
-        "V": V,
-        "W": W,
-        "X": X,
-        "Y": Y,
-        "Z": Z,
-        "SPACE": SPACE,
-        "SPACEBAR": SPACE,
-        "ENTER": ENTER,
-        "ESC": ESC,
-        "TAB": TAB,
-        "LEFT_SHIFT": LEFT_SHIFT,
-        "LEFT_CTRL": LEFT_CONTROL,
-        "LEFT_ALT": LEFT_ALT,
-        "RIGHT_SHIFT": RIGHT_SHIFT,
-        "RIGHT_CTRL": RIGHT_CONTROL,
-        "RIGHT_ALT": RIGHT_ALT,
-        "LEFT": LEFT_ARROW,
-        "RIGHT": RIGHT_ARROW,
-        "UP": UP_ARROW,
-        "DOWN": DOWN_ARROW,
-        "F1": F1,
-        "F2": F2,
-        "F3": F3,
-        "F4": F4,
-        "F5": F5,
-        "F6": F6,
-        "F7": F7,
-        "F8": F8,
-        "F9": F9,
-        "F10": F10,
-        "F11": F11,
-        "F12": F12,
-        "1": ONE,
-        "2": TWO,
-        "3": THREE,
-        "4": FOUR,
-        "5": FIVE,
-        "6": SIX,
-        "7": SEVEN,
-        "8": EIGHT,
-        "9": NINE,
-        "0": ZERO,
-        ".": PERIOD,
-        "NUMPAD_4": NUMPAD_4,
-        "NUMPAD_5": NUMPAD_5,
-        "NUMPAD_6": NUMPAD_6,
-        "NUMPAD_8": NUMPAD_8,
-    }
-    return mapping.get(n)
-
-
-def execute_macro(steps: list) -> None:
-    MAX_MS = 3000
-    for step in steps or []:
-        if not isinstance(step, dict):
-            continue
-        t = str(step.get("type") or "").lower()
-        if t == "parallel":
-            execute_parallel_threads(step.get("threads") or [])
-        elif t == "key_press":
-            kc = keycode_from_name(str(step.get("key") or ""))
-            ms = min(MAX_MS, max(0, int(step.get("duration_ms") or 0)))
-            if kc and ms:
-                press_and_release(kc, ms / 1000.0)
-        elif t == "key_tap":
-            kc = keycode_from_name(str(step.get("key") or ""))
-            ms = min(MAX_MS, max(0, int(step.get("duration_ms") or 60)))
-            if kc:
-                press_and_release(kc, ms / 1000.0)
-        elif t == "key_hold":
-            kc = keycode_from_name(str(step.get("key") or ""))
-            if kc:
-                press_hold(kc)
-        elif t == "key_release":
-            key = step.get("key")
-            keys = step.get("keys")
-            names = keys if isinstance(keys, list) else ([key] if key else [])
-            for name in names:
-                kc = keycode_from_name(str(name or ""))
-                if kc:
-                    release(kc)
-        elif t == "key_combo":
-            keys = step.get("keys") or []
-            ms = min(MAX_MS, max(0, int(step.get("duration_ms") or 0)))
-            kcodes = [keycode_from_name(str(n or "")) for n in keys]
-            kcodes = [k for k in kcodes if k]
-            for kc in kcodes:
-                press_hold(kc)
-            time.sleep(ms / 1000.0 if ms else 0)
-            for kc in kcodes:
-                release(kc)
-        elif t == "mouse_down":
-            b = str(step.get("button") or "left").lower()
-            mouse_down(b)
-        elif t == "mouse_up":
-            b = str(step.get("button") or "left").lower()
-            mouse_up(b)
-        elif t == "mouse_click":
-            b = str(step.get("button") or "left").lower()
-            mouse_click(b)
-        elif t == "mouse_click_at":
-            x, y = point_for_normalized_mouse_coordinate(
-                float(step.get("x") or 0), float(step.get("y") or 0)
-            )
-            mouse_move_to(x, y)
-            b = str(step.get("button") or "left").lower()
-            mouse_click(b)
-        elif t in {"mouse_hold", "mouse_pulse"}:
-            b = str(step.get("button") or "left").lower()
-            ms = min(MAX_MS, max(0, int(step.get("duration_ms") or 0)))
-            mouse_down(b)
-            if ms:
-                time.sleep(ms / 1000.0)
-            mouse_up(b)
-        elif t == "mouse_move":
-            dx = int(step.get("dx") or 0)
-            dy = int(step.get("dy") or 0)
-            mouse_move(dx, dy)
-
-
-def normalize_parallel_thread(thread) -> list:
-    if isinstance(thread, list):
-        return thread
-    if isinstance(thread, dict):
-        return [thread]
-    return []
-
-
-def execute_parallel_threads(thread_specs: list) -> None:
-    errors = []
-    running_threads = []
-
-    def run_thread(thread_steps: list) -> None:
-        try:
-            execute_macro(thread_steps)
-        except Exception as exc:
-            errors.append(exc)
-
-    for thread_spec in thread_specs:
-        thread_steps = normalize_parallel_thread(thread_spec)
-        if not thread_steps:
-            continue
-        thread = threading.Thread(target=run_thread, args=(thread_steps,))
-        thread.start()
-        running_threads.append(thread)
-
-    for thread in running_threads:
-        thread.join()
-
-    if errors:
-        raise RuntimeError(f"Parallel macro thread failed: {errors[0]}")
+        if matcher.recovered_total:
+            kinds = ", ".join(f"{kind} {count}" for kind, count in matcher.recovered.items())
+            print(f"Loose matching recovered {matcher.recovered_total} votes ({kinds}).")
+        dropped = {name: counts["dropped"] for name, counts in hub.stats().items() if counts["dropped"]}
+        if dropped:
+            print(f"Ingest queue was full; dropped chat messages: {dropped}.")
+        if trace_path:
+            tracer.dump(trace_path)
+            print(f"Latency trace written to {trace_path}")
 
 
 def select_profile_game(path: Path) -> ProfileGame:
     with open(path, "r", encoding="utf-8") as f:
         prof = json.load(f)
-    return ProfileGame(prof)
+    try:
+        return ProfileGame(prof)
+    except ProfileError as exc:
+        raise SystemExit(f"Invalid profile {path.name}: {exc}") from exc
 
 
 if __name__ == "__main__":
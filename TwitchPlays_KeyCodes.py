@@ -2,9 +2,12 @@
 # This code contains key codes plus functions to press keys on Windows
 # You should not need to modify anything in this file, just use as is.
 
+import ctypes
 import sys
+import threading
 import time
-from typing import Any, Callable, Optional
+from ctypes import wintypes
+from typing import Any, Callable, Optional, Sequence, Tuple
 
 
 IS_WINDOWS = sys.platform == "win32"
@@ -111,6 +114,14 @@ NUMPAD_PERIOD = 0x53
 NUMPAD_ENTER = 0x9C
 NUMPAD_BACKSLASH = 0xB5
 
+# The scan codes above by name; profiles may only name keys from this table,
+# never the mouse codes or the Win32 input flags defined further down.
+scan_code_by_name = {
+    name: value
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int) and not isinstance(value, bool)
+}
+
 LEFT_MOUSE = 0x100
 RIGHT_MOUSE = 0x101
 MIDDLE_MOUSE = 0x102
@@ -197,7 +208,13 @@ def key_name_from_code(hexKeyCode: int) -> str:
         raise ValueError(f"Unsupported key code for non-Windows input: {hexKeyCode}") from exc
 
 
+PYAUTOGUI: Any = None
+
+
 def load_pyautogui():
+    global PYAUTOGUI
+    if PYAUTOGUI is not None:
+        return PYAUTOGUI
     try:
         import pyautogui
     except BaseException as exc:
@@ -205,92 +222,221 @@ def load_pyautogui():
             "pyautogui is required for Twitch Plays input injection on Linux/macOS."
         ) from exc
     pyautogui.FAILSAFE = False
+    PYAUTOGUI = pyautogui
     return pyautogui
 
 
+#############################################################
+################### INPUT BACKEND CHOICE ####################
+#############################################################
+
+# "auto" means SendInput on Windows, XTest on Linux when python-xlib and an
+# X11 display are available, and pyautogui otherwise.
+INPUT_BACKENDS = ("auto", "sendinput", "pyautogui", "xtest", "uinput")
+INPUT_BACKEND_NAME: Optional[str] = None
+NATIVE_INPUT: Any = None
+
+
+def set_input_backend(name: str = "auto") -> str:
+    """Select how keys and mouse buttons are injected; returns the backend in use."""
+    global INPUT_BACKEND_NAME, NATIVE_INPUT
+    if name not in INPUT_BACKENDS:
+        raise ValueError(f"Unknown input backend `{name}`. Use one of {', '.join(INPUT_BACKENDS)}.")
+
+    if IS_WINDOWS:
+        if name not in ("auto", "sendinput"):
+            raise RuntimeError(f"The `{name}` input backend is only available on Linux.")
+        INPUT_BACKEND_NAME = "sendinput"
+        return INPUT_BACKEND_NAME
+    if name == "sendinput":
+        raise RuntimeError("The `sendinput` input backend is only available on Windows.")
+
+    if NATIVE_INPUT is not None:
+        NATIVE_INPUT.close()
+        NATIVE_INPUT = None
+
+    if name in ("xtest", "uinput") or (name == "auto" and sys.platform.startswith("linux")):
+        import linux_input
+
+        try:
+            NATIVE_INPUT = linux_input.create_input_backend("xtest" if name == "auto" else name)
+        except RuntimeError:
+            if name != "auto":
+                raise
+
+    INPUT_BACKEND_NAME = NATIVE_INPUT.name if NATIVE_INPUT is not None else "pyautogui"
+    return INPUT_BACKEND_NAME
+
+
+def native_input() -> Any:
+    """The persistent Linux backend (xtest/uinput) in use, or None."""
+    if INPUT_BACKEND_NAME is None:
+        set_input_backend("auto")
+    return NATIVE_INPUT
+
+
 #############################################################
 ################## DIRECT INPUT FUNCTIONS ###################
 #############################################################
 
-if IS_WINDOWS:
-    import ctypes
-    from ctypes import wintypes
-
-    KEYEVENTF_EXTENDEDKEY = 0x0001
-    KEYEVENTF_KEYUP = 0x0002
-    KEYEVENTF_SCANCODE = 0x0008
-
-    # Structures for SendInput
-    # Correct ULONG_PTR as an integer-sized pointer, not a pointer type
-    if ctypes.sizeof(ctypes.c_void_p) == 8:
-        ULONG_PTR = ctypes.c_ulonglong
-    else:
-        ULONG_PTR = ctypes.c_ulong
-
-    class KEYBDINPUT(ctypes.Structure):
-        _fields_ = [
-            ("wVk", wintypes.WORD),
-            ("wScan", wintypes.WORD),
-            ("dwFlags", wintypes.DWORD),
-            ("time", wintypes.DWORD),
-            ("dwExtraInfo", ULONG_PTR),
-        ]
-
-    class MOUSEINPUT(ctypes.Structure):
-        _fields_ = [
-            ("dx", wintypes.LONG),
-            ("dy", wintypes.LONG),
-            ("mouseData", wintypes.DWORD),
-            ("dwFlags", wintypes.DWORD),
-            ("time", wintypes.DWORD),
-            ("dwExtraInfo", ULONG_PTR),
-        ]
-
-    class HARDWAREINPUT(ctypes.Structure):
-        _fields_ = [
-            ("uMsg", wintypes.DWORD),
-            ("wParamL", wintypes.WORD),
-            ("wParamH", wintypes.WORD),
-        ]
-
-    class INPUTUNION(ctypes.Union):
-        _fields_ = [
-            ("ki", KEYBDINPUT),
-            ("mi", MOUSEINPUT),
-            ("hi", HARDWAREINPUT),
-        ]
-
-    class INPUT(ctypes.Structure):
-        _anonymous_ = ("u",)
-        _fields_ = [
-            ("type", wintypes.DWORD),
-            ("u", INPUTUNION),
-        ]
+# Input transitions are (kind, value) pairs:
+#   ("key_down", scan_code), ("key_up", scan_code),
+#   ("mouse_down", "left"), ("mouse_up", "left"), ("mouse_move", (dx, dy))
+# A sequence of them is submitted together with SendTransitions().
+Transition = Tuple[str, Any]
+
+INPUT_MOUSE = 0
+INPUT_KEYBOARD = 1
+
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_SCANCODE = 0x0008
+
+MOUSEEVENTF_MOVE = 0x0001
+MOUSE_BUTTON_FLAGS = {
+    ("mouse_down", "left"): 0x0002,
+    ("mouse_up", "left"): 0x0004,
+    ("mouse_down", "right"): 0x0008,
+    ("mouse_up", "right"): 0x0010,
+    ("mouse_down", "middle"): 0x0020,
+    ("mouse_up", "middle"): 0x0040,
+}
 
+# Structures for SendInput. They are plain ctypes, so packing can be checked
+# on any platform with a fake SendInput.
+# Correct ULONG_PTR as an integer-sized pointer, not a pointer type
+if ctypes.sizeof(ctypes.c_void_p) == 8:
+    ULONG_PTR = ctypes.c_ulonglong
+else:
+    ULONG_PTR = ctypes.c_ulong
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ULONG_PTR),
+    ]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ULONG_PTR),
+    ]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [
+        ("uMsg", wintypes.DWORD),
+        ("wParamL", wintypes.WORD),
+        ("wParamH", wintypes.WORD),
+    ]
+
+
+class INPUTUNION(ctypes.Union):
+    _fields_ = [
+        ("ki", KEYBDINPUT),
+        ("mi", MOUSEINPUT),
+        ("hi", HARDWAREINPUT),
+    ]
+
+
+class INPUT(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [
+        ("type", wintypes.DWORD),
+        ("u", INPUTUNION),
+    ]
+
+
+get_last_error: Callable[[], Optional[int]] = getattr(
+    ctypes, "get_last_error", lambda: None
+)
+
+
+class InputBatch:
+    """Reusable INPUT array that submits many transitions per SendInput call.
+
+    `send_input` has the SendInput signature (count, array, struct size) and
+    returns how many events were injected.
+    """
+
+    def __init__(self, send_input: Callable[..., int], capacity: int = 32) -> None:
+        self.send_input = send_input
+        self.capacity = capacity
+        self.buffer = (INPUT * capacity)()
+        self.lock = threading.Lock()
+
+    def pack(self, transitions: Sequence[Transition]) -> int:
+        """Write transitions into the front of the buffer; returns the count."""
+        count = 0
+        for kind, value in transitions:
+            inp = self.buffer[count]
+            if kind == "key_down" or kind == "key_up":
+                inp.type = INPUT_KEYBOARD
+                inp.ki.wVk = 0
+                inp.ki.wScan = value & 0xFFFF
+                inp.ki.dwFlags = (
+                    KEYEVENTF_SCANCODE
+                    if kind == "key_down"
+                    else KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP
+                )
+                inp.ki.time = 0
+                inp.ki.dwExtraInfo = 0
+            else:
+                inp.type = INPUT_MOUSE
+                if kind == "mouse_move":
+                    inp.mi.dx, inp.mi.dy = value
+                    inp.mi.dwFlags = MOUSEEVENTF_MOVE
+                else:
+                    inp.mi.dx = 0
+                    inp.mi.dy = 0
+                    try:
+                        inp.mi.dwFlags = MOUSE_BUTTON_FLAGS[(kind, value)]
+                    except KeyError as exc:
+                        raise ValueError(f"Unsupported input transition: {kind} {value}") from exc
+                inp.mi.mouseData = 0
+                inp.mi.time = 0
+                inp.mi.dwExtraInfo = 0
+            count += 1
+        return count
+
+    def send(self, transitions: Sequence[Transition]) -> None:
+        with self.lock:
+            for start in range(0, len(transitions), self.capacity):
+                chunk = transitions[start : start + self.capacity]
+                count = self.pack(chunk)
+                n = self.send_input(count, self.buffer, ctypes.sizeof(INPUT))
+                if n != count:
+                    err = get_last_error()
+                    # Print only on failure to avoid noisy logs
+                    print(f"SendInput injected {n} of {count} events err={err}")
+
+
+if IS_WINDOWS:
     WinDLL: Any = getattr(ctypes, "WinDLL")
-    get_last_error: Callable[[], Optional[int]] = getattr(
-        ctypes, "get_last_error", lambda: None
-    )
 
     user32 = WinDLL("user32", use_last_error=True)
     SendInput = user32.SendInput
     SendInput.restype = wintypes.UINT
     SendInput.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
 
+    INPUT_BATCH = InputBatch(SendInput)
+
+    def SendTransitions(transitions: Sequence[Transition]) -> None:
+        INPUT_BATCH.send(transitions)
+
     def send_key(scan_code: int, flags: int) -> None:
-        ki = KEYBDINPUT(
-            wVk=0,
-            wScan=scan_code & 0xFFFF,
-            dwFlags=flags,
-            time=0,
-            dwExtraInfo=ULONG_PTR(0),
+        SendTransitions(
+            (("key_up" if flags & KEYEVENTF_KEYUP else "key_down", scan_code),)
         )
-        inp = INPUT(type=1, u=INPUTUNION(ki=ki))
-        n = SendInput(1, ctypes.byref(inp), ctypes.sizeof(INPUT))
-        if n != 1:
-            err = get_last_error()
-            # Print only on failure to avoid noisy logs
-            print(f"SendInput failed (scan=0x{scan_code:X} flags=0x{flags:X}) err={err}")
 
     def HoldKey(hexKeyCode: int) -> None:
         send_key(hexKeyCode, KEYEVENTF_SCANCODE)
@@ -299,11 +445,54 @@ if IS_WINDOWS:
         send_key(hexKeyCode, KEYEVENTF_SCANCODE | KEYEVENTF_KEYUP)
 else:
     def HoldKey(hexKeyCode: int) -> None:
+        backend = native_input()
+        if backend is not None:
+            backend.send((("key_down", hexKeyCode),))
+            return
         load_pyautogui().keyDown(key_name_from_code(hexKeyCode))
 
     def ReleaseKey(hexKeyCode: int) -> None:
+        backend = native_input()
+        if backend is not None:
+            backend.send((("key_up", hexKeyCode),))
+            return
         load_pyautogui().keyUp(key_name_from_code(hexKeyCode))
 
+    def SendTransitions(transitions: Sequence[Transition]) -> None:
+        backend = native_input()
+        if backend is not None:
+            backend.send(transitions)
+            return
+        # pyautogui has no batched injection API; replay the transitions in order.
+        for kind, value in transitions:
+            if kind == "key_down":
+                HoldKey(value)
+            elif kind == "key_up":
+                ReleaseKey(value)
+            elif kind == "mouse_down":
+                load_pyautogui().mouseDown(button=value)
+            elif kind == "mouse_up":
+                load_pyautogui().mouseUp(button=value)
+            elif kind == "mouse_move":
+                load_pyautogui().moveRel(*value)
+            else:
+                raise ValueError(f"Unsupported input transition: {kind} {value}")
+
+
+def HoldKeys(hexKeyCodes: Sequence[int]) -> None:
+    SendTransitions([("key_down", code) for code in hexKeyCodes])
+
+
+def ReleaseKeys(hexKeyCodes: Sequence[int]) -> None:
+    SendTransitions([("key_up", code) for code in hexKeyCodes])
+
+
+# Keys a batch leaves released. The last transition for a key decides, so a
+# batch that releases a key and presses it again leaves it held.
+def released_keys(transitions: Sequence[Transition]) -> set:
+    last_kind = {value: kind for kind, value in transitions if kind in ("key_down", "key_up")}
+    return {value for value, kind in last_kind.items() if kind == "key_up"}
+
 
 # Holds down a key for the specified number of seconds
 def HoldAndReleaseKey(hexKeyCode: int, seconds: float) -> None:
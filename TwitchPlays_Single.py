@@ -41,7 +41,6 @@ import json
 import re
 import shutil
 import sys
-import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
@@ -57,8 +56,20 @@ try:
 except BaseException:
     pydirectinput = None
 
+import TwitchPlays_AsyncConnection
 import TwitchPlays_Connection
+from TwitchPlays_AsyncConnection import CHAT_TRANSPORTS
 from TwitchPlays_KeyCodes import *
+from vote_tally import VoteTally
+from command_matcher import CommandMatcher, profile_match_tolerance
+from ingest_hub import IngestHub
+from macro_program import (
+    MacroBackend,
+    MacroProgram,
+    ProfileError,
+    compile_macros,
+    execute_program,
+)
 
 
 DEFAULT_GAME = "single"
@@ -86,6 +97,7 @@ if pydirectinput is not None and hasattr(pydirectinput, "FAILSAFE"):
 
 
 HELD_KEYS: set[int] = set()
+MOUSE_BACKEND: Optional[Tuple[str, Any]] = None
 
 
 @dataclass(frozen=True)
@@ -110,50 +122,64 @@ class ProfileGame:
             for alias, canonical in (profile.get("aliases") or {}).items()
             if str(alias or "").strip() and str(canonical or "").strip()
         }
-        self.canonical_to_macros: Dict[str, list] = profile.get("macros") or {}
+        self.programs: Dict[str, MacroProgram] = compile_macros(
+            profile.get("macros"), MACRO_BACKEND
+        )
 
         for alias, canonical in aliases.items():
             self.commands[alias] = self.make_handler(canonical)
+        self.matcher = CommandMatcher(self.commands, profile_match_tolerance(profile))
 
     def make_handler(self, canonical: str) -> Callable[[str], None]:
+        program = self.programs.get(canonical, ())
+
         def handler(user: str) -> None:
-            execute_macro(self.canonical_to_macros.get(canonical) or [])
+            execute_program(program)
 
         return handler
 
 
 class MultiChat:
-    def __init__(self, twitch_client=None, youtube_client=None):
+    """Chat sources behind one IngestHub; each source is read on its own thread."""
+
+    def __init__(self, twitch_client=None, youtube_client=None, hub: Optional[IngestHub] = None):
         self.twitch_client = twitch_client
         self.youtube_client = youtube_client
+        self.hub = hub or IngestHub()
+        if twitch_client:
+            self.hub.add_source("twitch", twitch_client)
+        if youtube_client:
+            self.hub.add_source("youtube", youtube_client)
+        self.hub.start()
 
-    def receive_messages(self) -> List[dict]:
-        messages = []
-        if self.twitch_client:
-            messages.extend(self.twitch_client.twitch_receive_messages())
-        if self.youtube_client:
-            messages.extend(self.youtube_client.twitch_receive_messages())
+    def receive_messages(self) -> List[TwitchPlays_Connection.ChatMessage]:
+        messages = self.hub.drain()
 
         normalized = []
         for message in messages:
-            text = str(message.get("message") or "").strip()
-            username = str(message.get("username") or "").strip()
+            text = message.message.strip()
+            username = message.username.strip()
             if not text or not username:
                 continue
             if len(text) > MAX_MESSAGE_LENGTH:
                 continue
-            normalized.append({"message": text.lower(), "username": username.lower()})
+            message.message = text.lower()
+            message.username = sys.intern(username.lower())
+            normalized.append(message)
         return normalized
 
     def close(self) -> None:
+        self.hub.close()
         if self.twitch_client:
             try:
                 self.twitch_client.close()
             except Exception:
                 pass
         if self.youtube_client:
-            close_session(getattr(self.youtube_client, "session", None))
-            close_thread_pool(getattr(self.youtube_client, "thread_pool", None))
+            try:
+                self.youtube_client.close()
+            except Exception:
+                pass
 
 
 def parse_args() -> argparse.Namespace:
@@ -171,6 +197,18 @@ def parse_args() -> argparse.Namespace:
         default=DEFAULT_SOURCES,
         help="Comma-separated chat sources: twitch,youtube",
     )
+    parser.add_argument(
+        "--transport",
+        default="threads",
+        choices=CHAT_TRANSPORTS,
+        help="Chat readers on their own threads, or every connection on one asyncio loop",
+    )
+    parser.add_argument(
+        "--input-backend",
+        default="auto",
+        choices=INPUT_BACKENDS,
+        help="How keys and mouse input are injected (xtest/uinput are Linux only)",
+    )
     return parser.parse_args()
 
 
@@ -240,10 +278,13 @@ def create_profile_from_template(profile_path: Path) -> None:
 def select_profile_game(path: Path) -> ProfileGame:
     with open(path, "r", encoding="utf-8") as profile_file:
         profile = json.load(profile_file)
-    return ProfileGame(profile)
+    try:
+        return ProfileGame(profile)
+    except ProfileError as exc:
+        raise SystemExit(f"Invalid profile {path.name}: {exc}") from exc
 
 
-def connect_chat(sources: List[str]) -> MultiChat:
+def connect_chat(sources: List[str], transport: str = "threads") -> MultiChat:
     try:
         stream_config = TwitchPlays_Connection.load_twitchplays_config()
     except (FileNotFoundError, RuntimeError) as exc:
@@ -256,22 +297,28 @@ def connect_chat(sources: List[str]) -> MultiChat:
 
     twitch_client = None
     youtube_client = None
+    hub = IngestHub()
+    transports = (
+        TwitchPlays_AsyncConnection if transport == "asyncio" else TwitchPlays_Connection
+    )
 
     try:
         if "twitch" in sources:
             if not twitch_channel:
                 raise SystemExit("twitch_channel is required when Twitch chat is enabled.")
-            twitch_client = TwitchPlays_Connection.Twitch()
+            twitch_client = transports.Twitch(signal=hub.source_signal("twitch"))
             twitch_client.twitch_connect(twitch_channel)
 
         if "youtube" in sources:
             if youtube_channel_id or youtube_stream_url:
-                youtube_client = TwitchPlays_Connection.YouTube(api_key=youtube_api_key)
+                youtube_client = transports.YouTube(
+                    api_key=youtube_api_key, signal=hub.source_signal("youtube")
+                )
                 youtube_client.youtube_connect(
                     youtube_channel_id, youtube_stream_url, api_key=youtube_api_key
                 )
     except BaseException:
-        MultiChat(twitch_client=twitch_client, youtube_client=youtube_client).close()
+        MultiChat(twitch_client=twitch_client, youtube_client=youtube_client, hub=hub).close()
         raise
 
     if not twitch_client and not youtube_client:
@@ -279,116 +326,7 @@ def connect_chat(sources: List[str]) -> MultiChat:
             "No valid chat sources. Configure Twitch or YouTube, or use --sources twitch."
         )
 
-    return MultiChat(twitch_client=twitch_client, youtube_client=youtube_client)
-
-
-def close_session(session) -> None:
-    if session is None:
-        return
-    try:
-        session.close()
-    except Exception:
-        pass
-
-
-def close_thread_pool(thread_pool) -> None:
-    if thread_pool is None:
-        return
-    try:
-        thread_pool.shutdown(wait=False)
-    except Exception:
-        pass
-
-
-def keycode_from_name(name: str) -> Optional[int]:
-    normalized = name.strip().upper()
-    mapping = {
-        "A": A,
-        "B": B,
-        "C": C,
-        "D": D,
-        "E": E,
-        "F": F,
-        "G": G,
-        "H": H,
-        "I": I,
-        "J": J,
-        "K": K,
-        "L": L,
-        "M": M,
-        "N": N,
-        "O": O,
-        "P": P,
-        "Q": Q,
-        "R": R,
-        "S": S,
-        "T": T,
-        "U": U,
-        "V": V,
-        "W": W,
-        "X": X,
-        "Y": Y,
-        "Z": Z,
-        "SPACE": SPACE,
-        "SPACEBAR": SPACE,
-        "ENTER": ENTER,
-        "ESC": ESC,
-        "TAB": TAB,
-        "LEFT_SHIFT": LEFT_SHIFT,
-        "LEFT_CTRL": LEFT_CONTROL,
-        "LEFT_ALT": LEFT_ALT,
-        "RIGHT_SHIFT": RIGHT_SHIFT,
-        "RIGHT_CTRL": RIGHT_CONTROL,
-        "RIGHT_ALT": RIGHT_ALT,
-        "LEFT": LEFT_ARROW,
-        "RIGHT": RIGHT_ARROW,
-        "UP": UP_ARROW,
-        "DOWN": DOWN_ARROW,
-        "F1": F1,
-        "F2": F2,
-        "F3": F3,
-        "F4": F4,
-        "F5": F5,
-        "F6": F6,
-        "F7": F7,
-        "F8": F8,
-        "F9": F9,
-        "F10": F10,
-        "F11": F11,
-        "F12": F12,
-        "1": ONE,
-        "2": TWO,
-        "3": THREE,
-        "4": FOUR,
-        "5": FIVE,
-        "6": SIX,
-        "7": SEVEN,
-        "8": EIGHT,
-        "9": NINE,
-        "0": ZERO,
-        ".": PERIOD,
-        "NUMPAD_0": NUMPAD_0,
-        "NUMPAD_1": NUMPAD_1,
-        "NUMPAD_2": NUMPAD_2,
-        "NUMPAD_3": NUMPAD_3,
-        "NUMPAD_4": NUMPAD_4,
-        "NUMPAD_5": NUMPAD_5,
-        "NUMPAD_6": NUMPAD_6,
-        "NUMPAD_7": NUMPAD_7,
-        "NUMPAD_8": NUMPAD_8,
-        "NUMPAD_9": NUMPAD_9,
-    }
-    return mapping.get(normalized)
-
-
-def press_and_release(keycode: int, seconds: float = 0.1) -> None:
-    try:
-        HELD_KEYS.add(keycode)
-        HoldKey(keycode)
-        time.sleep(max(0.01, float(seconds)))
-    finally:
-        ReleaseKey(keycode)
-        HELD_KEYS.discard(keycode)
+    return MultiChat(twitch_client=twitch_client, youtube_client=youtube_client, hub=hub)
 
 
 def press_hold(keycode: int) -> None:
@@ -401,22 +339,50 @@ def release(keycode: int) -> None:
     HELD_KEYS.discard(keycode)
 
 
+def hold_keys(keycodes: Tuple[int, ...]) -> None:
+    HELD_KEYS.update(keycodes)
+    HoldKeys(keycodes)
+
+
+def release_keys(keycodes: Tuple[int, ...]) -> None:
+    ReleaseKeys(keycodes)
+    HELD_KEYS.difference_update(keycodes)
+
+
+def send_transitions(transitions: Tuple[Tuple[str, Any], ...]) -> None:
+    """Inject simultaneous key/mouse transitions together, tracking held keys."""
+    HELD_KEYS.update(value for kind, value in transitions if kind == "key_down")
+    SendTransitions(transitions)
+    HELD_KEYS.difference_update(released_keys(transitions))
+
+
 def load_mouse_backend() -> Tuple[str, Any]:
+    global MOUSE_BACKEND
+    if MOUSE_BACKEND is not None:
+        return MOUSE_BACKEND
     if sys.platform == "win32" and pydirectinput is not None:
-        return ("pydirectinput", pydirectinput)
-    if pyautogui is not None:
-        return ("pyautogui", pyautogui)
-    raise RuntimeError(
-        "Mouse input requires pyautogui on Linux/macOS or pyautogui/pydirectinput on Windows."
-    )
+        MOUSE_BACKEND = ("pydirectinput", pydirectinput)
+    elif pyautogui is not None:
+        MOUSE_BACKEND = ("pyautogui", pyautogui)
+    else:
+        raise RuntimeError(
+            "Mouse input requires pyautogui on Linux/macOS or pyautogui/pydirectinput on Windows."
+        )
+    return MOUSE_BACKEND
 
 
 def mouse_down(button: str = "left") -> None:
+    if native_input() is not None:
+        SendTransitions((("mouse_down", button),))
+        return
     backend = load_mouse_backend()[1]
     backend.mouseDown(button=button)
 
 
 def mouse_up(button: str = "left") -> None:
+    if native_input() is not None:
+        SendTransitions((("mouse_up", button),))
+        return
     backend = load_mouse_backend()[1]
     backend.mouseUp(button=button)
 
@@ -427,6 +393,9 @@ def mouse_click(button: str = "left") -> None:
 
 
 def mouse_move(dx: int = 0, dy: int = 0) -> None:
+    if native_input() is not None:
+        SendTransitions((("mouse_move", (dx, dy)),))
+        return
     backend_name, backend = load_mouse_backend()
     if backend_name == "pydirectinput":
         backend.moveRel(dx, dy, relative=True)
@@ -468,104 +437,6 @@ def release_all() -> None:
             pass
 
 
-def execute_macro(steps: list) -> None:
-    max_ms = 3000
-    for step in steps or []:
-        if not isinstance(step, dict):
-            continue
-        step_type = str(step.get("type") or "").lower()
-        if step_type == "parallel":
-            execute_parallel_threads(step.get("threads") or [])
-        elif step_type == "key_press":
-            keycode = keycode_from_name(str(step.get("key") or ""))
-            duration_ms = min(max_ms, max(0, int(step.get("duration_ms") or 0)))
-            if keycode and duration_ms:
-                press_and_release(keycode, duration_ms / 1000.0)
-        elif step_type == "key_tap":
-            keycode = keycode_from_name(str(step.get("key") or ""))
-            duration_ms = min(max_ms, max(0, int(step.get("duration_ms") or 60)))
-            if keycode:
-                press_and_release(keycode, duration_ms / 1000.0)
-        elif step_type == "key_hold":
-            keycode = keycode_from_name(str(step.get("key") or ""))
-            if keycode:
-                press_hold(keycode)
-        elif step_type == "key_release":
-            key = step.get("key")
-            keys = step.get("keys")
-            names = keys if isinstance(keys, list) else ([key] if key else [])
-            for name in names:
-                keycode = keycode_from_name(str(name or ""))
-                if keycode:
-                    release(keycode)
-        elif step_type == "key_combo":
-            keys = step.get("keys") or []
-            duration_ms = min(max_ms, max(0, int(step.get("duration_ms") or 0)))
-            keycodes = [keycode_from_name(str(name or "")) for name in keys]
-            keycodes = [keycode for keycode in keycodes if keycode]
-            for keycode in keycodes:
-                press_hold(keycode)
-            time.sleep(duration_ms / 1000.0 if duration_ms else 0)
-            for keycode in keycodes:
-                release(keycode)
-        elif step_type == "mouse_down":
-            mouse_down(str(step.get("button") or "left").lower())
-        elif step_type == "mouse_up":
-            mouse_up(str(step.get("button") or "left").lower())
-        elif step_type == "mouse_click":
-            mouse_click(str(step.get("button") or "left").lower())
-        elif step_type == "mouse_click_at":
-            width, height = screen_size()
-            vote = CoordinateVote(
-                x=clamp_number(float(step.get("x") or 0), -COORD_LIMIT, COORD_LIMIT),
-                y=clamp_number(float(step.get("y") or 0), -COORD_LIMIT, COORD_LIMIT),
-            )
-            mouse_move_to(point_for_coordinate(vote, width, height))
-            mouse_click(str(step.get("button") or "left").lower())
-        elif step_type in {"mouse_hold", "mouse_pulse"}:
-            button = str(step.get("button") or "left").lower()
-            duration_ms = min(max_ms, max(0, int(step.get("duration_ms") or 0)))
-            mouse_down(button)
-            if duration_ms:
-                time.sleep(duration_ms / 1000.0)
-            mouse_up(button)
-        elif step_type == "mouse_move":
-            mouse_move(int(step.get("dx") or 0), int(step.get("dy") or 0))
-
-
-def normalize_parallel_thread(thread) -> list:
-    if isinstance(thread, list):
-        return thread
-    if isinstance(thread, dict):
-        return [thread]
-    return []
-
-
-def execute_parallel_threads(thread_specs: list) -> None:
-    errors = []
-    running_threads = []
-
-    def run_thread(thread_steps: list) -> None:
-        try:
-            execute_macro(thread_steps)
-        except Exception as exc:
-            errors.append(exc)
-
-    for thread_spec in thread_specs:
-        thread_steps = normalize_parallel_thread(thread_spec)
-        if not thread_steps:
-            continue
-        thread = threading.Thread(target=run_thread, args=(thread_steps,))
-        thread.start()
-        running_threads.append(thread)
-
-    for thread in running_threads:
-        thread.join()
-
-    if errors:
-        raise RuntimeError(f"Parallel macro thread failed: {errors[0]}")
-
-
 def clamp_number(value: float, low: float, high: float) -> float:
     return min(high, max(low, value))
 
@@ -591,6 +462,28 @@ def point_for_coordinate(vote: CoordinateVote, width: int, height: int) -> Scree
     )
 
 
+def mouse_click_at(x_value: float, y_value: float, button: str = "left") -> None:
+    width, height = screen_size()
+    vote = CoordinateVote(
+        x=clamp_number(x_value, -COORD_LIMIT, COORD_LIMIT),
+        y=clamp_number(y_value, -COORD_LIMIT, COORD_LIMIT),
+    )
+    mouse_move_to(point_for_coordinate(vote, width, height))
+    mouse_click(button)
+
+
+MACRO_BACKEND = MacroBackend(
+    key_down=hold_keys,
+    key_up=release_keys,
+    mouse_down=mouse_down,
+    mouse_up=mouse_up,
+    mouse_click=mouse_click,
+    mouse_click_at=mouse_click_at,
+    mouse_move=mouse_move,
+    send_transitions=send_transitions,
+)
+
+
 def center_point(width: int, height: int) -> ScreenPoint:
     return ScreenPoint(x=int(round((width - 1) / 2.0)), y=int(round((height - 1) / 2.0)))
 
@@ -627,7 +520,7 @@ def run_click_round(chat: MultiChat, vote_seconds: float) -> None:
             if processed_count >= MAX_MESSAGES_PER_WINDOW:
                 continue
             processed_count += 1
-            vote = parse_coordinate_vote(message["message"])
+            vote = parse_coordinate_vote(message.message)
             if vote is None:
                 continue
             vote_count += 1
@@ -661,8 +554,7 @@ def run_command_round(chat: MultiChat, game: ProfileGame, vote_seconds: float) -
     print(f"Command vote started for {format_seconds(vote_seconds)}.")
 
     end_time = time.monotonic() + vote_seconds
-    counts: Dict[str, int] = {}
-    last_seen: Dict[str, float] = {}
+    tally = VoteTally()
     processed_count = 0
     vote_count = 0
 
@@ -671,21 +563,21 @@ def run_command_round(chat: MultiChat, game: ProfileGame, vote_seconds: float) -
             if processed_count >= MAX_MESSAGES_PER_WINDOW:
                 continue
             processed_count += 1
-            command = message["message"]
-            if command not in game.commands:
+            command = game.matcher.match(message.message)
+            if command is None:
                 continue
             vote_count += 1
-            counts[command] = counts.get(command, 0) + 1
-            last_seen[command] = time.monotonic()
+            tally.add(command)
 
         time.sleep(IDLE_SLEEP_SEC)
 
-    if not counts:
+    leader = tally.leader()
+    if leader is None:
         print("No valid command votes this round.")
         return
 
-    winner = max(counts, key=lambda command: (counts[command], last_seen.get(command, 0.0)))
-    print(f"Executing '{winner}' with {counts[winner]} vote messages.")
+    winner = game.matcher.names[leader]
+    print(f"Executing '{winner}' with {tally.count(leader)} vote messages.")
     try:
         game.commands[winner]("vote")
     except Exception as exc:
@@ -725,6 +617,11 @@ def main() -> None:
     vote_seconds = parse_vote_seconds(args.time)
     sources = parse_sources(args.sources)
     validate_mode_requirements(args.mode)
+    try:
+        backend_name = set_input_backend(args.input_backend)
+    except (RuntimeError, ValueError) as exc:
+        raise SystemExit(str(exc)) from exc
+    print(f"Input backend: {backend_name}")
 
     profile_path = profile_path_for_game(args.game)
     if not profile_path.exists():
@@ -732,7 +629,7 @@ def main() -> None:
     game = select_profile_game(profile_path)
     print(f"Loaded profile: {profile_path.name} with {len(game.commands)} commands.")
 
-    chat = connect_chat(sources)
+    chat = connect_chat(sources, args.transport)
 
     try:
         run_startup_countdown()
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for per-event input injection cost.
+
+    python bench_input.py                  # dry run, no input is injected
+    python bench_input.py --live xtest     # inject harmless Shift taps
+
+The dry run measures the encode + write path of the uinput backend against
+/dev/null and the SendInput batch packing with a no-op sender, so it works on
+any machine; the uinput part is skipped where linux_input cannot load (it
+needs fcntl, which Windows lacks). It first checks that released_keys() keeps a key held when a
+batch releases and presses it again, as a key_tap followed by a key_hold of
+the same key compiles to. --live uses a real backend; focus a harmless window first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Callable
+
+from TwitchPlays_KeyCodes import (
+    LEFT_SHIFT,
+    W,
+    InputBatch,
+    native_input,
+    released_keys,
+    set_input_backend,
+)
+
+TAP = (("key_down", LEFT_SHIFT), ("key_up", LEFT_SHIFT))
+
+
+def per_event_us(label: str, batches: int, events_per_batch: int, send: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    for _ in range(batches):
+        send()
+    elapsed = time.perf_counter() - start
+    events = batches * events_per_batch
+    print(f"{label:<28} {elapsed / events * 1e6:8.2f} us/event  ({events} events)")
+
+
+def check_held_tracking() -> None:
+    retap = (("key_up", W), ("key_down", W))
+    if released_keys(retap) or released_keys(TAP) != {LEFT_SHIFT}:
+        raise SystemExit("released_keys() lost track of a key released and pressed again.")
+
+
+def run_dry(batches: int) -> None:
+    check_held_tracking()
+    try:
+        from linux_input import UInputBackend
+    except ImportError:
+        print(f"{'uinput encode+write':<28} skipped, linux_input needs fcntl")
+    else:
+        null_fd = os.open(os.devnull, os.O_WRONLY)
+        uinput = UInputBackend(fd=null_fd)
+        try:
+            per_event_us("uinput encode+write", batches, len(TAP), lambda: uinput.send(TAP))
+        finally:
+            uinput.close()
+
+    batch = InputBatch(lambda count, inputs, size: count)
+    per_event_us("sendinput pack", batches, len(TAP), lambda: batch.send(TAP))
+
+
+def run_live(backend_name: str, batches: int) -> None:
+    name = set_input_backend(backend_name)
+    backend = native_input()
+    if backend is None:
+        raise SystemExit(f"`{name}` has no native backend to benchmark; use xtest or uinput.")
+    print(f"Injecting {batches} Shift taps through {name} in 3 seconds...")
+    time.sleep(3)
+    per_event_us(f"{name} live", batches, len(TAP), lambda: backend.send(TAP))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Input injection micro-benchmark")
+    parser.add_argument("--batches", type=int, default=20000, help="Batches to send")
+    parser.add_argument(
+        "--live",
+        choices=("xtest", "uinput"),
+        help="Inject real Shift taps through this backend instead of a dry run",
+    )
+    args = parser.parse_args()
+    if args.live:
+        run_live(args.live, args.batches)
+    else:
+        run_dry(args.batches)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1583 @@
+"""
+Offline chat load generation for Twitch Plays.
+
+Stands in for Twitch and YouTube so the whole pipeline can be pushed at
+1k-50k messages/sec without a live channel:
+
+- FakeEventSubServer
+    Local websocket server speaking the EventSub session protocol that
+    Twitch.reader_loop expects: session_welcome, session_keepalive,
+    notification and session_reconnect.
+
+- FakeChatHttpServer
+    Local HTTP server for the Twitch OAuth/Helix calls made while connecting,
+    plus the YouTube live page, live_chat page and get_live_chat endpoint the
+    scraper polls.
+
+- scripted_events(...) / replay_events(path) / ChatRecorder
+    A scripted chat generator (users, command weights, noise, bursts) and a
+    JSONL recorder/replayer for real chat.
+
+Usage:
+    python chat_loadgen.py bench --rate 5000 --seconds 10
+    python chat_loadgen.py run --game supertux --rate 2000 -- --countdown 0
+    python chat_loadgen.py record --out chat.jsonl --seconds 600
+    python chat_loadgen.py bench --replay chat.jsonl --speed 20
+    python chat_loadgen.py bench --channels 3 --transport asyncio
+    python chat_loadgen.py decode --rate 5000 --seconds 10
+    python chat_loadgen.py scrape --watch-page watch.html --chat-page live_chat.html
+
+`run` and `bench` point TwitchPlays_Connection at the fake servers in this
+process only; nothing touches the network or your real config.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import gc
+import hashlib
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from json.encoder import encode_basestring as encode_json_string
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import TwitchPlays_AsyncConnection
+import TwitchPlays_Connection
+import youtube_page
+from command_matcher import DEFAULT_MATCH_TOLERANCE, CommandMatcher
+from ingest_hub import IngestHub
+
+FAKE_CHANNEL = "loadgen"
+FAKE_CHANNEL_USER_ID = "1000"
+FAKE_CHAT_USER_ID = "1001"
+FAKE_CLIENT_ID = "loadgen-client"
+FAKE_YOUTUBE_CHANNEL_ID = "UCloadgen"
+FAKE_INNERTUBE_API_KEY = "loadgen-key"
+KEEPALIVE_SECONDS = 10
+NOISE_MESSAGES = ("lol", "gg", "pog", "what is happening", "LUL", "no way", "hi chat")
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+DEFAULT_COMMANDS = {"up": 5, "down": 3, "left": 3, "right": 3, "jump": 2, "stop": 1}
+SOURCES = ("twitch", "youtube")
+# what scrape_connect matched whole pages with before youtube_page
+REGEX_INITIAL_DATA = re.compile(
+    r"(?:window\s*\[\s*[\"']ytInitialData[\"']\s*\]|ytInitialData)\s*=\s*({.+?})\s*;"
+)
+REGEX_CONFIG = re.compile(r"(?:ytcfg\s*.set)\(({.+?})\)\s*;")
+
+
+def fake_channels(count: int) -> List[str]:
+    """FAKE_CHANNEL first, then loadgen2, loadgen3, ..."""
+    return [FAKE_CHANNEL] + [f"{FAKE_CHANNEL}{index}" for index in range(2, max(1, count) + 1)]
+
+
+def fake_channel_user_id(login: str) -> str:
+    """Stable broadcaster ID for a fake login, so cached IDs stay valid across runs."""
+    if login == FAKE_CHANNEL:
+        return FAKE_CHANNEL_USER_ID
+    return str(2000 + zlib.crc32(login.encode("utf-8")) % 1_000_000)
+
+
+@dataclass(frozen=True)
+class ChatEvent:
+    at: float  # seconds from the start of the script
+    source: str
+    username: str
+    message: str
+
+
+##########################################################
+# Chat scripts
+##########################################################
+
+
+def scripted_events(
+    commands: Dict[str, float],
+    *,
+    rate: float,
+    seconds: float,
+    users: int = 1000,
+    sources: Sequence[str] = SOURCES,
+    noise: float = 0.1,
+    typos: float = 0.0,
+    burst_every: float = 0.0,
+    burst_seconds: float = 0.0,
+    burst_factor: float = 1.0,
+    seed: Optional[int] = None,
+) -> Iterator[ChatEvent]:
+    """Generate chat at `rate` messages/sec, multiplied by `burst_factor` for
+    the first `burst_seconds` of every `burst_every` seconds."""
+    if not commands:
+        raise ValueError("At least one command is required.")
+    if rate <= 0:
+        raise ValueError("rate must be positive.")
+    rng = random.Random(seed)
+    names = list(commands)
+    cumulative = list(itertools.accumulate(float(commands[name]) for name in names))
+    usernames = [f"viewer{index}" for index in range(max(1, users))]
+    at = 0.0
+    while at < seconds:
+        bursting = burst_every > 0 and (at % burst_every) < burst_seconds
+        at += 1.0 / (rate * burst_factor if bursting else rate)
+        if rng.random() < noise:
+            message = rng.choice(NOISE_MESSAGES)
+        else:
+            message = rng.choices(names, cum_weights=cumulative)[0]
+            if rng.random() < typos:
+                message = misspell(message, rng)
+        yield ChatEvent(at, rng.choice(sources), rng.choice(usernames), message)
+
+
+def misspell(command: str, rng: random.Random) -> str:
+    """The kind of sloppy vote chat really sends: shouted, repeated, punctuated or swapped."""
+    style = rng.randrange(4)
+    if style == 0:
+        return command.upper()
+    if style == 1:
+        return f"{command} {command}"
+    if style == 2 or len(command) < 4:
+        return command + "!"
+    i = rng.randrange(len(command) - 1)
+    return command[:i] + command[i + 1] + command[i] + command[i + 2 :]
+
+
+def profile_commands(game: str, zipf: float = 1.0) -> Dict[str, float]:
+    """Chat phrases for a profile, weighted by rank ** -zipf (0 is uniform)."""
+    path = Path(__file__).parent / "profiles" / f"{game}.json"
+    with open(path, "r", encoding="utf-8") as f:
+        prof = json.load(f)
+    phrases = list(dict.fromkeys([*(prof.get("aliases") or {}), *(prof.get("macros") or {})]))
+    if not phrases:
+        raise ValueError(f"Profile {path.name} has no commands.")
+    return {phrase: (rank + 1) ** -zipf for rank, phrase in enumerate(phrases)}
+
+
+def parse_command_weights(raw_value: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in raw_value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition("=")
+        weights[name.strip().lower()] = float(weight) if weight else 1.0
+    return weights
+
+
+def replay_events(path: Path, speed: float = 1.0) -> Iterator[ChatEvent]:
+    """Read a recording made by ChatRecorder; `speed` > 1 plays it faster."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            yield ChatEvent(
+                float(row["t"]) / speed,
+                str(row.get("source") or "twitch"),
+                str(row["username"]),
+                str(row["message"]),
+            )
+
+
+class ChatRecorder:
+    """Append chat messages to a JSONL file with offsets from the first one."""
+
+    def __init__(self, path: Path) -> None:
+        self.file = open(path, "a", encoding="utf-8")
+        self.started_at: Optional[float] = None
+        self.count = 0
+
+    def record(self, source: str, messages: Iterable[TwitchPlays_Connection.ChatMessage]) -> None:
+        now = time.time()
+        if self.started_at is None:
+            self.started_at = now
+        for m in messages:
+            row = {
+                "t": round(now - self.started_at, 3),
+                "source": source,
+                "username": m.username,
+                "message": m.message,
+            }
+            self.file.write(json.dumps(row) + "\n")
+            self.count += 1
+        self.file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+##########################################################
+# Fake Twitch EventSub websocket
+##########################################################
+
+
+def encode_ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    # Server frames are never masked
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def recv_exact(sock: socket.socket, count: int) -> bytes:
+    data = b""
+    while len(data) < count:
+        chunk = sock.recv(count - len(data))
+        if not chunk:
+            raise ConnectionError("websocket peer closed")
+        data += chunk
+    return data
+
+
+def read_ws_frame(sock: socket.socket) -> Tuple[int, bytes]:
+    first, second = recv_exact(sock, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", recv_exact(sock, 2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", recv_exact(sock, 8))[0]
+    mask = recv_exact(sock, 4) if second & 0x80 else b""
+    payload = recv_exact(sock, length)
+    if mask:
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def notification_frame(message_id: str, event: ChatEvent, channel: str = FAKE_CHANNEL) -> bytes:
+    """A channel.chat.message notification as Twitch sends it (compact JSON)."""
+    # Spliced from a fixed template; json.dumps per message would make the
+    # generator, not the client, the bottleneck at high rates.
+    return "".join(
+        (
+            '{"metadata":{"message_id":"',
+            message_id,
+            '","message_type":"notification","message_timestamp":"',
+            time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            '","subscription_type":"',
+            TwitchPlays_Connection.EVENTSUB_CHAT_MESSAGE_TYPE,
+            '","subscription_version":"1"},"payload":{"subscription":{"type":"',
+            TwitchPlays_Connection.EVENTSUB_CHAT_MESSAGE_TYPE,
+            '","status":"enabled"},"event":{"broadcaster_user_id":"',
+            fake_channel_user_id(channel),
+            '","broadcaster_user_login":"',
+            channel,
+            '","chatter_user_login":',
+            encode_json_string(event.username),
+            ',"chatter_user_name":',
+            encode_json_string(event.username),
+            ',"message_id":"',
+            message_id,
+            '","message":{"text":',
+            encode_json_string(event.message),
+            "}}}}",
+        )
+    ).encode("utf-8")
+
+
+def keepalive_frame() -> bytes:
+    return json.dumps(
+        {
+            "metadata": {
+                "message_id": uuid.uuid4().hex,
+                "message_type": "session_keepalive",
+                "message_timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "payload": {},
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class EventSubConnection:
+    def __init__(self, sock: socket.socket, session_id: str) -> None:
+        self.sock = sock
+        self.session_id = session_id
+        self.send_lock = threading.Lock()
+        self.last_sent = time.time()
+        self.closed = False
+
+    def send_json(self, message: Dict[str, Any]) -> None:
+        self.send_raw(encode_ws_frame(json.dumps(message, separators=(",", ":")).encode("utf-8")))
+
+    def send_raw(self, frame: bytes) -> None:
+        with self.send_lock:
+            if self.closed:
+                return
+            try:
+                self.sock.sendall(frame)
+            except OSError:
+                self.closed = True
+                return
+            self.last_sent = time.time()
+
+    def close(self, graceful: bool = True) -> None:
+        with self.send_lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                if graceful:
+                    self.sock.sendall(encode_ws_frame(b"\x03\xe8", opcode=0x8))
+                else:
+                    # no close frame, like a dropped network; shutdown also
+                    # wakes the thread blocked reading this socket
+                    self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class FakeEventSubServer:
+    """EventSub websocket endpoint on 127.0.0.1.
+
+    Sessions only receive notifications once a chat subscription is created
+    for their session id (see FakeChatHttpServer), and only for the channels
+    they subscribed to; published chat is spread round-robin over
+    `channels`. A session that
+    reconnects through `request_reconnect()` keeps its subscription.
+    `drop_connections()` resets subscribed connections instead, so the
+    client has to subscribe again and misses what is sent meanwhile.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, channels: int = 1) -> None:
+        self.listener = socket.create_server((host, port))
+        self.host, self.port = self.listener.getsockname()[:2]
+        self.lock = threading.Lock()
+        self.connections: Dict[str, EventSubConnection] = {}
+        # session id -> broadcaster user IDs it subscribed to
+        self.subscribed: Dict[str, set[str]] = {}
+        self.channels = [(login, fake_channel_user_id(login)) for login in fake_channels(channels)]
+        self.channel_ids = {user_id for _login, user_id in self.channels}
+        self.stop_event = threading.Event()
+        self.sent = 0
+        self.reconnects = 0
+        self.drops = 0
+        self.threads: List[threading.Thread] = []
+        self.id_prefix = uuid.uuid4().hex[:16]
+        self.message_serial = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/ws"
+
+    def start(self) -> None:
+        for target, name in (
+            (self.accept_loop, "loadgen-eventsub-accept"),
+            (self.keepalive_loop, "loadgen-eventsub-keepalive"),
+        ):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def close(self) -> None:
+        self.stop_event.set()
+        try:
+            self.listener.close()
+        except OSError:
+            pass
+        with self.lock:
+            connections = list(self.connections.values())
+            self.connections.clear()
+        for conn in connections:
+            conn.close()
+
+    def subscribe(self, session_id: str, broadcaster_user_id: str) -> bool:
+        with self.lock:
+            if session_id not in self.connections:
+                return False
+            self.subscribed.setdefault(session_id, set()).add(broadcaster_user_id)
+            return True
+
+    def publish(self, events: Sequence[ChatEvent]) -> None:
+        with self.lock:
+            targets = [
+                (self.connections[s], channel_ids)
+                for s, channel_ids in self.subscribed.items()
+                if s in self.connections
+            ]
+        # chat goes on while nobody is subscribed; that counts as missing
+        self.sent += len(events)
+        if not targets:
+            return
+        frames: Dict[str, List[bytes]] = {}
+        for event in events:
+            channel, user_id = self.channels[self.message_serial % len(self.channels)]
+            frames.setdefault(user_id, []).append(encode_ws_frame(self.notification(event, channel)))
+        for conn, channel_ids in targets:
+            data = b"".join(b"".join(frames.get(user_id, ())) for user_id in channel_ids)
+            if data:
+                conn.send_raw(data)
+
+    def notification(self, event: ChatEvent, channel: str = FAKE_CHANNEL) -> bytes:
+        self.message_serial += 1
+        return notification_frame(f"{self.id_prefix}{self.message_serial:x}", event, channel)
+
+    def request_reconnect(self) -> None:
+        """Ask every subscribed session to move to a new connection."""
+        with self.lock:
+            targets = [self.connections[s] for s in self.subscribed if s in self.connections]
+        for conn in targets:
+            conn.send_json(
+                self.session_message(
+                    "session_reconnect",
+                    conn.session_id,
+                    reconnect_url=f"{self.url}?reconnect={conn.session_id}",
+                )
+            )
+        self.reconnects += len(targets)
+
+    def drop_connections(self) -> None:
+        with self.lock:
+            targets = [self.connections.pop(s) for s in self.subscribed if s in self.connections]
+            self.subscribed.clear()
+        for conn in targets:
+            conn.close(graceful=False)
+        self.drops += len(targets)
+
+    def session_message(self, message_type: str, session_id: str, **session: Any) -> Dict[str, Any]:
+        return {
+            "metadata": {
+                "message_id": uuid.uuid4().hex,
+                "message_type": message_type,
+                "message_timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            },
+            "payload": {
+                "session": {
+                    "id": session_id,
+                    "status": "connected" if message_type == "session_welcome" else "reconnecting",
+                    "keepalive_timeout_seconds": KEEPALIVE_SECONDS,
+                    **session,
+                }
+            },
+        }
+
+    def accept_loop(self) -> None:
+        while not self.stop_event.is_set():
+            try:
+                sock, _addr = self.listener.accept()
+            except OSError:
+                return
+            threading.Thread(
+                target=self.serve_connection,
+                name="loadgen-eventsub-conn",
+                args=(sock,),
+                daemon=True,
+            ).start()
+
+    def serve_connection(self, sock: socket.socket) -> None:
+        try:
+            path = self.handshake(sock)
+        except (OSError, ConnectionError, ValueError):
+            sock.close()
+            return
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        session_id = uuid.uuid4().hex
+        conn = EventSubConnection(sock, session_id)
+        previous_id = (parse_qs(urlparse(path).query).get("reconnect") or [""])[0]
+        with self.lock:
+            self.connections[session_id] = conn
+        conn.send_json(self.session_message("session_welcome", session_id))
+
+        if previous_id:
+            # Subscriptions follow the session to the new connection, then the
+            # old connection is closed, as on the real service.
+            with self.lock:
+                if previous_id in self.subscribed:
+                    self.subscribed[session_id] = self.subscribed.pop(previous_id)
+                old = self.connections.pop(previous_id, None)
+            if old is not None:
+                old.close()
+
+        try:
+            while not self.stop_event.is_set() and not conn.closed:
+                opcode, payload = read_ws_frame(sock)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    conn.send_raw(encode_ws_frame(payload, opcode=0xA))
+        except (OSError, ConnectionError):
+            pass
+        finally:
+            with self.lock:
+                if self.connections.get(session_id) is conn:
+                    del self.connections[session_id]
+                self.subscribed.pop(session_id, None)
+            conn.close()
+
+    def handshake(self, sock: socket.socket) -> str:
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("websocket client closed during handshake")
+            request += chunk
+        lines = request.split(b"\r\n\r\n", 1)[0].decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise ValueError("missing Sec-WebSocket-Key")
+        accept = base64.b64encode(
+            hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+        ).decode("ascii")
+        sock.sendall(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode("ascii")
+        )
+        return path
+
+    def keepalive_loop(self) -> None:
+        while not self.stop_event.wait(1.0):
+            cutoff = time.time() - KEEPALIVE_SECONDS / 2
+            with self.lock:
+                idle = [c for c in self.connections.values() if c.last_sent < cutoff]
+            for conn in idle:
+                conn.send_raw(encode_ws_frame(keepalive_frame()))
+
+
+##########################################################
+# Fake Twitch REST + YouTube scrape endpoints
+##########################################################
+
+
+class FakeYouTubeChat:
+    """Pending messages for the fake get_live_chat endpoint."""
+
+    def __init__(self, poll_timeout_ms: int = 1000) -> None:
+        self.lock = threading.Lock()
+        self.pending: List[ChatEvent] = []
+        self.poll_timeout_ms = poll_timeout_ms
+        self.polls = 0
+        self.sent = 0
+        self.continuation = 0
+
+    def publish(self, events: Sequence[ChatEvent]) -> None:
+        with self.lock:
+            self.pending.extend(events)
+
+    def take(self) -> List[ChatEvent]:
+        with self.lock:
+            taken = self.pending
+            self.pending = []
+            self.polls += 1
+            self.sent += len(taken)
+            self.continuation += 1
+        return taken
+
+    def continuation_data(self) -> Dict[str, Any]:
+        return {
+            "continuations": [
+                {
+                    "timedContinuationData": {
+                        "continuation": f"loadgen-{self.continuation}",
+                        "timeoutMs": self.poll_timeout_ms,
+                    }
+                }
+            ]
+        }
+
+    def watch_initial_data(self) -> Dict[str, Any]:
+        sub_menu_item = {
+            "continuation": {"reloadContinuationData": {"continuation": "loadgen-chat"}}
+        }
+        return {
+            "contents": {
+                "twoColumnWatchNextResults": {
+                    "conversationBar": {
+                        "liveChatRenderer": {
+                            "header": {
+                                "liveChatHeaderRenderer": {
+                                    "viewSelector": {
+                                        "sortFilterSubMenuRenderer": {
+                                            "subMenuItems": [sub_menu_item, sub_menu_item]
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+    def live_chat_initial_data(self) -> Dict[str, Any]:
+        return {"continuationContents": {"liveChatContinuation": self.continuation_data()}}
+
+    def innertube_config(self) -> Dict[str, Any]:
+        return {
+            "INNERTUBE_API_KEY": FAKE_INNERTUBE_API_KEY,
+            "INNERTUBE_CONTEXT": {"client": {"clientName": "WEB", "clientVersion": "2.0"}},
+        }
+
+    def live_page(self) -> str:
+        return f"<html><script>var ytInitialData = {json.dumps(self.watch_initial_data())};</script></html>"
+
+    def live_chat_page(self) -> str:
+        return (
+            f"<html><script>window[\"ytInitialData\"] = {json.dumps(self.live_chat_initial_data())};</script>"
+            f"<script>ytcfg.set({json.dumps(self.innertube_config())});</script></html>"
+        )
+
+    def get_live_chat(self) -> Dict[str, Any]:
+        events = self.take()
+        actions = [
+            {
+                "addChatItemAction": {
+                    "item": {
+                        "liveChatTextMessageRenderer": {
+                            "authorName": {"simpleText": event.username},
+                            "message": {"runs": [{"text": event.message}]},
+                        }
+                    }
+                }
+            }
+            for event in events
+        ]
+        continuation = self.continuation_data()
+        if actions:
+            continuation["actions"] = actions
+        return {"continuationContents": {"liveChatContinuation": continuation}}
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes; without this, keep-alive
+    # requests stall on delayed ACKs
+    disable_nagle_algorithm = True
+    server: "FakeChatHttpServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def setup(self) -> None:
+        # one handler per TCP connection; keep-alive requests reuse it
+        self.server.connections += 1
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+        super().setup()
+
+    def do_GET(self) -> None:
+        self.server.requests += 1
+        url = urlparse(self.path)
+        if url.path == "/oauth2/validate":
+            self.send_json(
+                {
+                    "client_id": FAKE_CLIENT_ID,
+                    "login": "loadgen_bot",
+                    "user_id": FAKE_CHAT_USER_ID,
+                    "scopes": [TwitchPlays_Connection.TWITCH_READ_CHAT_SCOPE],
+                    "expires_in": 4 * 3600,
+                }
+            )
+        elif url.path == "/helix/users":
+            logins = parse_qs(url.query).get("login") or [FAKE_CHANNEL]
+            self.send_json(
+                {
+                    "data": [
+                        {"id": fake_channel_user_id(login), "login": login}
+                        for login in logins
+                    ]
+                }
+            )
+        elif url.path.endswith("/live") and url.path.startswith(("/channel/", "/c/")):
+            self.send_text(self.server.youtube.live_page())
+        elif url.path == "/live_chat":
+            self.send_text(self.server.youtube.live_chat_page())
+        else:
+            self.send_json({"message": f"not found: {url.path}"}, status=404)
+
+    def do_POST(self) -> None:
+        self.server.requests += 1
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if url.path == "/oauth2/token":
+            self.send_json(
+                {"access_token": "loadgen-access", "refresh_token": "loadgen-refresh", "expires_in": 4 * 3600}
+            )
+        elif url.path == "/helix/eventsub/subscriptions":
+            request = json.loads(body or b"{}")
+            session_id = (request.get("transport") or {}).get("session_id", "")
+            condition = request.get("condition") or {}
+            broadcaster_user_id = condition.get("broadcaster_user_id")
+            if broadcaster_user_id not in self.server.eventsub.channel_ids:
+                self.send_json({"message": "invalid broadcaster_user_id in condition"}, status=400)
+            elif self.server.eventsub.subscribe(session_id, broadcaster_user_id):
+                self.send_json({"data": [{"id": uuid.uuid4().hex, "status": "enabled"}]}, status=202)
+            else:
+                self.send_json({"message": "websocket transport session does not exist"}, status=400)
+        elif url.path == "/youtubei/v1/live_chat/get_live_chat":
+            self.send_json(self.server.youtube.get_live_chat())
+        else:
+            self.send_json({"message": f"not found: {url.path}"}, status=404)
+
+    def send_json(self, data: Dict[str, Any], status: int = 200) -> None:
+        self.send_body(json.dumps(data).encode("utf-8"), "application/json", status)
+
+    def send_text(self, text: str) -> None:
+        self.send_body(text.encode("utf-8"), "text/html; charset=utf-8", 200)
+
+    def send_body(self, body: bytes, content_type: str, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeChatHttpServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        eventsub: FakeEventSubServer,
+        youtube: FakeYouTubeChat,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        connect_delay: float = 0.0,
+    ) -> None:
+        super().__init__((host, port), FakeChatHandler)
+        self.eventsub = eventsub
+        self.youtube = youtube
+        # stands in for the TCP+TLS handshake a real Twitch endpoint costs
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.requests = 0
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="loadgen-http", daemon=True
+        )
+        self.thread.start()
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+##########################################################
+# Harness
+##########################################################
+
+
+class FakeChatServers:
+    """Both fake services plus a player thread that publishes a chat script."""
+
+    def __init__(
+        self, youtube_poll_ms: int = 1000, connect_delay: float = 0.0, channels: int = 1
+    ) -> None:
+        self.eventsub = FakeEventSubServer(channels=channels)
+        self.youtube = FakeYouTubeChat(poll_timeout_ms=youtube_poll_ms)
+        self.http = FakeChatHttpServer(self.eventsub, self.youtube, connect_delay=connect_delay)
+        self.player: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+
+    def start(self) -> None:
+        self.eventsub.start()
+        self.http.start()
+
+    def close(self) -> None:
+        self.stop_event.set()
+        self.http.close()
+        self.eventsub.close()
+
+    def play(
+        self, events: Iterable[ChatEvent], reconnect_every: float = 0.0, drop_every: float = 0.0
+    ) -> None:
+        self.player = threading.Thread(
+            target=self.play_loop,
+            name="loadgen-player",
+            args=(events, reconnect_every, drop_every),
+            daemon=True,
+        )
+        self.player.start()
+
+    def play_loop(
+        self, events: Iterable[ChatEvent], reconnect_every: float, drop_every: float
+    ) -> None:
+        # Publish everything that is due in one go, so high rates are not
+        # limited by per-message sleeps.
+        started = time.perf_counter()
+        next_reconnect = reconnect_every if reconnect_every > 0 else None
+        next_drop = drop_every if drop_every > 0 else None
+        due: Dict[str, List[ChatEvent]] = {"twitch": [], "youtube": []}
+        for event in events:
+            if self.stop_event.is_set():
+                break
+            elapsed = time.perf_counter() - started
+            if event.at > elapsed:
+                self.flush(due)
+                if next_reconnect is not None and elapsed >= next_reconnect:
+                    self.eventsub.request_reconnect()
+                    next_reconnect += reconnect_every
+                if next_drop is not None and elapsed >= next_drop:
+                    self.eventsub.drop_connections()
+                    next_drop += drop_every
+                wait = event.at - (time.perf_counter() - started)
+                if wait > 0 and self.stop_event.wait(wait):
+                    break
+            due.setdefault(event.source, []).append(event)
+        self.flush(due)
+        self.finished.set()
+
+    def flush(self, due: Dict[str, List[ChatEvent]]) -> None:
+        if due.get("twitch"):
+            self.eventsub.publish(due["twitch"])
+            due["twitch"] = []
+        if due.get("youtube"):
+            self.youtube.publish(due["youtube"])
+            due["youtube"] = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "twitch_sent": self.eventsub.sent,
+            "youtube_sent": self.youtube.sent,
+            "reconnects": self.eventsub.reconnects,
+            "drops": self.eventsub.drops,
+            "youtube_polls": self.youtube.polls,
+            "http_connections": self.http.connections,
+            "http_requests": self.http.requests,
+        }
+
+
+def serve_fake_chat(args: argparse.Namespace, pipe: Any) -> None:
+    """Child process entry point for FakeChatProcess."""
+    servers = FakeChatServers(
+        youtube_poll_ms=args.youtube_poll_ms,
+        connect_delay=args.connect_delay_ms / 1000.0,
+        channels=args.channels,
+    )
+    servers.start()
+    pipe.send((servers.http.url, servers.eventsub.url))
+    reported = False
+    try:
+        while True:
+            if pipe.poll(0.05):
+                command = pipe.recv()
+                if command == "play":
+                    servers.play(
+                        build_events(args),
+                        reconnect_every=args.reconnect_every,
+                        drop_every=args.drop_every,
+                    )
+                elif command == "stats":
+                    pipe.send(("stats", servers.stats()))
+                else:
+                    break
+            if servers.finished.is_set() and not reported:
+                pipe.send(("finished", servers.stats()))
+                reported = True
+    except (EOFError, OSError, KeyboardInterrupt):
+        # Ctrl+C reaches the whole process group; the parent cleans up
+        pass
+    finally:
+        servers.close()
+
+
+class FakeChatProcess:
+    """Runs FakeChatServers in a child process.
+
+    Generating and encoding chat competes with the client for the GIL, so the
+    servers live in their own interpreter when measuring the client.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        context = multiprocessing.get_context("spawn")
+        self.pipe, child_pipe = context.Pipe()
+        self.process = context.Process(
+            target=serve_fake_chat, name="loadgen-servers", args=(args, child_pipe), daemon=True
+        )
+        self.http_url = ""
+        self.ws_url = ""
+        self.finished = threading.Event()
+        self.final_stats: Dict[str, int] = {}
+
+    def start(self) -> None:
+        self.process.start()
+        self.http_url, self.ws_url = self.pipe.recv()
+
+    def play(self) -> None:
+        self.pipe.send("play")
+
+    def poll(self, timeout: float = 0.0) -> None:
+        while self.pipe.poll(timeout):
+            kind, stats = self.pipe.recv()
+            self.final_stats = stats
+            if kind == "finished":
+                self.finished.set()
+            timeout = 0.0
+
+    def stats(self) -> Dict[str, int]:
+        self.pipe.send("stats")
+        while True:
+            kind, stats = self.pipe.recv()
+            self.final_stats = stats
+            if kind == "finished":
+                self.finished.set()
+                continue
+            return stats
+
+    def close(self) -> None:
+        try:
+            self.pipe.send("stop")
+        except OSError:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def redirect_connection(http_url: str, ws_url: str, config_dir: Path, channels: int = 1) -> Path:
+    """Point TwitchPlays_Connection at the fake servers and a throwaway config.
+
+    Returns the config path, which is also exported through TWITCHPLAYS_CONFIG
+    so runners imported afterwards read it.
+    """
+    module = TwitchPlays_Connection
+    module.EVENTSUB_WEBSOCKET_URL = ws_url
+    module.TWITCH_HELIX_SUBSCRIPTIONS_URL = f"{http_url}/helix/eventsub/subscriptions"
+    module.TWITCH_HELIX_USERS_URL = f"{http_url}/helix/users"
+    module.TWITCH_OAUTH_TOKEN_URL = f"{http_url}/oauth2/token"
+    module.TWITCH_OAUTH_VALIDATE_URL = f"{http_url}/oauth2/validate"
+    module.YOUTUBE_DATA_API_URL = f"{http_url}/youtube/v3"
+    module.YOUTUBE_INNERTUBE_URL = f"{http_url}/youtubei/v1"
+    module.YOUTUBE_PAGE_URL = http_url
+
+    path = config_dir / module.TWITCH_CONFIG_FILE_NAME
+    path.write_text(
+        json.dumps(
+            {
+                "twitch_channel": ",".join(fake_channels(channels)),
+                "client_id": FAKE_CLIENT_ID,
+                "access_token": "loadgen-access",
+                "refresh_token": "loadgen-refresh",
+                "youtube_channel_id": FAKE_YOUTUBE_CHANNEL_ID,
+                "youtube_api_key": "",
+                "youtube_stream_url": "",
+            },
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+    os.environ[module.TWITCH_CONFIG_ENV_VAR] = str(path)
+    return path
+
+
+def script_commands(args: argparse.Namespace) -> Dict[str, float]:
+    if args.commands:
+        return parse_command_weights(args.commands)
+    if args.game:
+        return profile_commands(args.game, args.zipf)
+    return dict(DEFAULT_COMMANDS)
+
+
+def build_events(args: argparse.Namespace) -> Iterator[ChatEvent]:
+    sources = [source for source in args.sources.split(",") if source]
+    if args.replay:
+        events: Iterator[ChatEvent] = replay_events(Path(args.replay), args.speed)
+        return (e for e in events if e.source in sources)
+    return scripted_events(
+        script_commands(args),
+        rate=args.rate,
+        seconds=args.seconds,
+        users=args.users,
+        sources=sources,
+        noise=args.noise,
+        typos=args.typos,
+        burst_every=args.burst_every,
+        burst_seconds=args.burst_seconds,
+        burst_factor=args.burst_factor,
+        seed=args.seed,
+    )
+
+
+def run_bench(args: argparse.Namespace, servers: FakeChatProcess) -> None:
+    """Drive the real connection classes and MultiChat.receive_messages the
+    way the vote loop does, and report delivered throughput."""
+    from TwitchPlays_Everything import MultiChat
+
+    sources = [source for source in args.sources.split(",") if source]
+    hub = IngestHub()
+    matcher = CommandMatcher(script_commands(args), args.match_tolerance) if args.match else None
+    transports = TwitchPlays_AsyncConnection if args.transport == "asyncio" else TwitchPlays_Connection
+    t = y = None
+    if "twitch" in sources:
+        t = transports.Twitch(signal=hub.source_signal("twitch"), matcher=matcher)
+        t.twitch_connect(fake_channels(args.channels))
+    if "youtube" in sources:
+        y = transports.YouTube(signal=hub.source_signal("youtube"), matcher=matcher)
+        y.youtube_connect(FAKE_YOUTUBE_CHANNEL_ID)
+    chat = MultiChat(t, y, hub)
+
+    received = 0
+    per_second: List[int] = []
+    # source -> received->drained seconds
+    waits: Dict[str, List[float]] = {}
+    per_channel: Dict[str, int] = {}
+    started = time.time()
+    bucket_end = started + 1.0
+    last_message_at = started
+    servers.play()
+    try:
+        while True:
+            now = time.time()
+            batch = chat.receive_messages()
+            if batch:
+                received += len(batch)
+                last_message_at = now
+                for m in batch:
+                    if m.channel is not None:
+                        per_channel[m.channel] = per_channel.get(m.channel, 0) + 1
+                    if m.received_at is not None:
+                        waits.setdefault(m.source, []).append(m.drained_at - m.received_at)
+            if now >= bucket_end:
+                per_second.append(received - sum(per_second))
+                bucket_end += 1.0
+            servers.poll()
+            # stop once the script is done and nothing arrived for a while
+            if servers.finished.is_set() and now - last_message_at > args.drain_seconds:
+                break
+            chat.wait_for_messages(min(bucket_end, now + 0.05))
+    finally:
+        twitch_reconnects = t.reconnect_stats() if t is not None else {}
+        youtube_polls = y.poll_stats() if y is not None else {}
+        chat.close()
+
+    stats = servers.stats()
+    elapsed = max(1e-9, last_message_at - started)
+    sent = stats["twitch_sent"] + stats["youtube_sent"]
+    rejected = chat.rejected_messages()
+    print(f"sent       {sent} messages")
+    print(f"received   {received} messages ({received / elapsed:,.0f}/s over {elapsed:.1f}s)")
+    if matcher is not None:
+        print(f"rejected   {rejected} non-command messages on transport threads")
+        print(f"recovered  {matcher.recovered_total} misspelled votes {matcher.recovered}")
+    print(f"missing    {max(0, sent - received - rejected)}")
+    if per_second:
+        print(f"per second min {min(per_second)} / max {max(per_second)}")
+    if stats["reconnects"] or stats["drops"]:
+        print(f"reconnects {stats['reconnects']} requested, {stats['drops']} dropped")
+    if twitch_reconnects and (stats["reconnects"] or stats["drops"]):
+        print(f"twitch     {twitch_reconnects}")
+    if len(per_channel) > 1:
+        print(f"channels   {dict(sorted(per_channel.items()))}")
+    if stats["youtube_polls"]:
+        print(f"youtube    {stats['youtube_polls']} polls")
+    if youtube_polls.get("polls"):
+        request = youtube_polls["request"]
+        interval = youtube_polls["poll_interval"]
+        print(
+            f"youtube    {youtube_polls['messages_per_poll']} messages/poll (max {youtube_polls['max_messages_per_poll']}), "
+            f"interval p50 {interval['p50_ms']:.0f} ms (now {youtube_polls['interval_s'] * 1000:.0f} ms), "
+            f"request p50 {request['p50_ms']:.2f} ms  p99 {request['p99_ms']:.2f} ms, {youtube_polls['errors']} errors"
+        )
+    for source, samples in sorted(waits.items()):
+        samples.sort()
+        print(
+            f"{source:<10} received->drained p50 {samples[len(samples) // 2] * 1000:.2f} ms  "
+            f"p99 {samples[int(len(samples) * 0.99)] * 1000:.2f} ms  max {samples[-1] * 1000:.2f} ms"
+        )
+    dropped = {name: counts["dropped"] for name, counts in hub.stats().items() if counts["dropped"]}
+    if dropped:
+        print(f"hub full, dropped {dropped}")
+
+
+def run_rest(args: argparse.Namespace, servers: FakeChatProcess) -> None:
+    """Time the Twitch REST calls a reconnect makes (validate, user lookup,
+    subscription) against the fake Helix server."""
+    twitch = TwitchPlays_Connection.Twitch()
+    tokens = TwitchPlays_Connection.TwitchTokenManager(twitch, twitch.load_auth())
+    if args.no_pool:
+        # what every call did before the shared session: a fresh connection each
+        TwitchPlays_Connection.twitch_http = lambda: requests
+
+    def reconnect_calls() -> None:
+        twitch.resolve_twitch_ids(
+            tokens, fake_channels(args.channels), use_cache=not args.no_cache
+        )
+        twitch.request_helix(
+            tokens,
+            "POST",
+            TwitchPlays_Connection.TWITCH_HELIX_SUBSCRIPTIONS_URL,
+            json_body={"type": TwitchPlays_Connection.EVENTSUB_CHAT_MESSAGE_TYPE},
+        )
+
+    reconnect_calls()  # warm up, as the initial connect would
+    before = servers.stats()
+    timings = []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        reconnect_calls()
+        timings.append(time.perf_counter() - started)
+    after = servers.stats()
+    connections = after["http_connections"] - before["http_connections"]
+    calls = after["http_requests"] - before["http_requests"]
+
+    timings.sort()
+    mode = "fresh connection per call" if args.no_pool else "shared keep-alive session"
+    ids = "IDs looked up every time" if args.no_cache else "cached IDs"
+    print(f"{mode}, {ids}: {args.rounds} reconnects")
+    print(
+        f"per reconnect  p50 {timings[len(timings) // 2] * 1000:.2f} ms  "
+        f"p95 {timings[int(len(timings) * 0.95)] * 1000:.2f} ms  max {timings[-1] * 1000:.2f} ms"
+    )
+    print(f"REST calls {calls} ({calls / args.rounds:.1f} per reconnect)")
+    print(f"new HTTP connections {connections} ({connections / args.rounds:.1f} per reconnect)")
+
+
+def decode_frames(args: argparse.Namespace) -> List[str]:
+    if args.frames:
+        text = Path(args.frames).read_text(encoding="utf-8")
+        return [line for line in text.splitlines() if line.strip()]
+    prefix = uuid.uuid4().hex[:16]
+    keepalive = keepalive_frame().decode("utf-8")
+    frames = []
+    for serial, event in enumerate(build_events(args)):
+        frames.append(notification_frame(f"{prefix}{serial:x}", event).decode("utf-8"))
+        if args.keepalive_every and serial % args.keepalive_every == 0:
+            frames.append(keepalive)
+    return frames
+
+
+def run_decode(args: argparse.Namespace) -> None:
+    """Per-frame cost of decoding EventSub frames: a full json.loads of every
+    frame (the old path) against decode_eventsub_frame() with each decoder."""
+    module = TwitchPlays_Connection
+    twitch = module.Twitch()
+    frames = decode_frames(args)
+    if not frames:
+        raise SystemExit("No frames to decode.")
+
+    def full_parse(raw: str) -> Any:
+        message = twitch.parse_eventsub_message(raw)
+        message_type = twitch.message_type(message)
+        return message_type, twitch.chat_fields(message) if message_type == "notification" else None
+
+    module.EVENTSUB_JSON_DECODER = "json"
+    expected = [full_parse(raw) for raw in frames]
+    keepalives = [raw for raw, (kind, _) in zip(frames, expected) if kind == "session_keepalive"]
+    notifications = [raw for raw, (kind, _) in zip(frames, expected) if kind == "notification"]
+    print(f"{len(frames)} frames: {len(notifications)} notifications, {len(keepalives)} keepalives")
+
+    def cost(decode: Any, batch: List[str]) -> float:
+        if not batch:
+            return 0.0
+        best = float("inf")
+        # as timeit does: collections triggered by the decoded dicts would
+        # otherwise walk every frame and result held here
+        gc.disable()
+        try:
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                for raw in batch:
+                    decode(raw)
+                best = min(best, time.perf_counter() - started)
+        finally:
+            gc.enable()
+        return best / len(batch) * 1e9
+
+    rows = [("json full parse (before)", "json", full_parse)]
+    rows += [(f"{name} decode_eventsub_frame", name, twitch.decode_eventsub_frame) for name in module.EVENTSUB_JSON_DECODERS]
+    print(f"{'':<34} {'all':>9} {'notify':>9} {'keepalive':>9}  ns/frame")
+    for label, decoder, decode in rows:
+        module.EVENTSUB_JSON_DECODER = decoder
+        mismatched = sum(
+            1
+            for raw, (kind, fields) in zip(frames, expected)
+            if decode(raw)[0] != kind or (fields is not None and decode(raw)[1] != fields)
+        )
+        print(
+            f"{label:<34} {cost(decode, frames):9.0f} {cost(decode, notifications):9.0f} "
+            f"{cost(decode, keepalives):9.0f}" + (f"  {mismatched} frames decoded differently" if mismatched else "")
+        )
+
+
+class FixtureResponse:
+    """A saved page handed out in chunks, as requests streams a response body."""
+
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.closed = False
+
+    def iter_content(self, chunk_size: int) -> Iterator[bytes]:
+        for start in range(0, len(self.body), chunk_size):
+            if self.closed:
+                return
+            yield self.body[start : start + chunk_size]
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def filler_items(rng: random.Random, size: int) -> List[Dict[str, Any]]:
+    """Roughly `size` bytes of video renderers, the bulk of a real watch page."""
+    words = [*NOISE_MESSAGES, *DEFAULT_COMMANDS]
+    items = []
+    used = 0
+    while used < size:
+        item = {
+            "compactVideoRenderer": {
+                "videoId": f"{rng.getrandbits(44):011x}",
+                "title": {"simpleText": " ".join(rng.choices(words, k=6))},
+                "descriptionSnippet": {"runs": [{"text": " ".join(rng.choices(words, k=20))}]},
+                "viewCountText": {"simpleText": f"{rng.randrange(10**6):,} views"},
+            }
+        }
+        items.append(item)
+        used += len(json.dumps(item))
+    return items
+
+
+def fixture_pages(page_kb: int, seed: Optional[int] = None) -> Dict[str, bytes]:
+    """Synthetic watch and live_chat pages laid out like YouTube's.
+
+    The watch page has ytcfg and the player response before ytInitialData,
+    whose live chat renderer comes after the results columns, then more
+    scripts. The live_chat page has ytcfg, ytInitialData, then more scripts.
+    """
+    rng = random.Random(seed)
+    size = page_kb * 1024
+    youtube = FakeYouTubeChat()
+    config = {**youtube.innertube_config(), "SERIALIZED_EXPERIMENTS": filler_items(rng, size // 10)}
+
+    watch_data = youtube.watch_initial_data()
+    columns = watch_data["contents"]["twoColumnWatchNextResults"]
+    watch_data["contents"]["twoColumnWatchNextResults"] = {
+        "results": {"results": {"contents": filler_items(rng, size * 3 // 10)}},
+        "secondaryResults": {"secondaryResults": {"results": filler_items(rng, size // 5)}},
+        **columns,
+    }
+    watch = "".join(
+        (
+            "<!DOCTYPE html><html><head><script>ytcfg.set(",
+            json.dumps(config),
+            ");</script></head><body><script>var ytInitialPlayerResponse = ",
+            json.dumps({"streamingData": {"formats": filler_items(rng, size // 5)}}),
+            ";</script><script>var ytInitialData = ",
+            json.dumps(watch_data),
+            ";</script><script>var ytPageScripts = ",
+            json.dumps(filler_items(rng, size // 5)),
+            ";</script></body></html>",
+        )
+    )
+
+    chat_data = youtube.live_chat_initial_data()
+    chat_data["continuationContents"]["liveChatContinuation"]["actions"] = filler_items(rng, size // 4)
+    live_chat = "".join(
+        (
+            "<!DOCTYPE html><html><head><script>ytcfg.set(",
+            json.dumps(config),
+            ");</script></head><body><script>window[\"ytInitialData\"] = ",
+            json.dumps(chat_data),
+            ";</script><script>var ytPageScripts = ",
+            json.dumps(filler_items(rng, size // 2)),
+            ";</script></body></html>",
+        )
+    )
+    return {"watch": watch.encode("utf-8"), "live_chat": live_chat.encode("utf-8")}
+
+
+def regex_scrape(kind: str, page: bytes) -> Tuple[Any, int]:
+    """The old path: whole page as text, every regex match, json.loads of the blob."""
+    text = page.decode("utf-8", errors="replace")
+    initial_data = json.loads(list(REGEX_INITIAL_DATA.finditer(text))[0].group(1))
+    if kind == "watch":
+        renderer = initial_data["contents"]["twoColumnWatchNextResults"]["conversationBar"]
+        return youtube_page.iframe_continuation(renderer["liveChatRenderer"]), len(page)
+    config = json.loads(list(REGEX_CONFIG.finditer(text))[0].group(1))
+    continuation = initial_data["continuationContents"]["liveChatContinuation"]["continuations"][0]
+    return (continuation, config["INNERTUBE_API_KEY"]), len(page)
+
+
+def stream_scrape(kind: str, page: bytes, chunk_size: int) -> Tuple[Any, int]:
+    if kind == "watch":
+        scanner = youtube_page.PageScanner()
+        read = youtube_page.scan_response(FixtureResponse(page), scanner, chunk_size)
+        return youtube_page.chat_iframe_continuation(scanner.initial_data or ""), read
+    scanner = youtube_page.PageScanner(config_keys=TwitchPlays_Connection.YOUTUBE_CONFIG_KEYS)
+    read = youtube_page.scan_response(FixtureResponse(page), scanner, chunk_size)
+    continuation = youtube_page.chat_continuation(scanner.initial_data or "")
+    return (continuation, scanner.config.get("INNERTUBE_API_KEY")), read
+
+
+def run_scrape(args: argparse.Namespace) -> None:
+    """Time finding the scraper's JSON in saved (or synthetic) YouTube pages:
+    regexes over the whole page (before) against youtube_page's streaming scan."""
+    pages = fixture_pages(args.page_kb, args.seed)
+    for kind, path in (("watch", args.watch_page), ("live_chat", args.chat_page)):
+        if path:
+            pages[kind] = Path(path).read_bytes()
+    if args.save:
+        out = Path(args.save)
+        out.mkdir(parents=True, exist_ok=True)
+        for kind, page in pages.items():
+            (out / f"{kind}.html").write_bytes(page)
+        print(f"saved fixtures to {out}")
+
+    def best(scrape: Any) -> Tuple[float, Any, int]:
+        timings = []
+        result: Any = None
+        read = 0
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            try:
+                result, read = scrape()
+            except Exception as exc:
+                result, read = f"failed: {exc!r}", 0
+            timings.append(time.perf_counter() - started)
+        return min(timings) * 1000.0, result, read
+
+    chunk_size = int(args.chunk_kb * 1024)
+    print(f"{'page':<10} {'size':>10} {'before':>10} {'after':>10} {'read':>10}")
+    for kind, page in pages.items():
+        before_ms, before, _ = best(lambda: regex_scrape(kind, page))
+        after_ms, after, read = best(lambda: stream_scrape(kind, page, chunk_size))
+        note = "" if before == after else f"  results differ: {before!r} / {after!r}"
+        print(
+            f"{kind:<10} {len(page) / 1024:>8.0f}KB {before_ms:>8.2f}ms {after_ms:>8.2f}ms "
+            f"{read / 1024:>8.0f}KB{note}"
+        )
+
+
+def run_runner(args: argparse.Namespace, servers: FakeChatProcess, runner_args: List[str]) -> None:
+    """Run a Twitch Plays runner in this process against the fake servers."""
+    module_name = "TwitchPlays_Single" if args.runner == "single" else "TwitchPlays_Everything"
+    sys.argv = [f"{module_name}.py", *runner_args]
+    runner = importlib.import_module(module_name)
+    threading.Thread(
+        target=report_when_finished, name="loadgen-report", args=(servers,), daemon=True
+    ).start()
+    servers.play()
+    runner.main()
+
+
+def report_when_finished(servers: FakeChatProcess) -> None:
+    try:
+        while not servers.finished.is_set():
+            servers.poll(timeout=1.0)
+    except (EOFError, OSError):
+        return
+    stats = servers.final_stats
+    print(
+        f"[loadgen] script finished: {stats['twitch_sent']} Twitch and "
+        f"{stats['youtube_sent']} YouTube messages published"
+    )
+
+
+def run_record(args: argparse.Namespace) -> None:
+    """Record live chat from the configured channels to JSONL."""
+    config = TwitchPlays_Connection.load_twitchplays_config()
+    sources = [source for source in args.sources.split(",") if source]
+    signal = TwitchPlays_Connection.IngestSignal()
+    clients = []
+    if "twitch" in sources and config.get("twitch_channel"):
+        t = TwitchPlays_Connection.Twitch(signal=signal)
+        t.twitch_connect(str(config["twitch_channel"]))
+        clients.append(("twitch", t))
+    youtube_channel = str(config.get("youtube_channel_id") or "").strip() or None
+    youtube_url = str(config.get("youtube_stream_url") or "").strip() or None
+    if "youtube" in sources and (youtube_channel or youtube_url):
+        api_key = str(config.get("youtube_api_key") or "").strip() or None
+        y = TwitchPlays_Connection.YouTube(api_key=api_key, signal=signal)
+        y.youtube_connect(youtube_channel, youtube_url, api_key=api_key)
+        clients.append(("youtube", y))
+    if not clients:
+        raise SystemExit("No configured chat sources to record.")
+
+    recorder = ChatRecorder(Path(args.out))
+    stop_at = time.time() + args.seconds if args.seconds > 0 else None
+    print(f"Recording to {args.out}. Press Ctrl+C to stop.")
+    try:
+        while stop_at is None or time.time() < stop_at:
+            for source, client in clients:
+                messages = client.twitch_receive_messages()
+                if messages:
+                    recorder.record(source, messages)
+            signal.wait(0.25)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+        for _source, client in clients:
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+        print(f"Recorded {recorder.count} messages.")
+
+
+def add_script_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--sources", default="twitch,youtube", help="Comma-separated: twitch,youtube")
+    parser.add_argument("--rate", type=float, default=1000.0, help="Messages per second")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Script length")
+    parser.add_argument("--users", type=int, default=1000, help="Distinct chatters")
+    parser.add_argument("--commands", default="", help="Weights like up=5,down=3,jump=1")
+    parser.add_argument("--game", default="", help="Use a profile's commands instead of --commands")
+    parser.add_argument("--zipf", type=float, default=1.0, help="Skew for --game weights (0 = uniform)")
+    parser.add_argument("--noise", type=float, default=0.1, help="Fraction of non-command chatter")
+    parser.add_argument("--typos", type=float, default=0.0, help="Fraction of votes sent misspelled")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="Seconds between bursts")
+    parser.add_argument("--burst-seconds", type=float, default=0.0, help="Length of each burst")
+    parser.add_argument("--burst-factor", type=float, default=1.0, help="Rate multiplier during bursts")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    parser.add_argument("--replay", default="", help="Replay a JSONL recording instead of a script")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier")
+    parser.add_argument(
+        "--reconnect-every", type=float, default=0.0, help="Send session_reconnect every N seconds"
+    )
+    parser.add_argument(
+        "--drop-every", type=float, default=0.0, help="Reset the EventSub connection every N seconds"
+    )
+    parser.add_argument(
+        "--channels", type=int, default=1, help="Twitch channels the chat is spread across"
+    )
+    parser.add_argument(
+        "--youtube-poll-ms", type=int, default=1000, help="timeoutMs advertised by get_live_chat"
+    )
+    parser.add_argument(
+        "--connect-delay-ms",
+        type=float,
+        default=0.0,
+        help="Simulated handshake time for each new HTTP connection",
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Twitch Plays chat load generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    bench = commands.add_parser("bench", help="Measure chat ingest throughput")
+    add_script_args(bench)
+    bench.add_argument("--drain-seconds", type=float, default=2.0, help="Idle time that ends the run")
+    bench.add_argument(
+        "--match",
+        action="store_true",
+        help="Drop non-command chat on the transport threads, as the Everything runner does",
+    )
+    bench.add_argument(
+        "--match-tolerance",
+        type=int,
+        default=DEFAULT_MATCH_TOLERANCE,
+        help="Profile match_tolerance for --match (1 or 2 to recover --typos)",
+    )
+    bench.add_argument(
+        "--transport",
+        choices=TwitchPlays_AsyncConnection.CHAT_TRANSPORTS,
+        default="threads",
+        help="Chat transport implementation to drive",
+    )
+
+    rest = commands.add_parser("rest", help="Time the Twitch REST calls made on reconnect")
+    add_script_args(rest)
+    rest.add_argument("--rounds", type=int, default=200, help="Reconnects to time")
+    rest.add_argument("--no-pool", action="store_true", help="Open a new connection per call")
+    rest.add_argument("--no-cache", action="store_true", help="Look the user IDs up on every reconnect")
+
+    run = commands.add_parser("run", help="Run a runner against fake chat (runner args after --)")
+    add_script_args(run)
+    run.add_argument("--runner", choices=("everything", "single"), default="everything")
+
+    decode = commands.add_parser("decode", help="Time EventSub frame decoding per decoder")
+    add_script_args(decode)
+    decode.add_argument("--frames", default="", help="Raw EventSub frames, one per line, instead of a script")
+    decode.add_argument("--keepalive-every", type=int, default=10, help="One keepalive per N scripted notifications")
+    decode.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+
+    scrape = commands.add_parser("scrape", help="Time finding the scraper's JSON in YouTube pages")
+    scrape.add_argument("--watch-page", default="", help="Saved watch (/live) page instead of a synthetic one")
+    scrape.add_argument("--chat-page", default="", help="Saved live_chat page instead of a synthetic one")
+    scrape.add_argument("--page-kb", type=int, default=1200, help="Size of the synthetic pages")
+    scrape.add_argument("--chunk-kb", type=float, default=64, help="Streamed chunk size")
+    scrape.add_argument("--repeat", type=int, default=5, help="Timing runs; the best is reported")
+    scrape.add_argument("--seed", type=int, default=None, help="Random seed for the synthetic pages")
+    scrape.add_argument("--save", default="", help="Also write the pages used to this directory")
+
+    record = commands.add_parser("record", help="Record live chat to JSONL")
+    record.add_argument("--out", required=True, help="Output .jsonl file")
+    record.add_argument("--sources", default="twitch,youtube", help="Comma-separated: twitch,youtube")
+    record.add_argument("--seconds", type=float, default=0.0, help="Stop after N seconds (0 = Ctrl+C)")
+
+    argv = sys.argv[1:]
+    runner_args: List[str] = []
+    if "--" in argv:
+        split = argv.index("--")
+        argv, runner_args = argv[:split], argv[split + 1 :]
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        run_record(args)
+        return
+    if args.command == "scrape":
+        run_scrape(args)
+        return
+
+    for source in args.sources.split(","):
+        if source and source not in SOURCES:
+            raise SystemExit("--sources must only include twitch or youtube.")
+
+    if args.command == "decode":
+        run_decode(args)
+        return
+
+    servers = FakeChatProcess(args)
+    servers.start()
+    config_dir = tempfile.TemporaryDirectory(prefix="twitchplays-loadgen-")
+    redirect_connection(servers.http_url, servers.ws_url, Path(config_dir.name), args.channels)
+    try:
+        if args.command == "bench":
+            run_bench(args, servers)
+        elif args.command == "rest":
+            run_rest(args, servers)
+        else:
+            if not any(a == "--sources" or a.startswith("--sources=") for a in runner_args):
+                runner_args = ["--sources", args.sources, *runner_args]
+            run_runner(args, servers, runner_args)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servers.close()
+        config_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
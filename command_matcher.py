@@ -0,0 +1,260 @@
+"""
+Profile command matching for chat transports.
+
+- CommandMatcher(commands, tolerance=DEFAULT_MATCH_TOLERANCE)
+    Alias index compiled once from the active profile. Command ids are small
+    ints that index `names`.
+
+- CommandMatcher.match(text) -> Optional[int]
+    Command id for one chat line, or None when it is not a command.
+
+Lines are tried in order of cost, and only a miss goes further:
+
+    exact         dict hit on the raw line (most votes stop here)
+    normalized    lowercase, punctuation dropped, repeats folded:
+                  "WALK walk", "walk!!" -> "walk"
+    prefix        unambiguous alias prefix of MIN_PREFIX_LENGTH or more:
+                  "forw" -> "forward"
+    fuzzy         edit distance (adjacent swaps count as one edit) up to
+                  min(tolerance, len(alias) // 4), found through a
+                  symmetric-delete table: "wlak" -> "walk"
+
+Prefix and fuzzy forms are precomputed into flat dicts at profile load, so a
+lookup is a handful of dict probes whatever the profile size. Results for
+short lines are memoized, which keeps repeated chatter ("lol", "wlak") at one
+probe. `match_tolerance` in a profile sets the tolerance. The default, 0,
+keeps exact (case-insensitive, outer spaces ignored) matching only, so
+normalization is off too and "shoot!" is not "shoot"; profiles opt in to the
+rest with 1 or 2, since loose matching also turns chatter into votes
+("hover" -> "cover"). Ambiguous lines never match.
+
+`recovered` counts votes the exact path would have rejected, by kind.
+
+Transports that are given a matcher call match() on their reader or fetch
+thread and only queue commands; everything else is just counted. Queued
+messages carry the id, so the vote loop tallies without looking text up again.
+"""
+
+from __future__ import annotations
+
+import string
+import sys
+import threading
+from typing import Any, Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from macro_program import ProfileError
+
+DEFAULT_MATCH_TOLERANCE = 0
+MAX_MATCH_TOLERANCE = 2
+MIN_PREFIX_LENGTH = 3
+# chars of alias per allowed edit, so "up" never fuzzes but "walk" does
+FUZZY_CHARS_PER_EDIT = 4
+MATCH_CACHE_SIZE = 8192
+
+AMBIGUOUS = -1
+PUNCTUATION_TABLE = str.maketrans(string.punctuation, " " * len(string.punctuation))
+RECOVERED_KINDS = ("normalized", "prefix", "fuzzy")
+
+
+def profile_match_tolerance(profile: Mapping[str, Any]) -> int:
+    raw = profile.get("match_tolerance", DEFAULT_MATCH_TOLERANCE)
+    if isinstance(raw, bool) or not isinstance(raw, int) or not 0 <= raw <= MAX_MATCH_TOLERANCE:
+        raise ProfileError(
+            f"Profile `match_tolerance` must be an integer from 0 to {MAX_MATCH_TOLERANCE}."
+        )
+    return raw
+
+
+def normalize_command(text: str) -> str:
+    words = text.lower().translate(PUNCTUATION_TABLE).split()
+    count = len(words)
+    # "walk walk walk" -> "walk", "look up look up" -> "look up"
+    for size in range(1, count // 2 + 1):
+        if count % size == 0 and words[:size] * (count // size) == words:
+            return " ".join(words[:size])
+    return " ".join(words)
+
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """`word` and every string made by deleting up to `distance` chars from it."""
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1 :] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """One insertion, deletion, substitution or adjacent swap at most."""
+    length_a, length_b = len(a), len(b)
+    if abs(length_a - length_b) > 1:
+        return False
+    i = 0
+    shorter = min(length_a, length_b)
+    while i < shorter and a[i] == b[i]:
+        i += 1
+    if length_a > length_b:
+        return a[i + 1 :] == b[i:]
+    if length_a < length_b:
+        return a[i:] == b[i + 1 :]
+    if a[i + 1 :] == b[i + 1 :]:
+        return True
+    return (
+        i + 1 < length_a
+        and a[i] == b[i + 1]
+        and a[i + 1] == b[i]
+        and a[i + 2 :] == b[i + 2 :]
+    )
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it exceeds `limit`."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+    if limit == 1:
+        return 1 if within_one_edit(a, b) else 2
+    previous2: list = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        # a swap can still reach back past one row, so both must be over
+        if min(current) > limit and min(previous) >= limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+class CommandMatcher:
+    def __init__(self, commands: Iterable[str], tolerance: int = DEFAULT_MATCH_TOLERANCE) -> None:
+        names = sorted({sys.intern(str(c).strip().lower()) for c in commands if str(c).strip()})
+        self.names: Tuple[str, ...] = tuple(names)
+        self.ids: Dict[str, int] = {name: i for i, name in enumerate(self.names)}
+        self.tolerance = max(0, min(MAX_MATCH_TOLERANCE, int(tolerance)))
+        # anything longer than the longest alias cannot match, even stripped
+        self.longest = max((len(name) for name in self.names), default=0)
+        # longest line worth normalizing: room for repeats and a few stray chars
+        self.max_text = self.longest * 4 + 3
+
+        self.normalized: Dict[str, int] = {}
+        self.prefixes: Dict[str, int] = {}
+        self.fuzzy: Dict[str, Tuple[int, ...]] = {}
+        # command id -> normalized alias, for verifying fuzzy candidates
+        self.fuzzy_forms: Dict[int, str] = {}
+        if self.tolerance:
+            self.build_index()
+
+        self.cache: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        self.recovered: Dict[str, int] = dict.fromkeys(RECOVERED_KINDS, 0)
+        # transports match on their own threads; only recoveries take the lock
+        self.recovered_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, text: str) -> bool:
+        return self.match(text) is not None
+
+    @property
+    def recovered_total(self) -> int:
+        return sum(self.recovered.values())
+
+    def build_index(self) -> None:
+        forms = []
+        for command, name in enumerate(self.names):
+            form = normalize_command(name)
+            if not form:
+                continue
+            self.normalized.setdefault(form, command)
+            forms.append((form, command))
+
+        for form, command in forms:
+            for length in range(MIN_PREFIX_LENGTH, len(form)):
+                prefix = form[:length]
+                if prefix[-1] == " " or prefix in self.normalized:
+                    continue
+                if self.prefixes.get(prefix, command) != command:
+                    self.prefixes[prefix] = AMBIGUOUS
+                else:
+                    self.prefixes[prefix] = command
+
+        fuzzy: Dict[str, Set[int]] = {}
+        for form, command in forms:
+            distance = min(self.tolerance, len(form) // FUZZY_CHARS_PER_EDIT)
+            if distance == 0 or command in self.fuzzy_forms:
+                continue
+            self.fuzzy_forms[command] = form
+            for variant in deletes(form, distance):
+                fuzzy.setdefault(variant, set()).add(command)
+        self.fuzzy = {variant: tuple(ids) for variant, ids in fuzzy.items()}
+
+    def match(self, text: str) -> Optional[int]:
+        command = self.ids.get(text)
+        if command is not None:
+            return command
+        cached = self.cache.get(text)
+        if cached is None:
+            if len(text) > self.max_text:
+                return None
+            cached = self.classify(text)
+            if len(self.cache) >= MATCH_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[text] = cached
+        command, kind = cached
+        if kind is not None:
+            with self.recovered_lock:
+                self.recovered[kind] += 1
+        return command
+
+    def classify(self, text: str) -> Tuple[Optional[int], Optional[str]]:
+        """(command id, recovered kind) for a line that missed the exact table."""
+        stripped = text.strip().lower()
+        command = self.ids.get(stripped)
+        if command is not None or not self.tolerance:
+            return command, None
+
+        form = normalize_command(stripped)
+        if not form:
+            return None, None
+        command = self.normalized.get(form)
+        if command is not None:
+            return command, "normalized"
+        command = self.prefixes.get(form)
+        if command is not None:
+            return (None, None) if command == AMBIGUOUS else (command, "prefix")
+        command = self.fuzzy_match(form)
+        return command, None if command is None else "fuzzy"
+
+    def fuzzy_match(self, form: str) -> Optional[int]:
+        if len(form) > self.longest + self.tolerance:
+            return None
+        candidates: Set[int] = set()
+        fuzzy = self.fuzzy
+        for variant in deletes(form, self.tolerance):
+            ids = fuzzy.get(variant)
+            if ids:
+                candidates.update(ids)
+        if not candidates:
+            return None
+
+        best: Optional[int] = None
+        best_distance = MAX_MATCH_TOLERANCE + 1
+        tied = False
+        for command in candidates:
+            alias = self.fuzzy_forms[command]
+            allowed = min(self.tolerance, len(alias) // FUZZY_CHARS_PER_EDIT)
+            distance = edit_distance(form, alias, allowed)
+            if distance > allowed:
+                continue
+            if distance < best_distance:
+                best, best_distance, tied = command, distance, False
+            elif distance == best_distance:
+                tied = True
+        return None if tied else best
@@ -0,0 +1,242 @@
+"""
+External vote ingest for Twitch Plays (`--input-mode external`).
+
+Runs a FastAPI app under uvicorn on a background thread of the runner and
+feeds the VoteRing (`tp_external_ring`) the vote loop drains:
+
+- POST /votes          {"votes": [{"username": "...", "message": "..."}, ...]}
+    Thousands of votes per request. Returns accepted/rejected counts.
+
+- WS   /votes/stream   one JSON object per frame, either a single vote or
+                       {"votes": [...]}; errors are sent back as {"error": ...}
+
+- GET  /status         input mode, queued votes and running totals
+
+Votes are matched against the profile's commands (CommandMatcher) before they reach the vote loop, and
+each request or frame is one VoteRing.push_batch() followed by one
+IngestSignal.notify(). Every handler runs on uvicorn's event loop thread, which
+makes it the ring's single producer.
+
+When the ring is past its high-water mark responses carry
+"backpressure": true; when it is full the votes that did not fit are
+rejected (HTTP 429 with Retry-After).
+
+If the config has `external_api_token`, requests must send
+`Authorization: Bearer <token>` (or `?token=` for the WebSocket).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from TwitchPlays_Connection import ChatMessage, normalize_username
+from command_matcher import CommandMatcher
+from vote_ring import VoteRing
+
+try:
+    import uvicorn
+    from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+    from fastapi.responses import JSONResponse
+except BaseException:
+    uvicorn = None
+    FastAPI = None
+
+DEFAULT_API_HOST = "127.0.0.1"
+DEFAULT_API_PORT = 8765
+MAX_USERNAME_LENGTH = 64
+API_STARTUP_TIMEOUT_SECONDS = 5.0
+ERROR_WRONG_MODE = "input mode is not external"
+ERROR_BACKLOG_FULL = "external vote backlog is full"
+RETRY_AFTER_SECONDS = 1
+
+
+class ExternalVoteSink:
+    """Edge validation and batched hand-off into the runner's external hooks."""
+
+    def __init__(
+        self,
+        ring: VoteRing,
+        signal: Any,
+        matcher: CommandMatcher,
+        input_mode_ref: Callable[[], str],
+        max_message_length: int,
+    ) -> None:
+        self.ring = ring
+        self.signal = signal
+        self.matcher = matcher
+        self.input_mode_ref = input_mode_ref
+        self.max_message_length = max_message_length
+        self.accepted = 0
+        self.rejected = 0
+
+    def push(self, votes: Iterable[Any]) -> Tuple[int, int, Optional[str]]:
+        """Validate and queue votes; returns (accepted, rejected, error)."""
+        if self.input_mode_ref() != "external":
+            return 0, 0, ERROR_WRONG_MODE
+
+        received_at = time.monotonic()
+        batch: List[ChatMessage] = []
+        rejected = 0
+        match = self.matcher.match
+        names = self.matcher.names
+        for vote in votes:
+            if not isinstance(vote, dict):
+                rejected += 1
+                continue
+            msg = str(vote.get("message") or "")
+            user = str(vote.get("username") or "").strip()
+            if not user or len(user) > MAX_USERNAME_LENGTH or len(msg) > self.max_message_length:
+                rejected += 1
+                continue
+            command = match(msg)
+            if command is None:
+                rejected += 1
+                continue
+            batch.append(
+                ChatMessage(
+                    normalize_username(user), names[command], received_at, received_at, command
+                )
+            )
+
+        accepted = self.ring.push_batch(batch) if batch else 0
+        if accepted:
+            self.signal.notify()
+        rejected += len(batch) - accepted
+        self.accepted += accepted
+        self.rejected += rejected
+        if accepted < len(batch):
+            return accepted, rejected, ERROR_BACKLOG_FULL
+        return accepted, rejected, None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "mode": self.input_mode_ref(),
+            "queued": len(self.ring),
+            "capacity": self.ring.capacity,
+            "backpressure": self.ring.backpressure,
+            "overflowed": self.ring.overflowed,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "recovered": dict(self.matcher.recovered),
+            "commands": list(self.matcher.names),
+        }
+
+
+def votes_from_payload(payload: Any) -> List[Any]:
+    if isinstance(payload, dict) and "votes" in payload:
+        votes = payload["votes"]
+        return votes if isinstance(votes, list) else []
+    if isinstance(payload, list):
+        return payload
+    return [payload]
+
+
+def create_app(votes: ExternalVoteSink, token: Optional[str] = None) -> "FastAPI":
+    if FastAPI is None:
+        raise RuntimeError(
+            "The external input API requires fastapi and uvicorn. Install them with `pip install -r requirements.txt`."
+        )
+    app = FastAPI(title="Twitch Plays external input")
+    expected_auth = f"Bearer {token}" if token else None
+
+    def authorized(headers: Any, query: Any) -> bool:
+        if expected_auth is None:
+            return True
+        return headers.get("authorization") == expected_auth or query.get("token") == token
+
+    @app.post("/votes")
+    async def post_votes(request: Request) -> JSONResponse:
+        if not authorized(request.headers, request.query_params):
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        try:
+            payload = json.loads(await request.body())
+        except ValueError:
+            return JSONResponse({"error": "body is not valid JSON"}, status_code=400)
+        accepted, rejected, error = votes.push(votes_from_payload(payload))
+        body = {
+            "accepted": accepted,
+            "rejected": rejected,
+            "backpressure": votes.ring.backpressure,
+        }
+        if error == ERROR_WRONG_MODE:
+            body["error"] = error
+            return JSONResponse(body, status_code=409)
+        if error is not None:
+            body["error"] = error
+            return JSONResponse(
+                body, status_code=429, headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+            )
+        return JSONResponse(body)
+
+    @app.get("/status")
+    async def get_status(request: Request) -> JSONResponse:
+        if not authorized(request.headers, request.query_params):
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        return JSONResponse(votes.status())
+
+    @app.websocket("/votes/stream")
+    async def stream_votes(websocket: WebSocket) -> None:
+        if not authorized(websocket.headers, websocket.query_params):
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        throttled = False
+        try:
+            while True:
+                raw = await websocket.receive_text()
+                try:
+                    payload = json.loads(raw)
+                except ValueError:
+                    await websocket.send_json({"error": "frame is not valid JSON"})
+                    continue
+                _accepted, rejected, error = votes.push(votes_from_payload(payload))
+                if error is not None:
+                    await websocket.send_json({"error": error, "rejected": rejected})
+                # tell the feed when to slow down and when it may speed up again
+                if votes.ring.backpressure != throttled:
+                    throttled = not throttled
+                    await websocket.send_json({"backpressure": throttled})
+        except WebSocketDisconnect:
+            pass
+
+    return app
+
+
+class ExternalApiServer:
+    """uvicorn on a daemon thread of the runner process."""
+
+    def __init__(
+        self,
+        votes: ExternalVoteSink,
+        host: str = DEFAULT_API_HOST,
+        port: int = DEFAULT_API_PORT,
+        token: Optional[str] = None,
+    ) -> None:
+        app = create_app(votes, token)
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off")
+        )
+        self.host = host
+        self.port = port
+        self.thread = threading.Thread(
+            target=self.server.run, name="twitchplays-external-api", daemon=True
+        )
+
+    def start(self) -> None:
+        self.thread.start()
+        deadline = time.monotonic() + API_STARTUP_TIMEOUT_SECONDS
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                self.close()
+                raise RuntimeError(
+                    f"External input API could not listen on {self.host}:{self.port}."
+                )
+            time.sleep(0.05)
+
+    def close(self) -> None:
+        self.server.should_exit = True
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
@@ -10,17 +10,28 @@ Foreground-window focus gate for Twitch Plays.
 Windows uses Win32 APIs. Linux uses X11 window metadata when available.
 If a target is configured and the active window cannot be inspected, the gate
 returns False instead of silently allowing input to the wrong window.
+
+A background tracker keeps the verdict current so is_target_focused() is a
+plain read that is cheap enough to call per macro step. On Linux it follows
+long-lived `xprop -spy` children watching `_NET_ACTIVE_WINDOW` and the active
+window's pid/title. On Windows it listens to WinEvent hooks for foreground and
+title changes. If the tracker cannot run, every call falls back to querying
+the window system directly.
 """
 
 from __future__ import annotations
 
 import ast
+import atexit
 import sys
 import ctypes
 import re
 import shutil
 import subprocess
-from typing import Any, Optional
+import threading
+import time
+from ctypes import wintypes
+from typing import Any, Dict, Optional
 
 import psutil
 
@@ -28,12 +39,44 @@ import psutil
 TARGET_PROCESS: Optional[str] = None
 TITLE_CONTAINS: Optional[str] = None
 
+# Seconds between attempts to restart a focus tracker that died
+TRACKER_RETRY_SEC = 5.0
+MAX_CACHED_PROCESS_NAMES = 256
+
+# pid -> process name; psutil is only asked when focus moves to a new pid
+PROCESS_NAME_CACHE: Dict[int, Optional[str]] = {}
+
+# Cached verdict maintained by a focus tracker. None means "no tracker running".
+FOCUS_MATCHED: Optional[bool] = None
+FOCUS_TRACKER: Any = None
+last_tracker_start = 0.0
+
 
 def set_focus_target(process_name: Optional[str] = None, title_contains: Optional[str] = None) -> None:
     global TARGET_PROCESS, TITLE_CONTAINS
     # Use only the explicitly provided values; no environment fallbacks
     TARGET_PROCESS = (process_name or "").strip().lower() or None
     TITLE_CONTAINS = (title_contains or "").strip().lower() or None
+    tracker = FOCUS_TRACKER
+    if tracker is not None:
+        tracker.publish()
+
+
+def process_name_for_pid(pid: Optional[int]) -> Optional[str]:
+    if not pid or psutil is None:
+        return None
+    try:
+        return PROCESS_NAME_CACHE[pid]
+    except KeyError:
+        pass
+    try:
+        name: Optional[str] = psutil.Process(pid).name()
+    except Exception:
+        name = None
+    if len(PROCESS_NAME_CACHE) >= MAX_CACHED_PROCESS_NAMES:
+        PROCESS_NAME_CACHE.clear()
+    PROCESS_NAME_CACHE[pid] = name
+    return name
 
 
 def is_windows() -> bool:
@@ -115,13 +158,336 @@ def read_linux_active_window() -> Optional[tuple[Optional[str], Optional[str]]]:
         return None
 
     pid, title = parse_xprop_window_details(window_result.stdout)
-    process_name = None
-    if pid and psutil is not None:
+    return process_name_for_pid(pid), title
+
+
+class FocusTracker:
+    """Base for background trackers that publish the cached focus verdict."""
+
+    def __init__(self) -> None:
+        self.process_name: Optional[str] = None
+        self.title: Optional[str] = None
+        self.known = False
+        self.stopped = False
+
+    def alive(self) -> bool:
+        raise NotImplementedError
+
+    def stop(self) -> None:
+        raise NotImplementedError
+
+    def publish(self) -> None:
+        global FOCUS_MATCHED
+        if not self.alive():
+            FOCUS_MATCHED = None
+        elif not self.known:
+            # No focused window, or its details have not arrived yet
+            FOCUS_MATCHED = False
+        else:
+            FOCUS_MATCHED = matches_focus_target(self.process_name, self.title)
+
+
+class LinuxFocusTracker(FocusTracker):
+    """Follow the X11 active window with `xprop -spy` instead of polling.
+
+    One child spies on the root window's `_NET_ACTIVE_WINDOW`. Each time focus
+    moves, a second child is (re)started to spy on that window's pid and
+    title, which also catches games that rename their window after launch.
+    """
+
+    def __init__(self, xprop_path: str) -> None:
+        super().__init__()
+        self.xprop_path = xprop_path
+        self.root_proc: Optional[subprocess.Popen] = None
+        self.window_proc: Optional[subprocess.Popen] = None
+        self.window_lock = threading.Lock()
+        self.window_id: Optional[str] = None
+        self.pid: Optional[int] = None
+        self.title_from_net_wm = False
+
+    def start(self) -> None:
+        self.root_proc = self.spawn_spy(["-root", "-spy", "_NET_ACTIVE_WINDOW"])
+        threading.Thread(
+            target=self.read_root,
+            args=(self.root_proc,),
+            name="twitchplays-focus-root",
+            daemon=True,
+        ).start()
+
+    def alive(self) -> bool:
+        proc = self.root_proc
+        return not self.stopped and proc is not None and proc.poll() is None
+
+    def stop(self) -> None:
+        self.stopped = True
+        self.stop_proc(self.root_proc)
+        with self.window_lock:
+            self.stop_proc(self.window_proc)
+            self.window_proc = None
+
+    def spawn_spy(self, args: list) -> subprocess.Popen:
+        return subprocess.Popen(
+            [self.xprop_path, *args],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+
+    def stop_proc(self, proc: Optional[subprocess.Popen]) -> None:
+        if proc is None or proc.poll() is not None:
+            return
         try:
-            process_name = psutil.Process(pid).name()
+            proc.terminate()
         except Exception:
+            pass
+
+    def read_root(self, proc: subprocess.Popen) -> None:
+        stdout = proc.stdout
+        if stdout is not None:
+            for line in stdout:
+                if self.stopped:
+                    break
+                window_id = parse_xprop_window_id(line)
+                if window_id != self.window_id:
+                    self.follow_window(window_id)
+        self.known = False
+        self.publish()
+
+    def follow_window(self, window_id: Optional[str]) -> None:
+        with self.window_lock:
+            self.stop_proc(self.window_proc)
+            self.window_proc = None
+            self.window_id = window_id
+            self.pid = None
+            self.process_name = None
+            self.title = None
+            self.title_from_net_wm = False
+            # Unknown until the window spy reports; the gate stays closed meanwhile
+            self.known = False
+            self.publish()
+            if window_id is None or self.stopped:
+                return
+            try:
+                proc = self.spawn_spy(
+                    ["-id", window_id, "-spy", "_NET_WM_PID", "_NET_WM_NAME", "WM_NAME"]
+                )
+            except Exception:
+                return
+            self.window_proc = proc
+        threading.Thread(
+            target=self.read_window,
+            args=(proc, window_id),
+            name="twitchplays-focus-window",
+            daemon=True,
+        ).start()
+
+    def read_window(self, proc: subprocess.Popen, window_id: str) -> None:
+        stdout = proc.stdout
+        if stdout is None:
+            return
+        for line in stdout:
+            if self.stopped:
+                break
+            pid, title = parse_xprop_window_details(line)
             process_name = None
-    return process_name, title
+            if pid is not None and pid != self.pid:
+                process_name = process_name_for_pid(pid)
+            from_net_wm = line.lstrip().startswith("_NET_WM_NAME(")
+            # follow_window may have moved on while this line was parsed
+            with self.window_lock:
+                if self.stopped or self.window_id != window_id:
+                    break
+                if pid is not None and pid != self.pid:
+                    self.pid = pid
+                    self.process_name = process_name
+                if title is not None and (from_net_wm or not self.title_from_net_wm):
+                    self.title = title
+                    self.title_from_net_wm = from_net_wm
+                self.known = True
+                self.publish()
+
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+
+WINEVENTPROC = getattr(ctypes, "WINFUNCTYPE", ctypes.CFUNCTYPE)(
+    None,
+    wintypes.HANDLE,
+    wintypes.DWORD,
+    wintypes.HWND,
+    wintypes.LONG,
+    wintypes.LONG,
+    wintypes.DWORD,
+    wintypes.DWORD,
+)
+
+
+def read_windows_window(user32: Any, hwnd: Any) -> tuple[Optional[int], str]:
+    length = user32.GetWindowTextLengthW(hwnd)
+    buf = ctypes.create_unicode_buffer(length + 1)
+    user32.GetWindowTextW(hwnd, buf, length + 1)
+
+    pid = wintypes.DWORD()
+    user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    return int(pid.value) or None, buf.value
+
+
+class WindowsFocusTracker(FocusTracker):
+    """Follow the foreground window with WinEvent hooks instead of polling.
+
+    Hooks for EVENT_SYSTEM_FOREGROUND and EVENT_OBJECT_NAMECHANGE run
+    out-of-context on a dedicated thread with its own message pump. `user32`
+    can be swapped for a fake to exercise the tracker off Windows.
+    """
+
+    def __init__(self, user32: Any = None) -> None:
+        super().__init__()
+        if user32 is None:
+            user32 = getattr(ctypes, "windll").user32
+        self.user32 = user32
+        self.hwnd: Any = None
+        self.pid: Optional[int] = None
+        self.hooks: list = []
+        self.ready = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.thread_id: Optional[int] = None
+        # ctypes callback must outlive the hooks or Windows calls freed memory
+        self.callback = WINEVENTPROC(self.handle_event)
+
+    def start(self) -> None:
+        self.thread = threading.Thread(
+            target=self.run, name="twitchplays-focus-winevent", daemon=True
+        )
+        self.thread.start()
+        self.ready.wait(1.0)
+        if not self.hooks:
+            self.stop()
+            raise RuntimeError("SetWinEventHook failed.")
+
+    def alive(self) -> bool:
+        thread = self.thread
+        return not self.stopped and thread is not None and thread.is_alive()
+
+    def stop(self) -> None:
+        self.stopped = True
+        if self.thread_id is not None:
+            try:
+                self.user32.PostThreadMessageW(self.thread_id, WM_QUIT, 0, 0)
+            except Exception:
+                pass
+
+    def run(self) -> None:
+        user32 = self.user32
+        self.thread_id = threading.get_native_id()
+        try:
+            for event in (EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE):
+                hook = user32.SetWinEventHook(
+                    event,
+                    event,
+                    None,
+                    self.callback,
+                    0,
+                    0,
+                    WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS,
+                )
+                if hook:
+                    self.hooks.append(hook)
+            if self.hooks:
+                self.follow_window(user32.GetForegroundWindow())
+        finally:
+            self.ready.set()
+        if not self.hooks:
+            return
+
+        msg = wintypes.MSG()
+        try:
+            while not self.stopped and user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in self.hooks:
+                try:
+                    user32.UnhookWinEvent(hook)
+                except Exception:
+                    pass
+            self.hooks = []
+            self.stopped = True
+            self.publish()
+
+    def handle_event(
+        self, hook, event, hwnd, id_object, id_child, event_thread, event_time
+    ) -> None:
+        try:
+            if event == EVENT_SYSTEM_FOREGROUND:
+                self.follow_window(hwnd)
+            elif event == EVENT_OBJECT_NAMECHANGE and id_object == OBJID_WINDOW:
+                if hwnd and hwnd == self.hwnd:
+                    self.follow_window(hwnd)
+        except Exception:
+            # Never let an exception unwind into the Windows callback
+            self.known = False
+            self.publish()
+
+    def follow_window(self, hwnd: Any) -> None:
+        self.hwnd = hwnd
+        if not hwnd:
+            self.known = False
+            self.publish()
+            return
+        pid, title = read_windows_window(self.user32, hwnd)
+        if pid != self.pid:
+            self.pid = pid
+            self.process_name = process_name_for_pid(pid)
+        self.title = title
+        self.known = True
+        self.publish()
+
+
+def start_focus_tracker() -> None:
+    """Start the background focus tracker for this platform, if possible."""
+    global FOCUS_TRACKER, last_tracker_start
+    now = time.monotonic()
+    if now - last_tracker_start < TRACKER_RETRY_SEC:
+        return
+    last_tracker_start = now
+
+    if FOCUS_TRACKER is not None:
+        FOCUS_TRACKER.stop()
+        FOCUS_TRACKER = None
+
+    tracker: Optional[FocusTracker] = None
+    if is_windows():
+        tracker = WindowsFocusTracker()
+    elif is_linux():
+        xprop_path = shutil.which("xprop")
+        if not xprop_path:
+            return
+        tracker = LinuxFocusTracker(xprop_path)
+    if tracker is None:
+        return
+
+    try:
+        tracker.start()
+    except Exception:
+        tracker.stop()
+        return
+    FOCUS_TRACKER = tracker
+    atexit.register(stop_focus_tracker)
+
+
+def stop_focus_tracker() -> None:
+    global FOCUS_TRACKER, FOCUS_MATCHED
+    tracker = FOCUS_TRACKER
+    FOCUS_TRACKER = None
+    FOCUS_MATCHED = None
+    if tracker is not None:
+        tracker.stop()
 
 
 def matches_focus_target(process_name: Optional[str], title: Optional[str]) -> bool:
@@ -144,35 +510,22 @@ def is_target_focused() -> bool:
     if TARGET_PROCESS is None and TITLE_CONTAINS is None:
         return True
 
+    matched = FOCUS_MATCHED
+    if matched is not None:
+        return matched
+    start_focus_tracker()
+
     if is_windows():
         try:
             windll: Any = getattr(ctypes, "windll")
             user32 = windll.user32
-            GetForegroundWindow = user32.GetForegroundWindow
-            GetWindowTextLengthW = user32.GetWindowTextLengthW
-            GetWindowTextW = user32.GetWindowTextW
-            GetWindowThreadProcessId = user32.GetWindowThreadProcessId
 
-            hwnd = GetForegroundWindow()
+            hwnd = user32.GetForegroundWindow()
             if not hwnd:
                 return False
 
-            length = GetWindowTextLengthW(hwnd)
-            buf = ctypes.create_unicode_buffer(length + 1)
-            GetWindowTextW(hwnd, buf, length + 1)
-            title = buf.value
-
-            process_name = None
-            if TARGET_PROCESS and psutil is not None:
-                from ctypes import wintypes
-
-                pid = wintypes.DWORD()
-                GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-                try:
-                    process_name = psutil.Process(int(pid.value)).name()
-                except Exception:
-                    process_name = None
-
+            pid, title = read_windows_window(user32, hwnd)
+            process_name = process_name_for_pid(pid) if TARGET_PROCESS else None
             return matches_focus_target(process_name, title)
         except Exception:
             return False
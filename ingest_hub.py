@@ -0,0 +1,156 @@
+"""
+Merged chat ingest: one producer thread per source, one queue for the vote loop.
+
+- IngestHub(signal=None, capacity=DEFAULT_HUB_CAPACITY)
+    `signal` is the consumer's IngestSignal, notified after every batch.
+
+- IngestHub.source_signal(name) -> IngestSignal
+    Wakeup to hand to that source's transport (Twitch(signal=...),
+    YouTube(signal=...)) before it connects, so the producer thread sleeps
+    until the transport has something.
+
+- IngestHub.add_source(name, source), start(), close()
+    `source` is anything with twitch_receive_messages(); an optional
+    poll_deadline() says when to call it again without a wakeup.
+
+- IngestHub.drain() -> List[ChatMessage]
+    Everything merged so far, in arrival order.
+
+A source that blocks (a YouTube page fetch, a scrape reconnect) only stalls
+its own thread, so it can never hold back messages another source already
+has. Producers stamp messages with `source` and a per-source `seq` counting
+everything that source produced; the merged queue holds at most `capacity`
+messages and anything past that is dropped and counted in `dropped`, so a
+gap in `seq` is exactly what was lost.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional
+
+from TwitchPlays_Connection import ChatMessage, IngestSignal
+
+DEFAULT_HUB_CAPACITY = 1 << 16
+# a producer with a wakeup only times out to notice close()
+SOURCE_IDLE_WAIT_SECONDS = 0.5
+# a source without one is polled
+SOURCE_POLL_SECONDS = 0.01
+SOURCE_ERROR_BACKOFF_SECONDS = 1.0
+SOURCE_JOIN_SECONDS = 2.0
+
+
+class IngestHub:
+    def __init__(self, signal: Optional[IngestSignal] = None, capacity: int = DEFAULT_HUB_CAPACITY) -> None:
+        if capacity < 1:
+            raise ValueError("IngestHub capacity must be positive.")
+        self.signal = signal or IngestSignal()
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.queue: List[ChatMessage] = []
+        self.sources: Dict[str, Any] = {}
+        self.signals: Dict[str, IngestSignal] = {}
+        self.threads: List[threading.Thread] = []
+        self.stop_event = threading.Event()
+        # per source: messages produced (last seq), dropped, receive errors
+        self.produced: Dict[str, int] = {}
+        self.dropped: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def source_signal(self, name: str) -> IngestSignal:
+        signal = self.signals.get(name)
+        if signal is None:
+            signal = self.signals[name] = IngestSignal()
+        return signal
+
+    def add_source(self, name: str, source: Any) -> None:
+        if name in self.sources:
+            raise ValueError(f"Chat source {name!r} is already registered.")
+        self.sources[name] = source
+        self.produced[name] = 0
+        self.dropped[name] = 0
+        self.errors[name] = 0
+
+    def start(self) -> None:
+        for name, source in self.sources.items():
+            thread = threading.Thread(
+                target=self.run_source,
+                args=(name, source),
+                name=f"twitchplays-ingest-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
+
+    def close(self) -> None:
+        self.stop_event.set()
+        for signal in self.signals.values():
+            signal.notify()
+        for thread in self.threads:
+            if thread.is_alive() and thread is not threading.current_thread():
+                thread.join(timeout=SOURCE_JOIN_SECONDS)
+        self.threads = []
+
+    def run_source(self, name: str, source: Any) -> None:
+        signal = self.source_signal(name)
+        # transports built with source_signal(name) notify it when they queue
+        wakes = getattr(source, "signal", None) is signal
+        poll_deadline = getattr(source, "poll_deadline", None)
+        while not self.stop_event.is_set():
+            try:
+                messages = source.twitch_receive_messages()
+            except Exception:
+                traceback.print_exc()
+                self.errors[name] += 1
+                self.stop_event.wait(SOURCE_ERROR_BACKOFF_SECONDS)
+                continue
+            if messages:
+                self.push(name, messages)
+                continue
+
+            timeout = SOURCE_IDLE_WAIT_SECONDS if wakes else SOURCE_POLL_SECONDS
+            poll_at = poll_deadline() if poll_deadline is not None else None
+            if poll_at is not None:
+                timeout = min(timeout, max(0.0, poll_at - time.time()))
+            if not wakes:
+                timeout = max(timeout, SOURCE_POLL_SECONDS)
+            signal.wait(timeout)
+
+    def push(self, name: str, messages: List[ChatMessage]) -> int:
+        """Stamp and queue one source's batch; returns how many fit."""
+        seq = self.produced[name]
+        for message in messages:
+            seq += 1
+            message.source = name
+            message.seq = seq
+        self.produced[name] = seq
+
+        with self.lock:
+            room = self.capacity - len(self.queue)
+            if room < len(messages):
+                self.dropped[name] += len(messages) - max(0, room)
+                messages = messages[: max(0, room)]
+            self.queue.extend(messages)
+        if messages:
+            self.signal.notify()
+        return len(messages)
+
+    def drain(self) -> List[ChatMessage]:
+        with self.lock:
+            messages, self.queue = self.queue, []
+        return messages
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {
+                "produced": self.produced[name],
+                "dropped": self.dropped[name],
+                "errors": self.errors[name],
+            }
+            for name in self.sources
+        }
@@ -0,0 +1,205 @@
+"""
+Latency tracing from chat receipt to injected input.
+
+Every timestamp is time.monotonic(). Chat messages (ChatMessage) carry their
+own stamps (received_at, queued_at, drained_at) through the pipeline; each vote
+window gets a WindowTrace that follows the winner into the executor.
+
+- LatencyTracer.message(msg, tallied_at)
+    Record the per-message spans once the vote loop has counted a message.
+
+- LatencyTracer.finish_window(window)
+    Record the per-window spans and keep the window for the dump.
+
+- LatencyTracer.dump(path)
+    Write p50/p95/p99/max for every span plus the most recent windows as JSON.
+
+Message spans are computed on the vote loop thread from the stamps the
+messages carry, so those histograms need no locking. Windows finish on either
+the vote loop or the executor thread and go through a lock.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+# 1 us resolution, 8 sub-buckets per power of two (<= 12.5% bucket width),
+# top bucket starts around 70 minutes
+HISTOGRAM_MIN_SECONDS = 1e-6
+HISTOGRAM_SUB_BUCKETS = 8
+HISTOGRAM_OCTAVES = 32
+HISTOGRAM_BUCKETS = HISTOGRAM_SUB_BUCKETS * HISTOGRAM_OCTAVES
+
+# Windows kept for the dump
+RECENT_WINDOWS = 200
+
+MESSAGE_SPANS = (
+    "received->queued",
+    "queued->drained",
+    "drained->tallied",
+    "received->tallied",
+)
+WINDOW_SPANS = (
+    "window_close_lag",
+    "winner_vote->winner",
+    "winner->focus_checked",
+    "focus_checked->first_input",
+    "first_input->done",
+    "winner_vote->first_input",
+)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self.counts = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if seconds < 0.0:
+            seconds = 0.0
+        scaled = seconds / HISTOGRAM_MIN_SECONDS
+        if scaled < 1.0:
+            index = 0
+        else:
+            mantissa, exponent = math.frexp(scaled)  # scaled = mantissa * 2**exponent
+            index = (exponent - 1) * HISTOGRAM_SUB_BUCKETS + int(
+                (mantissa * 2.0 - 1.0) * HISTOGRAM_SUB_BUCKETS
+            )
+            if index >= HISTOGRAM_BUCKETS:
+                index = HISTOGRAM_BUCKETS - 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float:
+        """Upper edge of the bucket holding the given percentile, in seconds."""
+        if self.count == 0:
+            return 0.0
+        target = max(1, math.ceil(self.count * percent / 100.0))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                octave, sub = divmod(index, HISTOGRAM_SUB_BUCKETS)
+                upper = HISTOGRAM_MIN_SECONDS * (2.0**octave) * (
+                    1.0 + (sub + 1) / HISTOGRAM_SUB_BUCKETS
+                )
+                return min(upper, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000.0, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1000.0, 3),
+            "p95_ms": round(self.percentile(95) * 1000.0, 3),
+            "p99_ms": round(self.percentile(99) * 1000.0, 3),
+            "max_ms": round(self.max * 1000.0, 3),
+        }
+
+
+@dataclass
+class WindowTrace:
+    """Stage timestamps for one vote window and its winner."""
+
+    window_end: float
+    closed_at: float = 0.0
+    winner: Optional[str] = None
+    total_votes: int = 0
+    unknown: int = 0
+    # votes only loose matching accepted (normalized, prefix or fuzzy)
+    recovered: int = 0
+    outcome: Optional[str] = None
+    # first vote counted in the window, and the winner's most recent vote
+    first_vote_at: Optional[float] = None
+    winner_vote_at: Optional[float] = None
+    focus_checked_at: Optional[float] = None
+    first_input_at: Optional[float] = None
+    done_at: Optional[float] = None
+
+    def mark_first_input(self) -> None:
+        if self.first_input_at is None:
+            self.first_input_at = time.monotonic()
+
+    def summary(self) -> Dict[str, Any]:
+        """Window record with stage times in ms relative to the window close."""
+        row = asdict(self)
+        closed_at = self.closed_at
+        for key in ("window_end", "first_vote_at", "winner_vote_at", "focus_checked_at", "first_input_at", "done_at"):
+            value = row.pop(key)
+            row[f"{key}_ms"] = None if value is None else round((value - closed_at) * 1000.0, 3)
+        row.pop("closed_at")
+        return row
+
+
+class LatencyTracer:
+    def __init__(self) -> None:
+        self.histograms: Dict[str, LatencyHistogram] = {
+            name: LatencyHistogram() for name in (*MESSAGE_SPANS, *WINDOW_SPANS)
+        }
+        self.windows: Deque[Dict[str, Any]] = deque(maxlen=RECENT_WINDOWS)
+        self.window_lock = threading.Lock()
+        self.started_at = time.monotonic()
+
+    def span(self, name: str, start: Optional[float], end: Optional[float]) -> None:
+        if start is not None and end is not None:
+            self.histograms[name].record(end - start)
+
+    def message(self, msg: Any, tallied_at: float) -> None:
+        received_at = msg.received_at
+        queued_at = msg.queued_at
+        drained_at = msg.drained_at
+        self.span("received->queued", received_at, queued_at)
+        self.span("queued->drained", queued_at, drained_at)
+        self.span("drained->tallied", drained_at, tallied_at)
+        self.span("received->tallied", received_at, tallied_at)
+
+    def finish_window(self, window: WindowTrace) -> None:
+        if window.done_at is None:
+            window.done_at = time.monotonic()
+        with self.window_lock:
+            self.span("window_close_lag", window.window_end, window.closed_at)
+            self.span("winner_vote->winner", window.winner_vote_at, window.closed_at)
+            self.span("winner->focus_checked", window.closed_at, window.focus_checked_at)
+            self.span("focus_checked->first_input", window.focus_checked_at, window.first_input_at)
+            self.span("first_input->done", window.first_input_at, window.done_at)
+            self.span("winner_vote->first_input", window.winner_vote_at, window.first_input_at)
+            self.windows.append(window.summary())
+
+    def report(self) -> Dict[str, Any]:
+        with self.window_lock:
+            return {
+                "uptime_s": round(time.monotonic() - self.started_at, 3),
+                "spans": {name: h.summary() for name, h in self.histograms.items()},
+                "windows": list(self.windows),
+            }
+
+    def dump(self, path: Path) -> None:
+        # write-then-rename so a reader never sees a half-written file
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self.report(), indent=2) + "\n", encoding="utf-8")
+        tmp_path.replace(path)
+
+    def summary_lines(self) -> List[str]:
+        lines = []
+        for name, histogram in self.histograms.items():
+            if histogram.count:
+                s = histogram.summary()
+                lines.append(
+                    f"{name:<28} n={s['count']:<8} p50={s['p50_ms']:.2f}ms "
+                    f"p95={s['p95_ms']:.2f}ms p99={s['p99_ms']:.2f}ms max={s['max_ms']:.2f}ms"
+                )
+        return lines
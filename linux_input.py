@@ -0,0 +1,225 @@
+"""
+Low-latency Linux input injection for Twitch Plays.
+
+- create_input_backend(name: str) -> backend
+    "xtest"  - one persistent X display connection, events sent through XTest
+               (needs python-xlib and an X11 session)
+    "uinput" - a virtual keyboard/mouse on /dev/uinput (needs write access,
+               usually root, works on X11 and Wayland)
+
+- backend.send(transitions) -> None
+    Inject a batch of ("key_down", scan_code) / ("key_up", scan_code) /
+    ("mouse_down", button) / ("mouse_up", button) / ("mouse_move", (dx, dy))
+    transitions with a single flush or write.
+
+Profiles use DirectX scan codes. Those are PC set-1 scan codes, which the Linux
+evdev keycodes share one-to-one below 0x80. Extended keys (0xE0-prefixed, which
+DirectX stores as 0x80 | code) go through a small table.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import os
+import struct
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+# DirectX extended scan code -> evdev keycode
+EXTENDED_EVDEV_KEYCODES: Dict[int, int] = {
+    0x9C: 96,  # KEY_KPENTER
+    0x9D: 97,  # KEY_RIGHTCTRL
+    0xB5: 98,  # KEY_KPSLASH
+    0xB7: 99,  # KEY_SYSRQ
+    0xB8: 100,  # KEY_RIGHTALT
+    0xC7: 102,  # KEY_HOME
+    0xC8: 103,  # KEY_UP
+    0xC9: 104,  # KEY_PAGEUP
+    0xCB: 105,  # KEY_LEFT
+    0xCD: 106,  # KEY_RIGHT
+    0xCF: 107,  # KEY_END
+    0xD0: 108,  # KEY_DOWN
+    0xD1: 109,  # KEY_PAGEDOWN
+    0xD2: 110,  # KEY_INSERT
+    0xD3: 111,  # KEY_DELETE
+    0xDB: 125,  # KEY_LEFTMETA
+    0xDC: 126,  # KEY_RIGHTMETA
+}
+
+# X servers using evdev/libinput number keys as evdev keycode + 8
+XKB_KEYCODE_OFFSET = 8
+
+BTN_LEFT = 0x110
+BTN_RIGHT = 0x111
+BTN_MIDDLE = 0x112
+EVDEV_BUTTONS = {"left": BTN_LEFT, "right": BTN_RIGHT, "middle": BTN_MIDDLE}
+X_BUTTONS = {"left": 1, "middle": 2, "right": 3}
+
+EV_SYN = 0x00
+EV_KEY = 0x01
+EV_REL = 0x02
+SYN_REPORT = 0
+REL_X = 0x00
+REL_Y = 0x01
+
+UINPUT_PATH = "/dev/uinput"
+UI_DEV_CREATE = 0x5501
+UI_DEV_DESTROY = 0x5502
+UI_SET_EVBIT = 0x40045564
+UI_SET_KEYBIT = 0x40045565
+UI_SET_RELBIT = 0x40045566
+BUS_VIRTUAL = 0x06
+# Give the desktop a moment to pick up a freshly created device
+UINPUT_SETTLE_SEC = 0.2
+
+INPUT_EVENT = struct.Struct("llHHi")
+UINPUT_USER_DEV = struct.Struct("80sHHHHi" + "64i" * 4)
+
+
+def evdev_keycode(scan_code: int) -> int:
+    if scan_code < 0x80:
+        return scan_code
+    try:
+        return EXTENDED_EVDEV_KEYCODES[scan_code]
+    except KeyError as exc:
+        raise ValueError(f"Unsupported key code for Linux input: {scan_code}") from exc
+
+
+class UInputBackend:
+    """Virtual keyboard + mouse on /dev/uinput; one write() per batch."""
+
+    name = "uinput"
+
+    def __init__(self, fd: Optional[int] = None) -> None:
+        # An already open fd (for example /dev/null) skips device setup.
+        self.owns_device = fd is None
+        self.fd = fd if fd is not None else self.create_device()
+
+    def create_device(self) -> int:
+        try:
+            fd = os.open(UINPUT_PATH, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as exc:
+            raise RuntimeError(
+                f"Could not open {UINPUT_PATH} for input injection. Run with sudo or add a udev rule. {exc}"
+            ) from exc
+        try:
+            for event_type in (EV_KEY, EV_REL, EV_SYN):
+                fcntl.ioctl(fd, UI_SET_EVBIT, event_type)
+            for keycode in range(1, 0x80):
+                fcntl.ioctl(fd, UI_SET_KEYBIT, keycode)
+            for keycode in (*EXTENDED_EVDEV_KEYCODES.values(), *EVDEV_BUTTONS.values()):
+                fcntl.ioctl(fd, UI_SET_KEYBIT, keycode)
+            for axis in (REL_X, REL_Y):
+                fcntl.ioctl(fd, UI_SET_RELBIT, axis)
+            zeros = [0] * (64 * 4)
+            os.write(
+                fd,
+                UINPUT_USER_DEV.pack(b"twitchplays-input", BUS_VIRTUAL, 0x1, 0x1, 1, 0, *zeros),
+            )
+            fcntl.ioctl(fd, UI_DEV_CREATE)
+        except OSError as exc:
+            os.close(fd)
+            raise RuntimeError(f"Could not create the uinput device. {exc}") from exc
+        time.sleep(UINPUT_SETTLE_SEC)
+        return fd
+
+    def encode(self, transitions: Sequence[Tuple[str, Any]]) -> bytes:
+        events = []
+        for kind, value in transitions:
+            if kind == "key_down" or kind == "key_up":
+                events.append(INPUT_EVENT.pack(0, 0, EV_KEY, evdev_keycode(value), kind == "key_down"))
+            elif kind == "mouse_down" or kind == "mouse_up":
+                try:
+                    button = EVDEV_BUTTONS[value]
+                except KeyError as exc:
+                    raise ValueError(f"Unsupported mouse button: {value}") from exc
+                events.append(INPUT_EVENT.pack(0, 0, EV_KEY, button, kind == "mouse_down"))
+            elif kind == "mouse_move":
+                dx, dy = value
+                if dx:
+                    events.append(INPUT_EVENT.pack(0, 0, EV_REL, REL_X, int(dx)))
+                if dy:
+                    events.append(INPUT_EVENT.pack(0, 0, EV_REL, REL_Y, int(dy)))
+            else:
+                raise ValueError(f"Unsupported input transition: {kind} {value}")
+        events.append(INPUT_EVENT.pack(0, 0, EV_SYN, SYN_REPORT, 0))
+        return b"".join(events)
+
+    def send(self, transitions: Sequence[Tuple[str, Any]]) -> None:
+        os.write(self.fd, self.encode(transitions))
+
+    def close(self) -> None:
+        if self.fd is None:
+            return
+        try:
+            if self.owns_device:
+                fcntl.ioctl(self.fd, UI_DEV_DESTROY)
+        except OSError:
+            pass
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+        self.fd = None
+
+
+class XTestBackend:
+    """Persistent X display connection; one flush per batch."""
+
+    name = "xtest"
+
+    def __init__(self) -> None:
+        try:
+            from Xlib import X, display
+            from Xlib.ext import xtest
+        except BaseException as exc:
+            raise RuntimeError(
+                "The xtest input backend requires python-xlib (`pip install python-xlib`)."
+            ) from exc
+        self.X = X
+        self.xtest = xtest
+        try:
+            self.display = display.Display()
+        except Exception as exc:
+            raise RuntimeError(f"Could not open the X display for XTest input. {exc}") from exc
+        if not self.display.has_extension("XTEST"):
+            self.display.close()
+            raise RuntimeError("The X server does not support the XTEST extension.")
+
+    def send(self, transitions: Sequence[Tuple[str, Any]]) -> None:
+        X = self.X
+        fake_input = self.xtest.fake_input
+        for kind, value in transitions:
+            if kind == "key_down":
+                fake_input(self.display, X.KeyPress, evdev_keycode(value) + XKB_KEYCODE_OFFSET)
+            elif kind == "key_up":
+                fake_input(self.display, X.KeyRelease, evdev_keycode(value) + XKB_KEYCODE_OFFSET)
+            elif kind == "mouse_down" or kind == "mouse_up":
+                try:
+                    button = X_BUTTONS[value]
+                except KeyError as exc:
+                    raise ValueError(f"Unsupported mouse button: {value}") from exc
+                event_type = X.ButtonPress if kind == "mouse_down" else X.ButtonRelease
+                fake_input(self.display, event_type, button)
+            elif kind == "mouse_move":
+                dx, dy = value
+                # detail=True asks XTest for relative motion
+                fake_input(self.display, X.MotionNotify, True, x=int(dx), y=int(dy))
+            else:
+                raise ValueError(f"Unsupported input transition: {kind} {value}")
+        self.display.flush()
+
+    def close(self) -> None:
+        try:
+            self.display.close()
+        except Exception:
+            pass
+
+
+def create_input_backend(name: str):
+    if name == "uinput":
+        return UInputBackend()
+    if name == "xtest":
+        return XTestBackend()
+    raise ValueError(f"Unknown Linux input backend `{name}`.")
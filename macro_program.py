@@ -0,0 +1,401 @@
+"""
+Profile macro compiler for Twitch Plays.
+
+- compile_macros(macros: dict, backend: MacroBackend) -> Dict[str, MacroProgram]
+    Turn the raw `macros` section of a profile into immutable programs.
+
+- execute_program(program: MacroProgram, cancel: Optional[threading.Event] = None) -> None
+    Run a compiled program. No string parsing or dict lookups happen here.
+    Setting `cancel` aborts the program at its next step or wait.
+
+Every step is validated once when the profile loads: key names are resolved to
+DirectX scan codes, durations are parsed and clamped, and each input step is
+bound to the runner's backend callable. A bad step raises ProfileError at load
+time instead of being skipped halfway through a stream.
+
+Key and mouse-button transitions that happen at the same instant (back to back
+with no wait, or at the start of every `parallel` thread) are grouped into one
+`transitions` instruction so the backend can inject them in a single call.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import TwitchPlays_KeyCodes
+
+
+MAX_STEP_MS = 3000
+DEFAULT_TAP_MS = 60
+MIN_PRESS_SEC = 0.01
+MOUSE_BUTTONS = ("left", "right", "middle")
+
+OP_KEY_DOWN = "key_down"
+OP_KEY_UP = "key_up"
+OP_MOUSE_DOWN = "mouse_down"
+OP_MOUSE_UP = "mouse_up"
+OP_MOUSE_CLICK = "mouse_click"
+OP_MOUSE_CLICK_AT = "mouse_click_at"
+OP_MOUSE_MOVE = "mouse_move"
+OP_WAIT = "wait"
+OP_PARALLEL = "parallel"
+OP_TRANSITIONS = "transitions"
+
+TRANSITION_OPS = {OP_KEY_DOWN, OP_KEY_UP, OP_MOUSE_DOWN, OP_MOUSE_UP}
+GROUPABLE_OPS = TRANSITION_OPS | {OP_TRANSITIONS}
+
+
+def build_keycode_table() -> Dict[str, int]:
+    # Every scan code in TwitchPlays_KeyCodes.scan_code_by_name is addressable
+    # by name (`LEFT_ARROW`, `LEFT_CONTROL`, ...), plus the short names profiles use.
+    table: Dict[str, int] = dict(TwitchPlays_KeyCodes.scan_code_by_name)
+    for digit, name in enumerate(
+        ("ZERO", "ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE")
+    ):
+        table[str(digit)] = table[name]
+    table.update(
+        {
+            "SPACEBAR": table["SPACE"],
+            "LEFT_CTRL": table["LEFT_CONTROL"],
+            "RIGHT_CTRL": table["RIGHT_CONTROL"],
+            "LEFT": table["LEFT_ARROW"],
+            "RIGHT": table["RIGHT_ARROW"],
+            "UP": table["UP_ARROW"],
+            "DOWN": table["DOWN_ARROW"],
+            ".": table["PERIOD"],
+        }
+    )
+    return table
+
+
+KEYCODE_BY_NAME: Dict[str, int] = build_keycode_table()
+
+
+def keycode_from_name(name: str) -> Optional[int]:
+    return KEYCODE_BY_NAME.get(str(name or "").strip().upper())
+
+
+class ProfileError(RuntimeError):
+    pass
+
+
+class MacroCancelled(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class MacroBackend:
+    key_down: Callable[[Tuple[int, ...]], None]
+    key_up: Callable[[Tuple[int, ...]], None]
+    mouse_down: Callable[[str], None]
+    mouse_up: Callable[[str], None]
+    mouse_click: Callable[[str], None]
+    mouse_click_at: Callable[[float, float, str], None]
+    mouse_move: Callable[[int, int], None]
+    send_transitions: Callable[[Tuple[Tuple[str, Any], ...]], None]
+
+
+@dataclass(frozen=True)
+class MacroInstruction:
+    op: str
+    action: Optional[Callable[[], None]] = None
+    seconds: float = 0.0
+    keycodes: Tuple[int, ...] = ()
+    button: str = ""
+    threads: Tuple[Tuple["MacroInstruction", ...], ...] = ()
+    # (op, keycode or button) pairs for OP_TRANSITIONS
+    transitions: Tuple[Tuple[str, Any], ...] = ()
+
+
+MacroProgram = Tuple[MacroInstruction, ...]
+
+
+def compile_macros(macros: Any, backend: MacroBackend) -> Dict[str, MacroProgram]:
+    if not macros:
+        return {}
+    if not isinstance(macros, dict):
+        raise ProfileError("Profile `macros` must be an object of name -> steps.")
+
+    programs: Dict[str, MacroProgram] = {}
+    for name, steps in macros.items():
+        canonical = str(name or "").strip().lower()
+        if not canonical:
+            continue
+        programs[canonical] = compile_steps(steps, backend, canonical)
+    return programs
+
+
+def compile_steps(steps: Any, backend: MacroBackend, where: str) -> MacroProgram:
+    if steps is None:
+        return ()
+    if not isinstance(steps, list):
+        raise ProfileError(f"Macro `{where}` must be a list of steps.")
+
+    program: List[MacroInstruction] = []
+    for index, step in enumerate(steps):
+        program.extend(compile_step(step, backend, f"{where}[{index}]"))
+    return group_transitions(program, backend)
+
+
+def compile_step(step: Any, backend: MacroBackend, where: str) -> List[MacroInstruction]:
+    if not isinstance(step, dict):
+        raise ProfileError(f"Macro step `{where}` must be an object.")
+
+    step_type = str(step.get("type") or "").strip().lower()
+
+    if step_type == "parallel":
+        threads = []
+        for index, thread in enumerate(step.get("threads") or []):
+            thread_program = compile_steps(
+                normalize_parallel_thread(thread), backend, f"{where}.threads[{index}]"
+            )
+            if thread_program:
+                threads.append(thread_program)
+        if not threads:
+            return []
+        return [MacroInstruction(OP_PARALLEL, threads=tuple(threads))]
+
+    if step_type in {"key_press", "key_tap"}:
+        keycodes = (step_keycode(step.get("key"), where),)
+        default_ms = 0 if step_type == "key_press" else DEFAULT_TAP_MS
+        duration_ms = step_duration_ms(step, where, default_ms)
+        if step_type == "key_press" and not duration_ms:
+            return []
+        return [
+            key_instruction(OP_KEY_DOWN, keycodes, backend),
+            MacroInstruction(OP_WAIT, seconds=max(MIN_PRESS_SEC, duration_ms / 1000.0)),
+            key_instruction(OP_KEY_UP, keycodes, backend),
+        ]
+
+    if step_type == "key_hold":
+        return [key_instruction(OP_KEY_DOWN, (step_keycode(step.get("key"), where),), backend)]
+
+    if step_type == "key_release":
+        key = step.get("key")
+        keys = step.get("keys")
+        names = keys if isinstance(keys, list) else ([key] if key else [])
+        keycodes = tuple(step_keycode(name, where) for name in names)
+        if not keycodes:
+            return []
+        return [key_instruction(OP_KEY_UP, keycodes, backend)]
+
+    if step_type == "key_combo":
+        keys = step.get("keys") or []
+        if not isinstance(keys, list):
+            raise ProfileError(f"Macro step `{where}` needs `keys` to be a list.")
+        keycodes = tuple(step_keycode(name, where) for name in keys)
+        duration_ms = step_duration_ms(step, where, 0)
+        program: List[MacroInstruction] = []
+        if keycodes:
+            program.append(key_instruction(OP_KEY_DOWN, keycodes, backend))
+        if duration_ms:
+            program.append(MacroInstruction(OP_WAIT, seconds=duration_ms / 1000.0))
+        if keycodes:
+            program.append(key_instruction(OP_KEY_UP, keycodes, backend))
+        return program
+
+    if step_type == "mouse_down":
+        return [button_instruction(OP_MOUSE_DOWN, backend.mouse_down, step, where)]
+
+    if step_type == "mouse_up":
+        return [button_instruction(OP_MOUSE_UP, backend.mouse_up, step, where)]
+
+    if step_type == "mouse_click":
+        return [button_instruction(OP_MOUSE_CLICK, backend.mouse_click, step, where)]
+
+    if step_type == "mouse_click_at":
+        button = step_button(step, where)
+        x = step_number(step, "x", where)
+        y = step_number(step, "y", where)
+        return [
+            MacroInstruction(
+                OP_MOUSE_CLICK_AT,
+                action=partial(backend.mouse_click_at, x, y, button),
+                button=button,
+            )
+        ]
+
+    if step_type in {"mouse_hold", "mouse_pulse"}:
+        duration_ms = step_duration_ms(step, where, 0)
+        program = [button_instruction(OP_MOUSE_DOWN, backend.mouse_down, step, where)]
+        if duration_ms:
+            program.append(MacroInstruction(OP_WAIT, seconds=duration_ms / 1000.0))
+        program.append(button_instruction(OP_MOUSE_UP, backend.mouse_up, step, where))
+        return program
+
+    if step_type == "mouse_move":
+        dx = int(step_number(step, "dx", where))
+        dy = int(step_number(step, "dy", where))
+        return [MacroInstruction(OP_MOUSE_MOVE, action=partial(backend.mouse_move, dx, dy))]
+
+    raise ProfileError(f"Macro step `{where}` has unknown type `{step_type or '?'}`.")
+
+
+def instruction_transitions(instruction: MacroInstruction) -> List[Tuple[str, Any]]:
+    if instruction.op == OP_TRANSITIONS:
+        return list(instruction.transitions)
+    if instruction.op in {OP_KEY_DOWN, OP_KEY_UP}:
+        return [(instruction.op, keycode) for keycode in instruction.keycodes]
+    return [(instruction.op, instruction.button)]
+
+
+def transitions_instruction(
+    pending: List[MacroInstruction], backend: MacroBackend
+) -> List[MacroInstruction]:
+    transitions = tuple(
+        transition for instruction in pending for transition in instruction_transitions(instruction)
+    )
+    if len(pending) == 1 and (len(transitions) == 1 or pending[0].op == OP_TRANSITIONS):
+        return pending
+    return [
+        MacroInstruction(
+            OP_TRANSITIONS,
+            action=partial(backend.send_transitions, transitions),
+            transitions=transitions,
+        )
+    ]
+
+
+def group_transitions(
+    program: List[MacroInstruction], backend: MacroBackend
+) -> MacroProgram:
+    grouped: List[MacroInstruction] = []
+    pending: List[MacroInstruction] = []
+    for instruction in program:
+        if instruction.op in GROUPABLE_OPS:
+            pending.append(instruction)
+            continue
+
+        if instruction.op == OP_PARALLEL:
+            # Each thread's leading transitions fire at the same instant, so
+            # they join the batch in front of the parallel block.
+            threads = []
+            for thread in instruction.threads:
+                lead = 0
+                while lead < len(thread) and thread[lead].op in GROUPABLE_OPS:
+                    lead += 1
+                pending.extend(thread[:lead])
+                if thread[lead:]:
+                    threads.append(thread[lead:])
+            if pending:
+                grouped.extend(transitions_instruction(pending, backend))
+                pending = []
+            if threads:
+                grouped.append(MacroInstruction(OP_PARALLEL, threads=tuple(threads)))
+            continue
+
+        if pending:
+            grouped.extend(transitions_instruction(pending, backend))
+            pending = []
+        grouped.append(instruction)
+    if pending:
+        grouped.extend(transitions_instruction(pending, backend))
+    return tuple(grouped)
+
+
+def key_instruction(
+    op: str, keycodes: Tuple[int, ...], backend: MacroBackend
+) -> MacroInstruction:
+    callback = backend.key_down if op == OP_KEY_DOWN else backend.key_up
+    return MacroInstruction(op, action=partial(callback, keycodes), keycodes=keycodes)
+
+
+def button_instruction(
+    op: str, callback: Callable[[str], None], step: Dict[str, Any], where: str
+) -> MacroInstruction:
+    button = step_button(step, where)
+    return MacroInstruction(op, action=partial(callback, button), button=button)
+
+
+def step_keycode(name: Any, where: str) -> int:
+    keycode = keycode_from_name(str(name or ""))
+    if keycode is None:
+        raise ProfileError(f"Macro step `{where}` uses unknown key `{name}`.")
+    return keycode
+
+
+def step_button(step: Dict[str, Any], where: str) -> str:
+    button = str(step.get("button") or "left").strip().lower()
+    if button not in MOUSE_BUTTONS:
+        raise ProfileError(f"Macro step `{where}` uses unknown mouse button `{button}`.")
+    return button
+
+
+def step_duration_ms(step: Dict[str, Any], where: str, default_ms: int) -> int:
+    try:
+        duration_ms = int(step.get("duration_ms") or default_ms)
+    except (TypeError, ValueError) as exc:
+        raise ProfileError(f"Macro step `{where}` has an invalid `duration_ms`.") from exc
+    return min(MAX_STEP_MS, max(0, duration_ms))
+
+
+def step_number(step: Dict[str, Any], field: str, where: str) -> float:
+    try:
+        return float(step.get(field) or 0)
+    except (TypeError, ValueError) as exc:
+        raise ProfileError(f"Macro step `{where}` has an invalid `{field}`.") from exc
+
+
+def normalize_parallel_thread(thread) -> list:
+    if isinstance(thread, list):
+        return thread
+    if isinstance(thread, dict):
+        return [thread]
+    return []
+
+
+def execute_program(
+    program: MacroProgram,
+    cancel: Optional[threading.Event] = None,
+    on_input: Optional[Callable[[], None]] = None,
+) -> None:
+    """Run a compiled macro; `on_input` is called after each injected input."""
+    for instruction in program:
+        if cancel is not None and cancel.is_set():
+            raise MacroCancelled()
+        op = instruction.op
+        if op == OP_WAIT:
+            if cancel is None:
+                time.sleep(instruction.seconds)
+            elif cancel.wait(instruction.seconds):
+                raise MacroCancelled()
+        elif op == OP_PARALLEL:
+            execute_parallel_threads(instruction.threads, cancel, on_input)
+        else:
+            instruction.action()
+            if on_input is not None:
+                on_input()
+
+
+def execute_parallel_threads(
+    threads: Tuple[MacroProgram, ...],
+    cancel: Optional[threading.Event] = None,
+    on_input: Optional[Callable[[], None]] = None,
+) -> None:
+    errors = []
+    running_threads = []
+
+    def run_thread(thread_program: MacroProgram) -> None:
+        try:
+            execute_program(thread_program, cancel, on_input)
+        except MacroCancelled:
+            pass
+        except Exception as exc:
+            errors.append(exc)
+
+    for thread_program in threads:
+        thread = threading.Thread(target=run_thread, args=(thread_program,))
+        thread.start()
+        running_threads.append(thread)
+
+    for thread in running_threads:
+        thread.join()
+
+    if errors:
+        raise RuntimeError(f"Parallel macro thread failed: {errors[0]}")
+    if cancel is not None and cancel.is_set():
+        raise MacroCancelled()
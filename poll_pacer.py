@@ -0,0 +1,109 @@
+"""
+Adaptive poll timing for YouTube live chat.
+
+- PollPacer(default_interval=1.0)
+    start() -> float stamps a poll going out (time.monotonic()).
+    finish(started, items, hint, adapt=True) -> float is the delay until
+    the next poll should go out; failed(started) -> float is the same after
+    an error, backing off further with every failure in a row.
+
+- PollPacer.stats() -> Dict[str, Any]
+    Polls, errors, messages per poll, the current interval and chat rate,
+    plus request time and poll interval percentiles.
+
+The server's hint (timedContinuationData.timeoutMs for the scraper,
+pollingIntervalMillis for the API) is the interval for ordinary chat. With
+`adapt`, busy chat is polled sooner, aiming for TARGET_POLL_MESSAGES per poll
+but never faster than MIN_POLL_SECONDS, and every empty poll in a row doubles
+the interval up to MAX_POLL_SECONDS (or the hint, if that is longer).
+
+The interval counts from when the previous request went out, so time spent
+waiting on a response comes out of the wait, and a response slower than the
+interval sends the next request as soon as its continuation arrives.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+from latency_trace import LatencyHistogram
+
+MIN_POLL_SECONDS = 0.25
+MAX_POLL_SECONDS = 5.0
+TARGET_POLL_MESSAGES = 10
+# weight of the newest poll in the chat rate estimate
+RATE_SMOOTHING = 0.3
+# after a failed poll or reconnect, doubling per failure in a row
+FAILED_POLL_BACKOFF_SECONDS = 1.0
+MAX_FAILED_POLL_BACKOFF_SECONDS = 30.0
+
+
+class PollPacer:
+    def __init__(self, default_interval: float = 1.0) -> None:
+        self.default_interval = default_interval
+        self.interval = default_interval
+        # messages per second, smoothed over recent polls
+        self.rate = 0.0
+        self.quiet_polls = 0
+        self.last_started: Optional[float] = None
+        self.polls = 0
+        self.errors = 0
+        self.failures_in_row = 0
+        self.messages = 0
+        self.max_messages = 0
+        self.request_times = LatencyHistogram()
+        self.intervals = LatencyHistogram()
+
+    def start(self) -> float:
+        started = time.monotonic()
+        if self.last_started is not None:
+            self.intervals.record(started - self.last_started)
+        return started
+
+    def finish(
+        self, started: float, items: int, hint: Optional[float], adapt: bool = True
+    ) -> float:
+        finished = time.monotonic()
+        self.request_times.record(finished - started)
+        self.failures_in_row = 0
+        self.polls += 1
+        self.messages += items
+        self.max_messages = max(self.max_messages, items)
+
+        hint = hint if hint and hint > 0 else self.default_interval
+        covered = started - self.last_started if self.last_started is not None else hint
+        self.last_started = started
+        rate = items / max(covered, MIN_POLL_SECONDS)
+        self.rate = rate if self.polls == 1 else self.rate + RATE_SMOOTHING * (rate - self.rate)
+
+        if not adapt:
+            self.interval = hint
+        elif items:
+            self.quiet_polls = 0
+            self.interval = min(hint, max(MIN_POLL_SECONDS, TARGET_POLL_MESSAGES / self.rate))
+        else:
+            self.quiet_polls += 1
+            self.interval = min(
+                max(hint, MAX_POLL_SECONDS), hint * 2.0 ** min(self.quiet_polls - 1, 16)
+            )
+        return max(0.0, self.interval - (finished - started))
+
+    def failed(self, started: float) -> float:
+        self.errors += 1
+        self.failures_in_row += 1
+        self.last_started = started
+        backoff = FAILED_POLL_BACKOFF_SECONDS * 2.0 ** min(self.failures_in_row - 1, 16)
+        return max(self.interval, min(MAX_FAILED_POLL_BACKOFF_SECONDS, backoff))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "polls": self.polls,
+            "errors": self.errors,
+            "messages_per_poll": round(self.messages / self.polls, 1) if self.polls else 0.0,
+            "max_messages_per_poll": self.max_messages,
+            "interval_s": round(self.interval, 3),
+            "chat_rate": round(self.rate, 1),
+            "request": self.request_times.summary(),
+            "poll_interval": self.intervals.summary(),
+        }
@@ -0,0 +1,98 @@
+"""
+Bounded ring buffer for handing votes from one producer thread to the vote loop.
+
+- VoteRing.push_batch(items) -> int
+    Copy as many items as fit into preallocated slots and publish them with a
+    single store of `tail`. Returns how many were accepted; the rest are
+    counted in `overflowed` and never grow memory.
+
+- VoteRing.drain(max_items=None) -> list
+    Take everything published so far (or up to max_items) in at most two slice
+    copies and release the slots with a single store of `head`.
+
+- VoteRing.backpressure
+    True once the ring is `high_water` full, so producers can ask their
+    clients to slow down before anything is dropped.
+
+Only the producer writes `tail` and only the consumer writes `head`, so with
+one producer thread and one consumer no lock is needed: each side reads the
+other's counter, works on slots the other side is not touching, then
+publishes its own counter. Counters grow without wrapping; slot index is
+counter & mask.
+"""
+
+from __future__ import annotations
+
+from typing import Any, List, Optional, Sequence
+
+DEFAULT_RING_CAPACITY = 1 << 17
+DEFAULT_HIGH_WATER = 0.75
+
+
+class VoteRing:
+    def __init__(self, capacity: int = DEFAULT_RING_CAPACITY, high_water: float = DEFAULT_HIGH_WATER) -> None:
+        if capacity < 1:
+            raise ValueError("VoteRing capacity must be positive.")
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self.mask = size - 1
+        self.slots: List[Any] = [None] * size
+        self.high_water = max(1, int(size * high_water))
+        self.head = 0  # written by the consumer only
+        self.tail = 0  # written by the producer only
+        self.pushed = 0
+        self.overflowed = 0
+
+    def __len__(self) -> int:
+        return self.tail - self.head
+
+    @property
+    def backpressure(self) -> bool:
+        return self.tail - self.head >= self.high_water
+
+    def push(self, item: Any) -> bool:
+        tail = self.tail
+        if tail - self.head >= self.capacity:
+            self.overflowed += 1
+            return False
+        self.slots[tail & self.mask] = item
+        self.tail = tail + 1
+        self.pushed += 1
+        return True
+
+    def push_batch(self, items: Sequence[Any]) -> int:
+        tail = self.tail
+        count = min(len(items), self.capacity - (tail - self.head))
+        if count < len(items):
+            self.overflowed += len(items) - count
+        if count <= 0:
+            return 0
+        start = tail & self.mask
+        first = min(count, self.capacity - start)
+        self.slots[start : start + first] = items[:first]
+        if first < count:
+            self.slots[: count - first] = items[first:count]
+        self.tail = tail + count
+        self.pushed += count
+        return count
+
+    def drain(self, max_items: Optional[int] = None) -> List[Any]:
+        head = self.head
+        count = self.tail - head
+        if max_items is not None:
+            count = min(count, max_items)
+        if count <= 0:
+            return []
+        start = head & self.mask
+        first = min(count, self.capacity - start)
+        out = self.slots[start : start + first]
+        # drop references so drained votes can be freed
+        self.slots[start : start + first] = [None] * first
+        if first < count:
+            rest = count - first
+            out.extend(self.slots[:rest])
+            self.slots[:rest] = [None] * rest
+        self.head = head + count
+        return out
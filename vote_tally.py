@@ -0,0 +1,150 @@
+"""
+Incremental vote tally for Twitch Plays.
+
+- VoteTally.add(command) / remove(command) / touch(command)
+    O(1) updates as votes arrive, change, or are repeated.
+
+- VoteTally.leader() -> Optional[str]
+    Current winner: highest count, ties go to the most recent vote. O(number
+    of commands tied for the lead).
+
+- VoteTally.top(k) -> List[Tuple[str, int]]
+    Leaderboard, same ordering as leader(); sorts each bucket it reads.
+
+Commands live in buckets keyed by vote count. Buckets form a doubly linked
+list sorted by count, so every vote moves a command at most one bucket up or
+down. A bucket maps each command to its last-vote stamp and is unordered;
+ties are settled by stamp when the tally is read, once per window, rather
+than on every vote.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class CountBucket:
+    __slots__ = ("count", "members", "higher", "lower")
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        # command -> last-vote stamp
+        self.members: Dict[Hashable, int] = {}
+        self.higher: Optional[CountBucket] = None
+        self.lower: Optional[CountBucket] = None
+
+
+class VoteTally:
+    def __init__(self) -> None:
+        self.bucket_by_command: Dict[Hashable, CountBucket] = {}
+        self.highest: Optional[CountBucket] = None
+        self.lowest: Optional[CountBucket] = None
+        self.total = 0
+        self.stamp = 0
+
+    def __len__(self) -> int:
+        return len(self.bucket_by_command)
+
+    def __contains__(self, command: Hashable) -> bool:
+        return command in self.bucket_by_command
+
+    def count(self, command: Hashable) -> int:
+        bucket = self.bucket_by_command.get(command)
+        return bucket.count if bucket is not None else 0
+
+    def add(self, command: Hashable) -> None:
+        """Count one more vote for `command` and mark it most recent."""
+        self.stamp += 1
+        self.total += 1
+        bucket = self.bucket_by_command.get(command)
+        if bucket is None:
+            target = self.lowest
+            if target is None or target.count != 1:
+                target = self.insert_bucket(1, lower=None, higher=self.lowest)
+        else:
+            target = bucket.higher
+            if target is None or target.count != bucket.count + 1:
+                target = self.insert_bucket(bucket.count + 1, lower=bucket, higher=bucket.higher)
+            self.detach(command, bucket)
+        target.members[command] = self.stamp
+        self.bucket_by_command[command] = target
+
+    def remove(self, command: Hashable) -> None:
+        """Take one vote away from `command`; its recency is unchanged."""
+        bucket = self.bucket_by_command.get(command)
+        if bucket is None:
+            return
+        self.total -= 1
+        stamp = bucket.members[command]
+        if bucket.count == 1:
+            self.detach(command, bucket)
+            del self.bucket_by_command[command]
+            return
+
+        target = bucket.lower
+        if target is None or target.count != bucket.count - 1:
+            target = self.insert_bucket(bucket.count - 1, lower=bucket.lower, higher=bucket)
+        self.detach(command, bucket)
+        target.members[command] = stamp
+        self.bucket_by_command[command] = target
+
+    def touch(self, command: Hashable) -> None:
+        """Mark `command` as most recently voted without changing its count."""
+        bucket = self.bucket_by_command.get(command)
+        if bucket is None:
+            return
+        self.stamp += 1
+        bucket.members[command] = self.stamp
+
+    def leader(self) -> Optional[Hashable]:
+        if self.highest is None:
+            return None
+        members = self.highest.members
+        return max(members, key=members.__getitem__)
+
+    def top(self, k: int) -> List[Tuple[Hashable, int]]:
+        ranked: List[Tuple[Hashable, int]] = []
+        bucket = self.highest
+        while bucket is not None and len(ranked) < k:
+            members = bucket.members
+            for command in sorted(members, key=members.__getitem__, reverse=True):
+                ranked.append((command, bucket.count))
+                if len(ranked) >= k:
+                    break
+            bucket = bucket.lower
+        return ranked
+
+    def clear(self) -> None:
+        self.bucket_by_command.clear()
+        self.highest = None
+        self.lowest = None
+        self.total = 0
+
+    def insert_bucket(
+        self, count: int, lower: Optional[CountBucket], higher: Optional[CountBucket]
+    ) -> CountBucket:
+        bucket = CountBucket(count)
+        bucket.lower = lower
+        bucket.higher = higher
+        if lower is None:
+            self.lowest = bucket
+        else:
+            lower.higher = bucket
+        if higher is None:
+            self.highest = bucket
+        else:
+            higher.lower = bucket
+        return bucket
+
+    def detach(self, command: Hashable, bucket: CountBucket) -> None:
+        del bucket.members[command]
+        if bucket.members:
+            return
+        if bucket.lower is None:
+            self.lowest = bucket.higher
+        else:
+            bucket.lower.higher = bucket.higher
+        if bucket.higher is None:
+            self.highest = bucket.lower
+        else:
+            bucket.higher.lower = bucket.lower
@@ -0,0 +1,207 @@
+"""
+Streaming extraction of the JSON YouTube embeds in its watch and live_chat pages.
+
+- PageScanner(initial_data=True, config_keys=())
+    feed(text) -> bool scans the next decoded chunk of the page and returns
+    True once everything asked for has been found, so the download can stop.
+    `initial_data` is the raw text of the ytInitialData object (None until
+    found); `config` is every ytcfg.set({...}) object seen so far, merged in
+    page order, until it has all of `config_keys`.
+
+- scan_response(response, scanner, chunk_size=PAGE_CHUNK_BYTES) -> int
+    Feed a `stream=True` requests response to the scanner, close it as soon
+    as the scanner is done, and return how many bytes were read.
+
+- chat_iframe_continuation(initial_data) -> Optional[str]
+- chat_continuation(initial_data) -> Optional[Dict[str, Any]]
+    Decode only the part of ytInitialData the scraper needs: the live chat
+    renderer of the watch page, and the first continuation of the live_chat
+    page. The whole object is decoded only if that part is not where the
+    scraper expects it.
+
+A script element cannot contain `</script>`, so an object that starts in a
+script ends before the next `</script>`. Objects are located with str.find
+and decoded with the json module's C scanner; nothing walks the page one
+character at a time.
+"""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterable, Optional
+
+PAGE_CHUNK_BYTES = 1 << 16
+PAGE_ENCODING = "utf-8"
+SCRIPT_END = "</script>"
+# a marker split across two chunks is found on the next feed
+MARKER_OVERLAP = 64
+
+INITIAL_DATA_MARKER = re.compile(
+    r"(?:window\s*\[\s*[\"']ytInitialData[\"']\s*\]|ytInitialData)\s*=\s*(?=\{)"
+)
+CONFIG_MARKER = re.compile(r"ytcfg\s*\.set\(\s*(?=\{)")
+WHITESPACE = re.compile(r"\s*")
+JSON_DECODER = json.JSONDecoder()
+
+
+class PageScanner:
+    def __init__(self, initial_data: bool = True, config_keys: Iterable[str] = ()) -> None:
+        self.want_initial_data = initial_data
+        self.config_keys = tuple(config_keys)
+        self.initial_data: Optional[str] = None
+        self.config: Dict[str, Any] = {}
+        self.buffer = ""
+        self.chars = 0
+        # where to search next, and where the object being read starts
+        self.data_from = 0
+        self.data_start: Optional[int] = None
+        self.config_from = 0
+        self.config_start: Optional[int] = None
+
+    @property
+    def data_done(self) -> bool:
+        return not self.want_initial_data or self.initial_data is not None
+
+    @property
+    def config_done(self) -> bool:
+        return all(key in self.config for key in self.config_keys)
+
+    @property
+    def done(self) -> bool:
+        return self.data_done and self.config_done
+
+    def feed(self, text: str) -> bool:
+        self.chars += len(text)
+        self.buffer += text
+        if not self.data_done:
+            self.scan_initial_data()
+        while not self.config_done and self.scan_config():
+            pass
+        self.trim()
+        return self.done
+
+    def scan_initial_data(self) -> None:
+        buffer = self.buffer
+        if self.data_start is None:
+            match = INITIAL_DATA_MARKER.search(buffer, self.data_from)
+            if match is None:
+                self.data_from = max(self.data_from, len(buffer) - MARKER_OVERLAP)
+                return
+            self.data_start = self.data_from = match.end()
+        end = buffer.find(SCRIPT_END, self.data_from)
+        if end < 0:
+            self.data_from = max(self.data_start, len(buffer) - len(SCRIPT_END))
+            return
+        self.initial_data = buffer[self.data_start : end]
+
+    def scan_config(self) -> bool:
+        """Merge the next complete ytcfg.set() object; False if there is none yet."""
+        buffer = self.buffer
+        if self.config_start is None:
+            match = CONFIG_MARKER.search(buffer, self.config_from)
+            if match is None:
+                self.config_from = max(self.config_from, len(buffer) - MARKER_OVERLAP)
+                return False
+            self.config_start = self.config_from = match.end()
+        if buffer.find(SCRIPT_END, self.config_from) < 0:
+            self.config_from = max(self.config_start, len(buffer) - len(SCRIPT_END))
+            return False
+        try:
+            values = JSON_DECODER.raw_decode(buffer, self.config_start)[0]
+        except ValueError:
+            values = None
+        if isinstance(values, dict):
+            self.config.update(values)
+        self.config_from = self.config_start
+        self.config_start = None
+        return True
+
+    def trim(self) -> None:
+        """Drop the text no pending search or open object can still need."""
+        pending = []
+        if not self.data_done:
+            pending.append(self.data_from if self.data_start is None else self.data_start)
+        if not self.config_done:
+            pending.append(self.config_from if self.config_start is None else self.config_start)
+        cut = min(pending) if pending else len(self.buffer)
+        if cut <= 0:
+            return
+        self.buffer = self.buffer[cut:]
+        self.data_from = max(0, self.data_from - cut)
+        self.config_from = max(0, self.config_from - cut)
+        if self.data_start is not None:
+            self.data_start = max(0, self.data_start - cut)
+        if self.config_start is not None:
+            self.config_start = max(0, self.config_start - cut)
+
+
+def scan_response(response: Any, scanner: PageScanner, chunk_size: int = PAGE_CHUNK_BYTES) -> int:
+    decoder = codecs.getincrementaldecoder(PAGE_ENCODING)(errors="replace")
+    read = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            read += len(chunk)
+            if scanner.feed(decoder.decode(chunk)):
+                break
+        else:
+            scanner.feed(decoder.decode(b"", final=True))
+    finally:
+        response.close()
+    return read
+
+
+def decode_value(text: str, start: int = 0) -> Any:
+    return JSON_DECODER.raw_decode(text, WHITESPACE.match(text, start).end())[0]
+
+
+def decode_key(text: str, key: str, start: int = 0) -> Any:
+    """Value of the first `"key":` at or after `start`, or None."""
+    index = text.find(f'"{key}":', start)
+    if index < 0:
+        return None
+    try:
+        return decode_value(text, index + len(key) + 3)
+    except ValueError:
+        return None
+
+
+def iframe_continuation(live_chat_renderer: Any) -> str:
+    return live_chat_renderer["header"]["liveChatHeaderRenderer"]["viewSelector"][
+        "sortFilterSubMenuRenderer"
+    ]["subMenuItems"][1]["continuation"]["reloadContinuationData"]["continuation"]
+
+
+def chat_iframe_continuation(initial_data: str) -> Optional[str]:
+    """Continuation for the "Live chat" (not "Top chat") live_chat iframe."""
+    try:
+        return iframe_continuation(decode_key(initial_data, "liveChatRenderer"))
+    except (LookupError, TypeError):
+        pass
+    try:
+        data = decode_value(initial_data)
+        return iframe_continuation(
+            data["contents"]["twoColumnWatchNextResults"]["conversationBar"]["liveChatRenderer"]
+        )
+    except (LookupError, TypeError, ValueError):
+        return None
+
+
+def is_continuation(value: Any) -> bool:
+    return isinstance(value, dict) and any(key.endswith("ContinuationData") for key in value)
+
+
+def chat_continuation(initial_data: str) -> Optional[Dict[str, Any]]:
+    """continuationContents.liveChatContinuation.continuations[0] of the live_chat page."""
+    anchor = initial_data.find('"liveChatContinuation":')
+    if anchor >= 0:
+        continuations = decode_key(initial_data, "continuations", anchor)
+        if isinstance(continuations, list) and continuations and is_continuation(continuations[0]):
+            return continuations[0]
+    try:
+        data = decode_value(initial_data)
+        continuation = data["continuationContents"]["liveChatContinuation"]["continuations"][0]
+    except (LookupError, TypeError, ValueError):
+        return None
+    return continuation if is_continuation(continuation) else None